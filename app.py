@@ -1,32 +1,181 @@
+import io
 import os
 import json
+import time
+import hashlib
 import tempfile
-import pandas as pd
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Request, Response, g, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
-from werkzeug.utils import secure_filename
+from werkzeug.exceptions import HTTPException, ServiceUnavailable, Unauthorized
+from itsdangerous import BadSignature, URLSafeSerializer
 from dotenv import load_dotenv
 from datetime import datetime, timezone
 import traceback
 
-from pdf_processor import extraer_texto_de_pdf
-from data_extractor import parsear_lineas_a_dataframe, clasificar_resultados
-from report_generator import generar_reporte_ia, create_medical_report_pdf
+import metrics
+from pipeline import analizar_lote, combinar_resumenes, PAGINAS_ESTRICTO
+from result_cache import LRUCache, hash_contenido, obtener_cache
+from serializer import a_columnas, dumps
+from lab_results import LabResult
+from job_queue import QueueFull, obtener_cola
+from report_cache import obtener_cache_reportes
+from llm_client import obtener_backend
+from report_generator import (
+    generar_reporte_ia, generar_reporte_ia_stream, obtener_reporte_cacheado,
+    precargar_render, render_medical_report_pdf, render_medical_reports_pdf
+)
 
 load_dotenv()
+
+# Las subidas por debajo de este tamaño se procesan en memoria; por encima se vuelcan a disco
+UPLOAD_SPOOL_THRESHOLD = int(os.environ.get('UPLOAD_SPOOL_THRESHOLD', 16 * 1024 * 1024))
+
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if total_content_length is not None and total_content_length <= UPLOAD_SPOOL_THRESHOLD:
+            return io.BytesIO()
+        return tempfile.NamedTemporaryFile('w+b', suffix='.pdf')
+
 app = Flask(__name__)
+app.request_class = UploadRequest
 CORS(app)
 
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'un-secreto-de-respaldo')
+# Firma los tokens de usuario del timeline. Sin SECRET_KEY el timeline queda desactivado:
+# un secreto de respaldo fijo permitiría falsificarlos y uno al azar los invalidaría al reiniciar
+app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY')
+TIMELINE_ENABLED = bool(app.config['SECRET_KEY'])
+if not TIMELINE_ENABLED:
+    app.logger.warning("SECRET_KEY is not set; the timeline is disabled")
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 50)) * 1024 * 1024
+
+def read_upload(file):
+    """Devuelve (fuente, sha256) de una subida sin copiarla a un archivo temporal propio."""
+    stream = file.stream
+    spooled_path = getattr(stream, 'name', None)
+    if isinstance(spooled_path, str):
+        stream.flush()
+        stream.seek(0)
+        return spooled_path, hashlib.file_digest(stream, 'sha256').hexdigest()
+
+    contenido = stream.getvalue() if isinstance(stream, io.BytesIO) else file.read()
+    return contenido, hash_contenido(contenido)
+
+def parse_report_date(report_date_str):
+    try:
+        return datetime.strptime(report_date_str, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def queue_timeline(user_id, report_date_str, results):
+    """Deja el análisis en el buffer de escritura diferida; no espera a la base de datos."""
+    # SQLAlchemy solo se carga con el primer uso del timeline (o en warm_up)
+    from timeline_writer import obtener_escritor
+
+    with metrics.span('timeline'):
+        return obtener_escritor().encolar(user_id, parse_report_date(report_date_str), results)
+
+def build_analysis_response(file_results, report_date_str, columnar=False, user_id=None):
+    # Las filas van una sola vez en 'results', con el nombre de su archivo; cada archivo indica cuántas aportó
+    files = [
+        {key: value for key, value in r.items() if key != 'results'} | ({'rows': len(r['results'])} if r['success'] else {})
+        for r in file_results
+    ]
+    succeeded = [r for r in file_results if r['success']]
+    if not succeeded:
+        return {
+            'error': file_results[0]['error'] if len(file_results) == 1 else 'No data could be extracted from the uploaded PDFs.',
+            'files': files
+        }, 400
 
-def calculate_summary_from_df(df):
-    status_counts = df['status'].value_counts()
-    return {
-        'normal': int(status_counts.get('Normal', 0)),
-        'near': int(status_counts.get('Near', 0)),
-        'abnormal': int(status_counts.get('Low', 0) + status_counts.get('High', 0)),
-        'total': int(len(df))
+    # Cada fila indica de qué archivo viene (las filas de la caché no se modifican: se copian)
+    results = [row | {'filename': r['filename']} for r in succeeded for row in r['results']]
+    timeline_queued = queue_timeline(user_id, report_date_str, results) if user_id is not None else None
+    payload = {
+        'success': True,
+        'results': a_columnas(results) if columnar else results,
+        'summary': combinar_resumenes(r['summary'] for r in succeeded),
+        'files': files,
+        'report_date': report_date_str
     }
+    if timeline_queued is not None:
+        payload['timeline_queued'] = timeline_queued
+    if columnar:
+        payload['format'] = 'columnar'
+    return payload, 200
+
+def json_response(payload, status=200):
+    """Respuesta JSON serializada en una sola pasada (orjson si está disponible)."""
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+def user_token_serializer():
+    return URLSafeSerializer(app.config['SECRET_KEY'], salt='user-token')
+
+def issue_user_token(user_id):
+    """Token firmado que identifica al usuario en la cabecera Authorization: Bearer <token>."""
+    return user_token_serializer().dumps({'user_id': user_id})
+
+def authenticated_user_id(required=False):
+    """Usuario del token de la petición, o None si no envía ninguno.
+
+    El usuario nunca se toma de un parámetro: un token inválido, o ninguno
+    cuando `required`, responde 401. Con el timeline desactivado los tokens
+    se ignoran y las rutas que lo exigen responden 503.
+    """
+    if not TIMELINE_ENABLED:
+        if required:
+            raise ServiceUnavailable('The timeline is disabled: SECRET_KEY is not set')
+        return None
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        if required:
+            raise Unauthorized('Authentication required')
+        return None
+    try:
+        user_id = user_token_serializer().loads(token.strip()).get('user_id')
+    except (BadSignature, AttributeError):
+        user_id = None
+    if not isinstance(user_id, int):
+        raise Unauthorized('Invalid token')
+    return user_id
+
+def wants_columnar():
+    return request.args.get('format') == 'columnar'
+
+def wants_strict():
+    # ?strict=1 extrae todas las páginas, sin saltar las que no parecen tener resultados
+    strict = request.args.get('strict')
+    return PAGINAS_ESTRICTO if strict is None else strict in ('1', 'true')
+
+@app.before_request
+def start_request_timing():
+    g.request_started = time.perf_counter()
+    metrics.iniciar_recoleccion()
+
+@app.after_request
+def add_server_timing(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    total = time.perf_counter() - started
+    response.headers['Server-Timing'] = metrics.server_timing(metrics.recoger()['tiempos'], total)
+    metrics.DURACION_PETICION.observe(total, request.endpoint or 'unknown', request.method, response.status_code)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.errorhandler(401)
+def unauthorized(e):
+    return jsonify({'error': e.description}), 401
+
+@app.errorhandler(503)
+def service_unavailable(e):
+    return jsonify({'error': e.description}), 503
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    return jsonify({'error': f"Upload exceeds the {app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)} MB limit"}), 413
 
 @app.route('/api/analyze', methods=['POST'])
 #@jwt_required() 
@@ -35,74 +184,262 @@ def analyze_reports():
         if 'files' not in request.files:
             return jsonify({'error': 'No files provided'}), 400
         
-        files = request.files.getlist('files')
+        files = [f for f in request.files.getlist('files') if f.filename]
+        if not files:
+            return jsonify({'error': 'No files provided'}), 400
+
         report_date_str = request.form.get('date', datetime.now(timezone.utc).strftime('%Y-%m-%d'))
-        file = files[0]
-        
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            pdf_path = os.path.join(tmp_dir, secure_filename(file.filename))
-            file.save(pdf_path)
-            
-            lineas = extraer_texto_de_pdf(pdf_path) 
-            
-            df = parsear_lineas_a_dataframe(lineas)
-            
-            if not df.empty:
-                df = clasificar_resultados(df)
-            else:
-                return jsonify({'error': 'No data could be extracted from this PDF.'}), 400
-        
-        df = df.rename(columns={
-            'Test': 'test',
-            'Value': 'value',
-            'Unit': 'unit',
-            'Ref Low': 'refLow',
-            'Ref High': 'refHigh',
-            'Status': 'status'
-        })
+        # Con un token de usuario el análisis se guarda también en su timeline
+        user_id = authenticated_user_id()
         
-        results_json = json.loads(df.to_json(orient='records'))
-        
-        return jsonify({
-            'success': True,
-            'results': results_json,
-            'summary': calculate_summary_from_df(df), 
-            'report_date': report_date_str
-        })
+        with metrics.span('upload'):
+            archivos = [(file.filename, *read_upload(file)) for file in files]
+        payload, status = build_analysis_response(
+            analizar_lote(archivos, estricto=wants_strict()), report_date_str, wants_columnar(), user_id
+        )
+        with metrics.span('respond'):
+            return json_response(payload, status)
         
+    except HTTPException:
+        raise
     except Exception as e:
+        metrics.error('analyze')
+        app.logger.exception('Analysis failed')
         return jsonify({'error': f'Analysis failed due to: {str(e)}'}), 500
     
+def run_analysis_job(job, archivos, report_date_str, columnar=False, strict=PAGINAS_ESTRICTO, user_id=None):
+    payload, _ = build_analysis_response(
+        analizar_lote(archivos, al_terminar=job.advance, estricto=strict), report_date_str, columnar, user_id
+    )
+    return payload
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_analysis_job():
+    if 'files' not in request.files:
+        return jsonify({'error': 'No files provided'}), 400
+    
+    files = [f for f in request.files.getlist('files') if f.filename]
+    if not files:
+        return jsonify({'error': 'No files provided'}), 400
+
+    report_date_str = request.form.get('date', datetime.now(timezone.utc).strftime('%Y-%m-%d'))
+    user_id = authenticated_user_id()
+    
+    archivos = []
+    for file in files:
+        fuente, digest = read_upload(file)
+        if isinstance(fuente, str):
+            # El archivo volcado a disco se borra al terminar la petición; el trabajo necesita su contenido
+            with open(fuente, 'rb') as f:
+                fuente = f.read()
+        archivos.append((file.filename, fuente, digest))
+
+    try:
+        job = obtener_cola().submit(
+            run_analysis_job, archivos, report_date_str, wants_columnar(), wants_strict(), user_id,
+            total=len(archivos)
+        )
+    except QueueFull as e:
+        response = jsonify({'error': 'Too many pending jobs, retry later.', 'retry_after': e.retry_after})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+
+    return jsonify({'job_id': job.id, 'status': job.status, 'status_url': f'/api/jobs/{job.id}'}), 202
+
+@app.route('/api/jobs/stats', methods=['GET'])
+def job_stats():
+    return jsonify(obtener_cola().stats())
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = obtener_cola().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return json_response(job.to_dict())
+
+@app.route('/api/session', methods=['POST'])
+def create_session():
+    """Identidad anónima para guardar y consultar el timeline desde un navegador.
+
+    Crea un usuario nuevo y devuelve su token; quien tenga el token ve ese
+    timeline y ningún otro.
+    """
+    from timeline_store import obtener_engine, crear_usuario_anonimo
+
+    if not TIMELINE_ENABLED:
+        raise ServiceUnavailable('The timeline is disabled: SECRET_KEY is not set')
+    with obtener_engine().begin() as conn:
+        user_id = crear_usuario_anonimo(conn)
+    return jsonify({'user_id': user_id, 'token': issue_user_token(user_id)}), 201
+
+@app.route('/api/timeline', methods=['GET'])
+def timeline_entries():
+    from timeline_store import obtener_engine, listar_analisis
+
+    user_id = authenticated_user_id(required=True)
+    try:
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid parameter: {str(e)}'}), 400
+
+    with obtener_engine().connect() as conn:
+        entries = listar_analisis(conn, user_id, limit)
+    return json_response({'user_id': user_id, 'entries': entries})
+
+@app.route('/api/timeline/stats', methods=['GET'])
+def timeline_stats():
+    from timeline_writer import obtener_escritor
+
+    return jsonify(obtener_escritor().stats())
+
+@app.route('/api/timeline/<path:test>', methods=['GET'])
+def timeline_trend(test):
+    # SQLAlchemy solo se carga con el primer uso del timeline (o en warm_up)
+    from timeline_store import obtener_engine
+    from timeline_trends import BUCKETS, serie_tendencia
+
+    user_id = authenticated_user_id(required=True)
+    try:
+        bucket = request.args.get('bucket') or None
+        if bucket is not None and bucket not in BUCKETS:
+            return jsonify({'error': f"bucket must be one of: {', '.join(BUCKETS)}"}), 400
+
+        date_from = request.args.get('from')
+        date_to = request.args.get('to')
+        date_from = datetime.strptime(date_from, '%Y-%m-%d') if date_from else None
+        date_to = datetime.strptime(date_to, '%Y-%m-%d').replace(hour=23, minute=59, second=59) if date_to else None
+        points = min(max(request.args.get('points', 100, type=int), 3), 1000)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid parameter: {str(e)}'}), 400
+
+    with obtener_engine().connect() as conn:
+        series = serie_tendencia(conn, user_id, test, date_from, date_to, bucket, points)
+    if wants_columnar():
+        for key in ('points', 'buckets'):
+            if key in series:
+                series[key] = a_columnas(series[key])
+        series['format'] = 'columnar'
+    return json_response(series)
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({
+        'results': obtener_cache().stats(),
+        'reports': obtener_cache_reportes().stats()
+    })
+
 @app.route('/api/generate-pdf', methods=['POST'])
 #@jwt_required()
 def generate_pdf():
     try:
         data = request.json
-        report_type = data.get('type', 'patient')
-        analysis_results_json = data.get('results', [])
+        # 'types' (p. ej. ['patient', 'doctor']) genera varios reportes en un único PDF
+        report_types = data.get('types') or [data.get('type', 'patient')]
+        results = [LabResult.from_dict(r) for r in data.get('results', [])]
         
-        df = pd.DataFrame(analysis_results_json)
-        
-        if df.empty:
+        if not results:
             return jsonify({'error': 'No results to generate report from'}), 400
 
-        report_text = generar_reporte_ia(df, report_type)
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_pdf:
-            create_medical_report_pdf(temp_pdf.name, report_text)
-            temp_pdf_path = temp_pdf.name
+        if len(report_types) == 1:
+            pdf_bytes = render_medical_report_pdf(generar_reporte_ia(results, report_types[0]))
+        else:
+            pdf_bytes = render_medical_reports_pdf([
+                (f'{report_type.capitalize()} report', generar_reporte_ia(results, report_type))
+                for report_type in report_types
+            ])
             
         return send_file(
-            temp_pdf_path,
+            io.BytesIO(pdf_bytes),
             as_attachment=True,
-            download_name=f'{report_type}_report.pdf',
+            download_name=f"{'_'.join(report_types)}_report.pdf",
             mimetype='application/pdf'
         )
         
     except Exception as e:
+        metrics.error('generate_pdf')
         app.logger.error(f"¡FALLO AL GENERAR PDF! Error: {e}")
         app.logger.error(traceback.format_exc()) 
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+# PDFs ya renderizados al terminar un stream, listos para descargar
+rendered_reports = LRUCache(int(os.environ.get('RENDERED_PDF_CACHE_SIZE', 64)), ttl=3600)
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/generate-report/stream', methods=['POST'])
+def stream_report():
+    data = request.json or {}
+    report_type = data.get('type', 'patient')
+    render_pdf = bool(data.get('render_pdf', False))
+    results = [LabResult.from_dict(r) for r in data.get('results', [])]
+
+    if not results:
+        return jsonify({'error': 'No results to generate report from'}), 400
+
+    report_key, cached, chunks = generar_reporte_ia_stream(results, report_type)
+
+    def events():
+        parts = []
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                yield sse_event('chunk', {'text': chunk})
+            if render_pdf:
+                rendered_reports.put(report_key, render_medical_report_pdf("".join(parts)))
+            yield sse_event('done', {
+                'report_key': report_key,
+                'cached': cached,
+                'pdf_url': f'/api/reports/{report_key}/pdf?type={report_type}'
+            })
+        except Exception as e:
+            metrics.error('report_stream')
+            app.logger.error(f"¡FALLO AL GENERAR REPORTE EN STREAMING! Error: {e}")
+            app.logger.error(traceback.format_exc())
+            yield sse_event('error', {'error': f'Server error: {str(e)}'})
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/reports/<report_key>/pdf', methods=['GET'])
+def download_streamed_report(report_key):
+    report_type = request.args.get('type', 'patient')
+    pdf_bytes = rendered_reports.get(report_key)
+    if pdf_bytes is None:
+        report_text = obtener_reporte_cacheado(report_key)
+        if report_text is None:
+            return jsonify({'error': 'Report not found or expired'}), 404
+        pdf_bytes = render_medical_report_pdf(report_text)
+
+    return send_file(
+        io.BytesIO(pdf_bytes),
+        as_attachment=True,
+        download_name=f'{report_type}_report.pdf',
+        mimetype='application/pdf'
+    )
+
+def warm_up():
+    """Carga los módulos pesados y las tablas de solo lectura antes de servir peticiones.
+
+    Con gunicorn --preload se ejecuta una vez en el proceso maestro y los
+    workers comparten esas páginas tras el fork. No abre conexiones, archivos
+    de caché ni pools de procesos: eso sigue siendo perezoso en cada worker.
+    """
+    import pymupdf  # noqa: F401
+    import timeline_trends  # noqa: F401
+
+    precargar_render()
+    obtener_backend().precargar()
+
+def create_app(warm=None):
+    """Entrada WSGI para gunicorn ('app:create_app()', ver gunicorn.conf.py)."""
+    if warm is None:
+        warm = os.environ.get('APP_WARM_UP', '1') == '1'
+    if warm:
+        warm_up()
+    return app
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Arranque en frío del servidor: tiempo de importación de app.py y de warm_up(),
+y, con gunicorn (gunicorn.conf.py), tiempo hasta la primera respuesta, latencia
+de la primera petición de análisis y de reporte, y memoria de los workers
+(PSS, que reparte entre procesos las páginas compartidas), con y sin preload.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import socket
+import tempfile
+import argparse
+import statistics
+import subprocess
+import http.client
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+MEDIR_IMPORTACION = """
+import time
+inicio = time.perf_counter()
+import app
+importado = time.perf_counter()
+app.warm_up()
+print(importado - inicio, time.perf_counter() - importado)
+"""
+
+
+def medir_importacion(repeticiones):
+    importacion, calentamiento = [], []
+    for _ in range(repeticiones):
+        salida = subprocess.run(
+            [sys.executable, '-c', MEDIR_IMPORTACION], cwd=RAIZ, check=True,
+            capture_output=True, text=True
+        ).stdout.split()
+        importacion.append(float(salida[0]))
+        calentamiento.append(float(salida[1]))
+    return statistics.median(importacion), statistics.median(calentamiento)
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def peticion(puerto, metodo, ruta, cuerpo=None, cabeceras=None):
+    conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=60)
+    try:
+        conexion.request(metodo, ruta, body=cuerpo, headers=cabeceras or {})
+        respuesta = conexion.getresponse()
+        return respuesta.status, respuesta.read()
+    finally:
+        conexion.close()
+
+
+def multipart(nombre, contenido, campos):
+    frontera = uuid.uuid4().hex
+    partes = [
+        f'--{frontera}\r\nContent-Disposition: form-data; name="{clave}"\r\n\r\n{valor}\r\n'.encode()
+        for clave, valor in campos.items()
+    ]
+    partes.append(
+        f'--{frontera}\r\nContent-Disposition: form-data; name="files"; filename="{nombre}"\r\n'
+        'Content-Type: application/pdf\r\n\r\n'.encode() + contenido + b'\r\n'
+    )
+    partes.append(f'--{frontera}--\r\n'.encode())
+    return b''.join(partes), {'Content-Type': f'multipart/form-data; boundary={frontera}'}
+
+
+def pss_arbol(pid):
+    """PSS total (MiB) del proceso y sus descendientes."""
+    pids, pendientes = [], [pid]
+    while pendientes:
+        actual = pendientes.pop()
+        pids.append(actual)
+        try:
+            with open(f'/proc/{actual}/task/{actual}/children') as f:
+                pendientes.extend(int(hijo) for hijo in f.read().split())
+        except OSError:
+            pass
+    total = 0
+    for actual in pids:
+        try:
+            with open(f'/proc/{actual}/smaps_rollup') as f:
+                for linea in f:
+                    if linea.startswith('Pss:'):
+                        total += int(linea.split()[1])
+        except OSError:
+            pass
+    return total / 1024
+
+
+def medir_gunicorn(preload, workers, pdf, directorio_datos):
+    puerto = puerto_libre()
+    entorno = dict(
+        os.environ,
+        GUNICORN_BIND=f'127.0.0.1:{puerto}', GUNICORN_WORKERS=str(workers),
+        GUNICORN_PRELOAD='1' if preload else '0', GUNICORN_LOG_LEVEL='warning',
+        LLM_BACKEND='stub', RESULT_CACHE_DIR=directorio_datos,
+        DATABASE_URL=f'sqlite:///{directorio_datos}/arranque.db',
+    )
+    inicio = time.perf_counter()
+    servidor = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'], cwd=RAIZ, env=entorno
+    )
+    try:
+        while True:
+            if servidor.poll() is not None:
+                raise RuntimeError(f'gunicorn terminó con código {servidor.returncode}')
+            try:
+                if peticion(puerto, 'GET', '/metrics')[0] == 200:
+                    break
+            except OSError:
+                time.sleep(0.01)
+        listo = time.perf_counter() - inicio
+
+        # Un PDF distinto en cada modo para no medir la caché de resultados
+        cuerpo, cabeceras = multipart('panel.pdf', pdf, {'date': '2024-01-01'})
+        inicio = time.perf_counter()
+        estado, respuesta = peticion(puerto, 'POST', '/api/analyze', cuerpo, cabeceras)
+        primer_analisis = time.perf_counter() - inicio
+        if estado != 200:
+            raise RuntimeError(f'/api/analyze devolvió {estado}: {respuesta[:200]!r}')
+
+        resultados = json.loads(respuesta)['results']
+        inicio = time.perf_counter()
+        estado, respuesta = peticion(
+            puerto, 'POST', '/api/generate-pdf',
+            json.dumps({'type': 'patient', 'results': resultados}).encode(), {'Content-Type': 'application/json'}
+        )
+        primer_reporte = time.perf_counter() - inicio
+        if estado != 200:
+            raise RuntimeError(f'/api/generate-pdf devolvió {estado}: {respuesta[:200]!r}')
+
+        return listo, primer_analisis, primer_reporte, pss_arbol(servidor.pid)
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeticiones", type=int, default=5, help="Procesos nuevos para medir la importación")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--sin-gunicorn", action="store_true", help="Mide solo la importación")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    importacion, calentamiento = medir_importacion(args.repeticiones)
+    backend = os.environ.get('LLM_BACKEND', 'gemini')
+    print(f"import app: {importacion * 1000:.0f} ms   warm_up() (backend {backend}): {calentamiento * 1000:.0f} ms   (mediana de {args.repeticiones})")
+    if args.sin_gunicorn:
+        return 0
+
+    from corpus import generar_pdf
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directorio:
+        # El servidor usa el backend stub para no llamar al modelo (warm_up no importa google-genai)
+        print(f"gunicorn, {args.workers} workers, backend stub:")
+        for preload in (True, False):
+            ruta = Path(directorio) / f'panel_{preload}.pdf'
+            generar_pdf(ruta, rng, 2)
+            listo, analisis, reporte, pss = medir_gunicorn(preload, args.workers, ruta.read_bytes(), directorio)
+            print(
+                f"  preload={'sí' if preload else 'no'}: primera respuesta a los {listo * 1000:.0f} ms, "
+                f"primer análisis {analisis * 1000:.0f} ms, primer reporte {reporte * 1000:.0f} ms, "
+                f"PSS total {pss:.0f} MiB"
+            )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Mide la canonicalización de nombres de biomarcadores: throughput en frío
+(índice sin memoizar) y en caliente (lru_cache), y precisión frente a la
+lista etiquetada de nombres_biomarcadores.csv.
+"""
+
+import sys
+import csv
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from biomarker_names import _indice, canonicalizar
+
+ETIQUETADOS = Path(__file__).resolve().parent / "nombres_biomarcadores.csv"
+
+
+def cargar_etiquetados(ruta=ETIQUETADOS):
+    with open(ruta, encoding="utf-8", newline="") as f:
+        return [(fila["nombre"], fila["esperado"] or None) for fila in csv.DictReader(f)]
+
+
+def medir(fn, nombres):
+    inicio = time.perf_counter()
+    for nombre in nombres:
+        fn(nombre)
+    return len(nombres) / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nombres", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    etiquetados = cargar_etiquetados()
+    rng = random.Random(args.seed)
+    # Un reporte repite pocos nombres muchas veces: el flujo real es el caso memoizado
+    nombres = [rng.choice(etiquetados)[0] for _ in range(args.nombres)]
+
+    nps_frio = medir(_indice.buscar, nombres)
+    canonicalizar.cache_clear()
+    nps_caliente = medir(canonicalizar, nombres)
+
+    print(f"{args.nombres:,} nombres ({len(etiquetados)} distintos)")
+    print(f"  índice sin memoizar: {nps_frio:,.0f} nombres/s")
+    print(f"  canonicalizar (LRU): {nps_caliente:,.0f} nombres/s ({nps_caliente / nps_frio:.0f}x)")
+
+    errores = [(nombre, esperado, _indice.buscar(nombre)) for nombre, esperado in etiquetados
+               if _indice.buscar(nombre) != esperado]
+    aciertos = len(etiquetados) - len(errores)
+    print(f"Precisión: {aciertos}/{len(etiquetados)} ({aciertos / len(etiquetados):.1%})")
+    for nombre, esperado, obtenido in errores:
+        print(f"  {nombre!r}: esperado {esperado}, obtenido {obtenido}")
+    return 1 if errores else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Compara clasificar_resultados (máscaras NumPy) y clasificar (LabResult, el
+camino de cada petición) con la implementación original basada en df.apply
+fila a fila sobre un DataFrame sintético.
+"""
+
+import sys
+import time
+import argparse
+from math import inf
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data_extractor import clasificar, clasificar_resultados
+from lab_results import LabResult
+
+
+def clasificar_original(df):
+    if df.empty:
+        return df
+        
+    df["Status"] = df.apply(
+        lambda row: ("Normal" if row["Ref Low"] <= row["Value"] <= row["Ref High"] else ("Near"
+            if ((row["Ref High"] == inf and row["Ref Low"] > 0 and abs(row["Value"] - row["Ref Low"]) <= 0.25 * row["Ref Low"])
+                or (row["Ref Low"] == -inf and row["Ref High"] > 0 and abs(row["Value"] - row["Ref High"]) <= 0.25 * row["Ref High"])
+                or (row["Ref High"] != inf and row["Ref Low"] != -inf and (row["Ref High"] - row["Ref Low"]) > 0
+                    and abs(row["Value"] - max(min(row["Value"], row["Ref High"]), row["Ref Low"])) <= 0.25 * (row["Ref High"] - row["Ref Low"])
+                )
+            )
+            else ("Low" if row["Value"] < row["Ref Low"] else "High")
+        )
+    ),
+    axis=1,
+    )
+    return df
+
+
+def dataframe_sintetico(filas, seed):
+    rng = np.random.default_rng(seed)
+    low = rng.uniform(0, 100, filas).round(1)
+    high = (low + rng.uniform(0, 100, filas)).round(1)
+    value = rng.uniform(-50, 250, filas).round(1)
+
+    # Mezcla de rangos cerrados, rangos desde 0, umbrales '>' (x, inf) y '<' (-inf, x) y valores NaN
+    tipo = rng.integers(0, 10, filas)
+    low = np.where(tipo == 1, 0.0, low)
+    high = np.where(tipo == 2, inf, high)
+    low = np.where(tipo == 3, -inf, low)
+    value = np.where(tipo == 4, np.nan, value)
+    value = np.where(tipo == 5, low, value)
+    high = np.where(tipo == 6, low, high)
+
+    return pd.DataFrame({
+        "Test": "Test",
+        "Value": value,
+        "Unit": "mg/dL",
+        "Ref Low": low,
+        "Ref High": high,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--filas", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    df = dataframe_sintetico(args.filas, args.seed)
+
+    inicio = time.perf_counter()
+    esperado = clasificar_original(df.copy())
+    t_original = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    obtenido = clasificar_resultados(df.copy())
+    t_vectorizado = time.perf_counter() - inicio
+
+    resultados = [
+        LabResult(test, value, unit, low, high)
+        for test, value, unit, low, high in df[["Test", "Value", "Unit", "Ref Low", "Ref High"]].itertuples(index=False)
+    ]
+    inicio = time.perf_counter()
+    clasificar(resultados)
+    t_escalar = time.perf_counter() - inicio
+
+    print(f"{args.filas:,} filas")
+    print(f"  df.apply original: {t_original:.2f}s ({args.filas / t_original:,.0f} filas/s)")
+    print(f"  NumPy vectorizado: {t_vectorizado:.3f}s ({args.filas / t_vectorizado:,.0f} filas/s, {t_original / t_vectorizado:.0f}x)")
+    print(f"  LabResult:         {t_escalar:.3f}s ({args.filas / t_escalar:,.0f} filas/s, {t_original / t_escalar:.0f}x)")
+
+    distintos = int((esperado["Status"] != obtenido["Status"]).sum())
+    distintos += sum(r.status != s for r, s in zip(resultados, esperado["Status"]))
+    if distintos:
+        print(f"ERROR: {distintos} filas con Status distinto")
+        return 1
+    print("Status idéntico en todas las filas")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
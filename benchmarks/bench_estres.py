@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Prueba de estrés del pool de análisis con PDFs adversarios: peticiones normales
+concurrentes mezcladas con PDFs patológicos generados (una página con decenas de
+miles de caracteres diminutos, y documentos de cientos de páginas casi vacías).
+Entre las normales hay PDFs de resultados grandes (--paginas-grande), que deben
+analizarse bien en los workers del pool.
+
+Cada modo se ejecuta en un proceso nuevo, con su configuración de límites:
+
+  base        solo peticiones normales (y grandes)
+  limites     con adversarios; límites por defecto (PDF_MAX_PAGES y PDF_MAX_PAGE_CHARS
+              los rechazan enseguida; timeout, memoria y reciclado en el pool)
+  solo-pool   con adversarios y sin límites de páginas ni caracteres: los contienen
+              el timeout y el techo de memoria del pool
+  sin-limites (con --sin-limites) el comportamiento anterior, sin ningún límite
+
+Se informa de la latencia p50/p99/máxima de las peticiones normales, de cómo
+terminan las grandes y las adversarias y de los workers sustituidos. Falla si
+en el modo 'limites' el p99 normal supera --tolerancia veces el de 'base', si
+algún PDF grande falla o si algún adversario no termina con un error limpio.
+"""
+
+import os
+import sys
+import time
+import uuid
+import queue
+import random
+import argparse
+import tempfile
+import threading
+import statistics
+import multiprocessing
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter
+
+from corpus import generar_pdf
+
+SIN_LIMITES_PDF = {'PDF_MAX_PAGES': '0', 'PDF_MAX_PAGE_CHARS': '0'}
+SIN_LIMITES_POOL = {'ANALYSIS_TASK_TIMEOUT': '0', 'ANALYSIS_WORKER_MAX_RSS_MB': '0', 'ANALYSIS_WORKER_MAX_TASKS': '0'}
+
+
+def pdf_confeti(ruta, rng, caracteres, paginas):
+    """Letras sueltas de 1 pt en posiciones aleatorias: sin dígitos, así que ningún
+    parser encuentra resultados y se prueban todos los reintentos (pdfplumber incluido)."""
+    c = canvas.Canvas(str(ruta), pagesize=letter)
+    for _ in range(paginas):
+        c.setFont("Helvetica", 1)
+        for _ in range(caracteres):
+            c.drawString(rng.uniform(10, 600), rng.uniform(10, 780), rng.choice("abcdefghijklmnop.-"))
+        c.showPage()
+    c.save()
+
+
+def pdf_largo(ruta, paginas):
+    c = canvas.Canvas(str(ruta), pagesize=letter)
+    for numero in range(paginas):
+        c.drawString(72, 720, f"Annex page {numero + 1}: no results on this page")
+        c.showPage()
+    c.save()
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(int(len(valores) * p), len(valores) - 1)]
+
+
+def ejecutar(entorno, peticiones, clientes, cola):
+    """En un proceso nuevo: aplica la configuración y lanza las peticiones desde `clientes` hilos."""
+    os.environ.update(entorno)
+    # El pool usa su propio contexto (forkserver con PyMuPDF precargado), igual que
+    # en el servidor, sea cual sea el método de arranque de este proceso
+    from pipeline import analizar_lote, obtener_pool
+
+    pendientes = queue.Queue()
+    for peticion in peticiones:
+        pendientes.put(peticion)
+    medidas = []
+
+    def cliente():
+        while True:
+            try:
+                tipo, nombre, contenido = pendientes.get_nowait()
+            except queue.Empty:
+                return
+            inicio = time.perf_counter()
+            # Un digest nuevo por petición: la caché de resultados no interviene
+            resultado = analizar_lote([(nombre, contenido, uuid.uuid4().hex)])[0]
+            medidas.append((tipo, time.perf_counter() - inicio, resultado['success'], resultado.get('error')))
+
+    # Arranca el forkserver y los workers antes de medir
+    calentamiento = [peticion for peticion in peticiones if peticion[0] == 'normal'][:16]
+    analizar_lote([(nombre, contenido, uuid.uuid4().hex) for _, nombre, contenido in calentamiento])
+    hilos = [threading.Thread(target=cliente) for _ in range(clientes)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    cola.put((medidas, time.perf_counter() - inicio, obtener_pool().stats()))
+    obtener_pool().shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--normales", type=int, default=300, help="Peticiones normales por modo")
+    parser.add_argument("--adversarios", type=int, default=12, help="PDFs adversarios por modo")
+    parser.add_argument("--clientes", type=int, default=8, help="Peticiones concurrentes")
+    parser.add_argument("--workers", type=int, default=4, help="ANALYSIS_WORKERS")
+    parser.add_argument("--timeout", type=float, default=5, help="ANALYSIS_TASK_TIMEOUT (s)")
+    parser.add_argument("--max-rss", type=float, default=400, help="ANALYSIS_WORKER_MAX_RSS_MB")
+    parser.add_argument("--max-tareas", type=int, default=50, help="ANALYSIS_WORKER_MAX_TASKS")
+    parser.add_argument("--caracteres", type=int, default=30000, help="Caracteres por página de los PDFs confeti")
+    parser.add_argument("--paginas-confeti", type=int, default=3)
+    parser.add_argument("--paginas-largo", type=int, default=1500)
+    parser.add_argument("--grandes", type=int, default=6, help="PDFs de resultados grandes por modo")
+    parser.add_argument("--paginas-grande", type=int, default=30)
+    parser.add_argument("--tolerancia", type=float, default=1.5, help="p99 normal máximo (veces el de base)")
+    parser.add_argument("--sin-limites", action="store_true", help="Añade el modo sin ningún límite (lento)")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directorio:
+        normales = []
+        for i in range(20):
+            ruta = Path(directorio) / f"normal_{i:02d}.pdf"
+            generar_pdf(ruta, rng, rng.randint(1, 3), coma_decimal=rng.random() < 0.3, con_texto=rng.random() < 0.5)
+            normales.append(('normal', ruta.name, ruta.read_bytes()))
+        grandes = []
+        for i in range(2):
+            ruta = Path(directorio) / f"grande_{i}.pdf"
+            generar_pdf(ruta, rng, args.paginas_grande, coma_decimal=i == 1)
+            grandes.append(('grande', ruta.name, ruta.read_bytes()))
+        adversarios = []
+        for i in range(2):
+            ruta = Path(directorio) / f"confeti_{i}.pdf"
+            pdf_confeti(ruta, rng, args.caracteres, args.paginas_confeti)
+            adversarios.append(('confeti', ruta.name, ruta.read_bytes()))
+        ruta = Path(directorio) / "largo.pdf"
+        pdf_largo(ruta, args.paginas_largo)
+        adversarios.append(('largo', ruta.name, ruta.read_bytes()))
+
+        def repartir(peticiones, extra, n):
+            peticiones = list(peticiones)
+            paso = max(len(peticiones) // max(n, 1), 1)
+            for i in range(n):
+                peticiones.insert(min(i * paso + paso // 2 + i, len(peticiones)), extra[i % len(extra)])
+            return peticiones
+
+        # PDFs grandes y adversarios repartidos a lo largo de la prueba
+        base = repartir([normales[i % len(normales)] for i in range(args.normales)], grandes, args.grandes)
+        mezcla = repartir(base, adversarios, args.adversarios)
+
+        comun = {
+            'ANALYSIS_WORKERS': str(args.workers),
+            'ANALYSIS_TASK_TIMEOUT': str(args.timeout),
+            'ANALYSIS_WORKER_MAX_RSS_MB': str(args.max_rss),
+            'ANALYSIS_WORKER_MAX_TASKS': str(args.max_tareas),
+            'RESULT_CACHE_DIR': directorio,
+        }
+        modos = [
+            ('base', comun, base),
+            ('limites', comun, mezcla),
+            ('solo-pool', comun | SIN_LIMITES_PDF, mezcla),
+        ]
+        if args.sin_limites:
+            modos.append(('sin-limites', comun | SIN_LIMITES_PDF | SIN_LIMITES_POOL, mezcla))
+
+        print(f"{args.normales} peticiones normales, {args.grandes} grandes ({args.paginas_grande} páginas), "
+              f"{args.adversarios} adversarias, {args.clientes} clientes, "
+              f"{args.workers} workers; timeout {args.timeout:g} s, techo {args.max_rss:g} MB, "
+              f"reciclado cada {args.max_tareas} PDFs")
+        contexto = multiprocessing.get_context('spawn')
+        resultados = {}
+        for nombre, entorno, peticiones in modos:
+            cola = contexto.Queue()
+            proceso = contexto.Process(target=ejecutar, args=(entorno, peticiones, args.clientes, cola))
+            proceso.start()
+            resultados[nombre] = cola.get()
+            proceso.join()
+
+    errores = 0
+    p99_base = None
+    for nombre, (medidas, segundos, stats) in resultados.items():
+        normal = [latencia for tipo, latencia, ok, _ in medidas if tipo == 'normal']
+        fallos_normales = sum(not ok for tipo, _, ok, _ in medidas if tipo == 'normal')
+        grande = [(latencia, ok) for tipo, latencia, ok, _ in medidas if tipo == 'grande']
+        fallos_grandes = sum(not ok for _, ok in grande)
+        malos = [(tipo, latencia, ok, error) for tipo, latencia, ok, error in medidas if tipo not in ('normal', 'grande')]
+        p99 = percentil(normal, 0.99)
+        p99_base = p99 if nombre == 'base' else p99_base
+        print(f"\n{nombre}: {len(medidas) / segundos:,.1f} peticiones/s")
+        print(f"  normales:    p50 {statistics.median(normal) * 1000:>7,.0f} ms  p99 {p99 * 1000:>7,.0f} ms  "
+              f"máx {max(normal) * 1000:>7,.0f} ms  fallos {fallos_normales}")
+        if grande:
+            latencias = [latencia for latencia, _ in grande]
+            print(f"  grandes:     p50 {statistics.median(latencias) * 1000:>7,.0f} ms  "
+                  f"máx {max(latencias) * 1000:>7,.0f} ms  fallos {fallos_grandes}")
+        errores += fallos_grandes
+        if malos:
+            por_error = {}
+            for tipo, latencia, ok, error in malos:
+                clave = (tipo, 'ok' if ok else error)
+                por_error.setdefault(clave, []).append(latencia)
+            for (tipo, error), latencias in sorted(por_error.items()):
+                print(f"  {tipo:>8} x{len(latencias):<3} máx {max(latencias) * 1000:>7,.0f} ms  {error}")
+        reinicios = ", ".join(f"{motivo} {n}" for motivo, n in stats['restarts'].items() if n) or "ninguno"
+        print(f"  workers sustituidos: {reinicios}")
+
+        if nombre in ('limites', 'solo-pool'):
+            errores += fallos_normales + sum(ok for _, _, ok, _ in malos)
+        if nombre == 'limites' and p99 > args.tolerancia * p99_base:
+            print(f"  ERROR: el p99 normal supera {args.tolerancia:g} veces el de base")
+            errores += 1
+
+    if errores:
+        print("\nERROR: peticiones normales o grandes fallidas, adversarios no contenidos o p99 no acotado")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Mide por separado cada etapa del análisis sobre un corpus sintético:
+extracción, parseo, clasificación, serialización JSON y render del reporte PDF.
+
+Para cada etapa reporta latencia p50/p95 por documento, throughput y memoria
+pico (tracemalloc, en una pasada aparte para no distorsionar los tiempos; no
+ve la memoria nativa de PyMuPDF, por eso se añade también el RSS máximo), y
+escribe todo en un JSON que se puede comparar entre commits con --comparar.
+"""
+
+import io
+import sys
+import json
+import time
+import resource
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from corpus import generar_corpus
+from bench_render_pdf import TEXTO
+from pdf_processor import extraer_lineas, contar_paginas
+from data_extractor import parsear_lineas, clasificar
+from report_generator import create_medical_report_pdf
+from serializer import dumps
+
+
+def extraer(ruta):
+    return list(extraer_lineas(ruta))
+
+
+def serializar(resultados):
+    # Igual que analizar_pdf + json_response en la petición
+    return dumps({'results': [resultado.to_dict() for resultado in resultados]})
+
+
+def renderizar(_):
+    output = io.BytesIO()
+    create_medical_report_pdf(output, TEXTO)
+    return output.getvalue()
+
+
+def ejecutar_etapas(ruta):
+    """Ejecuta el pipeline completo sobre un PDF devolviendo (entrada, función) de cada etapa."""
+    lineas = extraer(ruta)
+    resultados = clasificar(parsear_lineas(lineas))
+    return {
+        'extraccion': (ruta, extraer),
+        'parseo': (lineas, parsear_lineas),
+        'clasificacion': (resultados, clasificar),
+        'serializacion': (resultados, serializar),
+        'reporte_pdf': (None, renderizar),
+    }, {'paginas': contar_paginas(ruta), 'lineas': len(lineas), 'filas': len(resultados)}
+
+
+UNIDADES = {
+    'extraccion': 'paginas',
+    'parseo': 'lineas',
+    'clasificacion': 'filas',
+    'serializacion': 'filas',
+    'reporte_pdf': None,
+}
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def medir(rutas, repeticiones):
+    tiempos = {etapa: [] for etapa in UNIDADES}
+    picos = {etapa: 0 for etapa in UNIDADES}
+    volumen = {'paginas': 0, 'lineas': 0, 'filas': 0}
+
+    for ruta in rutas:
+        etapas, tamanos = ejecutar_etapas(ruta)
+        for clave, valor in tamanos.items():
+            volumen[clave] += valor
+        for etapa, (entrada, fn) in etapas.items():
+            mejor = float('inf')
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                fn(entrada)
+                mejor = min(mejor, time.perf_counter() - inicio)
+            tiempos[etapa].append(mejor)
+
+            tracemalloc.start()
+            fn(entrada)
+            picos[etapa] = max(picos[etapa], tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+    resultados = {}
+    for etapa, unidad in UNIDADES.items():
+        total = sum(tiempos[etapa])
+        cantidad = volumen[unidad] if unidad else len(rutas)
+        resultados[etapa] = {
+            'documentos': len(rutas),
+            'p50_ms': percentil(tiempos[etapa], 0.5) * 1000,
+            'p95_ms': percentil(tiempos[etapa], 0.95) * 1000,
+            'total_s': total,
+            'throughput': cantidad / total if total else 0.0,
+            'unidad': f"{unidad or 'reportes'}/s",
+            'pico_memoria_bytes': picos[etapa],
+        }
+    return resultados, volumen
+
+
+def commit_actual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(anterior, actual):
+    print(f"\nComparación con {anterior.get('commit') or 'referencia'} (p50):")
+    for etapa, medida in actual['etapas'].items():
+        previa = anterior.get('etapas', {}).get(etapa)
+        if not previa or not previa['p50_ms']:
+            continue
+        cambio = (medida['p50_ms'] - previa['p50_ms']) / previa['p50_ms'] * 100
+        print(f"  {etapa:>14}: {previa['p50_ms']:8.2f} ms -> {medida['p50_ms']:8.2f} ms ({cambio:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("corpus", nargs="?", help="Directorio con PDFs (por defecto se genera uno sintético)")
+    parser.add_argument("--archivos", type=int, default=20)
+    parser.add_argument("--max-paginas", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--salida", default="bench_etapas.json", help="Fichero JSON de resultados")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior para mostrar la diferencia")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.corpus:
+            rutas = sorted(Path(args.corpus).glob("*.pdf"))
+        else:
+            rutas = generar_corpus(tmp_dir, args.archivos, args.max_paginas, args.seed)
+        etapas, volumen = medir(rutas, args.repeticiones)
+
+    resultado = {
+        'commit': commit_actual(),
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'parametros': {
+            'corpus': args.corpus, 'archivos': len(rutas), 'max_paginas': args.max_paginas,
+            'seed': args.seed, 'repeticiones': args.repeticiones,
+        },
+        'volumen': volumen,
+        'rss_maximo_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        'etapas': etapas,
+    }
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, indent=2)
+
+    print(f"Corpus: {len(rutas)} PDFs, {volumen['paginas']} páginas, {volumen['lineas']} líneas, {volumen['filas']} resultados")
+    for etapa, medida in etapas.items():
+        print(
+            f"  {etapa:>14}: p50 {medida['p50_ms']:8.2f} ms  p95 {medida['p95_ms']:8.2f} ms  "
+            f"{medida['throughput']:12,.0f} {medida['unidad']:<12} pico {medida['pico_memoria_bytes'] / 2**20:6.1f} MiB"
+        )
+    print(f"RSS máximo del proceso: {resultado['rss_maximo_bytes'] / 2**20:.0f} MiB")
+    print(f"Resultados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            comparar(json.load(f), resultado)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
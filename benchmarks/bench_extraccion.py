@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Compara los motores de extracción (PyMuPDF vs pdfplumber) sobre el mismo corpus:
+páginas/segundo y si ambos producen los mismos resultados parseados.
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from corpus import generar_corpus
+from pdf_processor import MOTORES, extraer_lineas, contar_paginas
+from data_extractor import parsear_lineas_a_dataframe
+
+
+def medir_motor(motor, rutas):
+    paginas = 0
+    resultados = {}
+    inicio = time.perf_counter()
+    for ruta in rutas:
+        paginas += contar_paginas(ruta, motor)
+        df = parsear_lineas_a_dataframe(extraer_lineas(ruta, motor))
+        resultados[ruta.name] = df
+    return paginas, time.perf_counter() - inicio, resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("corpus", nargs="?", help="Directorio con PDFs (por defecto se genera uno sintético)")
+    parser.add_argument("--archivos", type=int, default=20)
+    parser.add_argument("--max-paginas", type=int, default=40)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.corpus:
+            rutas = sorted(Path(args.corpus).glob("*.pdf"))
+        else:
+            rutas = generar_corpus(tmp_dir, args.archivos, args.max_paginas)
+
+        medidas = {motor: medir_motor(motor, rutas) for motor in MOTORES}
+
+    print(f"Corpus: {len(rutas)} PDFs")
+    for motor, (paginas, segundos, _) in medidas.items():
+        print(f"{motor:>10}: {paginas} páginas en {segundos:.2f}s -> {paginas / segundos:.1f} páginas/s")
+
+    referencia = medidas['pdfplumber'][2]
+    diferentes = [
+        nombre for nombre, df in medidas['pymupdf'][2].items()
+        if not df.equals(referencia[nombre])
+    ]
+    if diferentes:
+        print(f"Resultados distintos en {len(diferentes)} PDFs: {', '.join(diferentes[:10])}")
+        return 1
+    print("Resultados parseados idénticos en ambos motores")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Compara la extracción con la sonda de páginas (se saltan portadas, metodología
+y texto legal) frente al modo estricto: páginas descartadas, tiempo de
+extracción + parseo y si ambos modos producen los mismos resultados.
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from corpus import generar_corpus
+from pdf_processor import MOTORES, extraer_lineas
+from data_extractor import parsear_lineas_a_dataframe
+
+
+def medir(rutas, motor, filtrar):
+    paginas = omitidas = 0
+    resultados = {}
+    inicio = time.perf_counter()
+    for ruta in rutas:
+        estadisticas = {}
+        resultados[ruta.name] = parsear_lineas_a_dataframe(
+            extraer_lineas(ruta, motor, filtrar=filtrar, estadisticas=estadisticas)
+        )
+        paginas += estadisticas['total']
+        omitidas += estadisticas['skipped']
+    return paginas, omitidas, time.perf_counter() - inicio, resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("corpus", nargs="?", help="Directorio con PDFs (por defecto se genera uno sintético)")
+    parser.add_argument("--archivos", type=int, default=40)
+    parser.add_argument("--max-paginas", type=int, default=6)
+    parser.add_argument("--motor", choices=list(MOTORES), default="pymupdf")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.corpus:
+            rutas = sorted(Path(args.corpus).glob("*.pdf"))
+        else:
+            rutas = generar_corpus(tmp_dir, args.archivos, args.max_paginas)
+
+        paginas, _, t_estricto, esperado = medir(rutas, args.motor, False)
+        _, omitidas, t_filtrado, obtenido = medir(rutas, args.motor, True)
+
+    print(f"Corpus: {len(rutas)} PDFs, {paginas} páginas ({args.motor})")
+    print(f"  estricto: {t_estricto:.2f}s")
+    print(f"  filtrado: {t_filtrado:.2f}s ({omitidas} páginas descartadas, {omitidas / paginas:.0%}; {t_estricto / t_filtrado:.2f}x)")
+
+    diferentes = [nombre for nombre, df in obtenido.items() if not df.equals(esperado[nombre])]
+    if diferentes:
+        print(f"Resultados distintos en {len(diferentes)} PDFs: {', '.join(diferentes[:10])}")
+        return 1
+    print("Resultados idénticos en ambos modos")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga de /api/generate-pdf contra el backend LLM local (stub), para
+medir la sobrecarga del servidor sin la latencia del modelo.
+"""
+
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from llm_client import StubBackend, configurar_backend
+
+
+def resultados_aleatorios(rng, filas):
+    return [
+        {
+            'test': f'Test {i}',
+            'value': round(rng.uniform(0, 200), 1),
+            'unit': 'mg/dL',
+            'refLow': 70.0,
+            'refHigh': 100.0,
+            'status': rng.choice(['Normal', 'Near', 'Low', 'High'])
+        }
+        for i in range(filas)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--peticiones", type=int, default=200)
+    parser.add_argument("--concurrencia", type=int, default=8)
+    parser.add_argument("--filas", type=int, default=30)
+    parser.add_argument("--latencia-modelo", type=float, default=0.0, help="Latencia simulada del stub (s)")
+    args = parser.parse_args()
+
+    configurar_backend(StubBackend(latency=args.latencia_modelo))
+    from app import app
+    client = app.test_client()
+
+    rng = random.Random(1234)
+    # Resultados distintos en cada petición para no medir la caché de reportes
+    cuerpos = [{'type': 'patient', 'results': resultados_aleatorios(rng, args.filas)} for _ in range(args.peticiones)]
+
+    def peticion(cuerpo):
+        inicio = time.perf_counter()
+        response = client.post('/api/generate-pdf', json=cuerpo)
+        assert response.status_code == 200, response.get_data(as_text=True)
+        return time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrencia) as pool:
+        latencias = sorted(pool.map(peticion, cuerpos))
+    total = time.perf_counter() - inicio
+
+    print(f"{args.peticiones} peticiones, concurrencia {args.concurrencia}, latencia del modelo {args.latencia_modelo}s")
+    print(f"  {args.peticiones / total:.1f} peticiones/s")
+    print(f"  p50 {latencias[len(latencias) // 2] * 1000:.1f} ms, p95 {latencias[int(len(latencias) * 0.95)] * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
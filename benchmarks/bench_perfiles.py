@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Perfiles de layout frente al parser genérico sobre PDFs de varias plantillas
+de laboratorio (dos con perfil y una desconocida): tasa de reconocimiento,
+filas correctas, perdidas y falsas, y throughput del parseo por plantilla.
+"""
+
+import sys
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from corpus import BIOMARCADORES, PLANTILLAS, generar_pdf
+from pdf_processor import extraer_lineas
+from data_extractor import parsear_lineas_a_columnas
+from layout_profiles import detectar_perfil, perfil_para_huella
+
+NOMBRES = {nombre for nombre, *_ in BIOMARCADORES}
+
+
+def extraer(ruta):
+    estadisticas = {}
+    lineas = list(extraer_lineas(ruta, 'pymupdf', estadisticas=estadisticas))
+    return lineas, estadisticas['page_size']
+
+
+def medir(documentos, con_perfil, repeticiones):
+    """Segundos de parseo (el mejor de `repeticiones`) y columnas de cada documento."""
+    mejor, salidas = float('inf'), None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        salidas = [
+            parsear_lineas_a_columnas(lineas, detectar_perfil(lineas, tamano) if con_perfil else None)
+            for lineas, tamano, _ in documentos
+        ]
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, salidas
+
+
+def calidad(documentos, salidas):
+    correctas = falsas = esperadas = 0
+    for (_, _, filas_esperadas), columnas in zip(documentos, salidas):
+        esperadas += filas_esperadas
+        buenas = sum(test in NOMBRES for test in columnas['Test'])
+        correctas += buenas
+        falsas += len(columnas['Test']) - buenas
+    return correctas, esperadas - correctas, falsas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--archivos", type=int, default=20, help="PDFs por plantilla")
+    parser.add_argument("--max-paginas", type=int, default=4)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    por_plantilla = {}
+    with tempfile.TemporaryDirectory() as directorio:
+        for plantilla in PLANTILLAS:
+            documentos = []
+            for i in range(args.archivos):
+                ruta = Path(directorio) / f"{plantilla}_{i:03d}.pdf"
+                paginas = rng.randint(1, args.max_paginas)
+                generar_pdf(
+                    ruta, rng, paginas, coma_decimal=rng.random() < 0.3, cientifica=0.5,
+                    con_texto=rng.random() < 0.5, plantilla=plantilla
+                )
+                documentos.append((*extraer(ruta), paginas * 25))
+            por_plantilla[plantilla] = documentos
+
+    errores = 0
+    print(f"{args.archivos} PDFs por plantilla, parseo: mejor de {args.repeticiones}")
+    for plantilla, documentos in por_plantilla.items():
+        reconocidos = [detectar_perfil(lineas, tamano) for lineas, tamano, _ in documentos]
+        perfiles = sorted({perfil.id for perfil in reconocidos if perfil is not None})
+        lineas_totales = sum(len(lineas) for lineas, _, _ in documentos)
+        print(f"\n{plantilla}: {sum(p is not None for p in reconocidos)}/{len(documentos)} reconocidos "
+              f"({', '.join(perfiles) or 'sin perfil'}), {lineas_totales} líneas")
+
+        for nombre, con_perfil in (('genérico', False), ('perfil', True)):
+            segundos, salidas = medir(documentos, con_perfil, args.repeticiones)
+            correctas, perdidas, falsas = calidad(documentos, salidas)
+            print(f"  {nombre:>8}: {lineas_totales / segundos:>10,.0f} líneas/s   "
+                  f"filas correctas {correctas}, perdidas {perdidas}, falsas {falsas}")
+            if con_perfil and perfiles and (perdidas or falsas):
+                errores += 1
+
+    info = perfil_para_huella.cache_info()
+    print(f"\nCaché de huellas: {info.hits} aciertos, {info.misses} fallos, {info.currsize} huellas distintas")
+    if errores:
+        print("ERROR: un perfil perdió filas o produjo filas falsas")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Tamaño de los prompts de los reportes IA en formato 'verbose' (una frase por
+resultado) frente a 'compact' (tabla densa, normales agrupados), sobre paneles
+sintéticos de distintos tamaños: caracteres, bytes y tokens de entrada.
+
+Los tokens se cuentan con el tokenizador local de google-genai si está
+disponible (necesita sentencepiece y descargar el modelo una vez), con la API
+de Gemini (--tokenizador api, requiere GEMINI_API_KEY) o, si no, con una
+estimación aproximada que se indica como tal en la salida.
+"""
+
+import os
+import re
+import sys
+import random
+import argparse
+import statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from corpus import generar_lineas
+from data_extractor import parsear_lineas, clasificar
+from report_generator import GEMINI_MODEL, FORMATOS_PROMPT, construir_prompt, _compact_range_text, _number_text
+
+# Aproximación a un tokenizador SentencePiece: cada dígito y cada signo es un
+# token y las palabras largas se parten en trozos de unas 6 letras
+_PIEZAS = re.compile(r"\d|[^\W\d_]+|[^\w\s]")
+
+
+def estimar_tokens(texto):
+    return sum(1 + (len(pieza) - 1) // 6 if pieza[0].isalpha() else 1 for pieza in _PIEZAS.findall(texto))
+
+
+def contador_de_tokens(tipo):
+    """Devuelve (nombre, función texto -> tokens)."""
+    if tipo in ('auto', 'local'):
+        try:
+            from google.genai.local_tokenizer import LocalTokenizer
+
+            tokenizador = LocalTokenizer(model_name=GEMINI_MODEL)
+            tokenizador.count_tokens("prueba")
+            return f"tokenizador local ({GEMINI_MODEL})", lambda texto: tokenizador.count_tokens(texto).total_tokens
+        except Exception as e:
+            if tipo == 'local':
+                raise
+            print(f"Tokenizador local no disponible ({type(e).__name__}); se usa una estimación")
+    if tipo == 'api':
+        import google.genai as genai
+
+        cliente = genai.Client(api_key=os.environ["GEMINI_API_KEY"])
+        return f"API de Gemini ({GEMINI_MODEL})", lambda texto: cliente.models.count_tokens(
+            model=GEMINI_MODEL, contents=texto
+        ).total_tokens
+    return "estimación aproximada", estimar_tokens
+
+
+def panel(rng, filas):
+    resultados = clasificar(parsear_lineas(generar_lineas(rng, filas, coma_decimal=rng.random() < 0.3)))
+    # Los paneles reales son mayoritariamente normales: se recolocan los valores
+    # de parte de las filas fuera de rango dentro de su rango de referencia
+    for resultado in resultados:
+        if resultado.status != "Normal" and rng.random() < 0.6:
+            alto = resultado.ref_high if resultado.ref_high != float('inf') else resultado.ref_low * 1.5
+            resultado.value = round(rng.uniform(max(resultado.ref_low, 0.0), alto), 1)
+    return clasificar(resultados)
+
+
+def incompletos(resultados, prompt):
+    """Resultados cuya información no llega al prompt compacto: todos los nombres
+    deben aparecer, y los no normales con su valor, rango y estado."""
+    return [
+        r for r in resultados
+        if r.test not in prompt or (r.status != "Normal" and (
+            f"|{_number_text(r.value)}|{r.unit}|{_compact_range_text(r)}|{r.status}" not in prompt
+        ))
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paneles", type=int, default=50, help="Paneles por tamaño")
+    parser.add_argument("--filas", type=int, nargs="+", default=[10, 30, 100])
+    parser.add_argument("--tipo", choices=("patient", "doctor"), default="patient")
+    parser.add_argument("--tokenizador", choices=("auto", "local", "api", "estimacion"), default="auto")
+    parser.add_argument("--mostrar", action="store_true", help="Imprime un prompt de ejemplo de cada formato")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    nombre_tokenizador, contar_tokens = contador_de_tokens(args.tokenizador)
+    rng = random.Random(args.seed)
+    print(f"Reporte '{args.tipo}', {args.paneles} paneles por tamaño, tokens: {nombre_tokenizador}")
+
+    perdidos = 0
+    for filas in args.filas:
+        paneles = [panel(rng, filas) for _ in range(args.paneles)]
+        perdidos += sum(len(incompletos(p, construir_prompt(p, args.tipo, 'compact'))) for p in paneles)
+        normales = statistics.mean(sum(r.status == "Normal" for r in p) / len(p) for p in paneles)
+        print(f"\n{filas} filas por panel ({normales:.0%} normales), medianas:")
+        medidas = {}
+        for formato in FORMATOS_PROMPT:
+            prompts = [construir_prompt(p, args.tipo, formato) for p in paneles]
+            medidas[formato] = {
+                'caracteres': statistics.median(len(prompt) for prompt in prompts),
+                'bytes': statistics.median(len(prompt.encode('utf-8')) for prompt in prompts),
+                'tokens': statistics.median(contar_tokens(prompt) for prompt in prompts),
+            }
+            if args.mostrar and filas == args.filas[0]:
+                print(f"--- {formato} ---\n{prompts[0]}\n---")
+        for formato, medida in sorted(medidas.items()):
+            ahorro = 1 - medida['tokens'] / medidas['verbose']['tokens']
+            print(
+                f"  {formato:>8}: {medida['caracteres']:>7,.0f} caracteres  {medida['bytes']:>7,.0f} bytes  "
+                f"{medida['tokens']:>6,.0f} tokens" + (f"  ({ahorro:.0%} menos)" if formato != 'verbose' else "")
+            )
+
+    if perdidos:
+        print(f"\nERROR: {perdidos} resultados no aparecen completos en el prompt compacto")
+        return 1
+    print("\nEl prompt compacto conserva todos los resultados (nombres; valor, rango y estado de los no normales)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
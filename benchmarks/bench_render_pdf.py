@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Mide reportes/segundo y RSS pico al renderizar muchos reportes PDF: render en
+memoria con estilos cacheados frente al render original (hoja de estilos nueva
+por llamada y NamedTemporaryFile en disco). Cada modo corre en su propio
+proceso para que el RSS pico sea comparable.
+"""
+
+import os
+import sys
+import time
+import resource
+import argparse
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+TEXTO = "\n\n".join([
+    "Your results show that most of your blood values are within the normal range. "
+    "Glucose, hemoglobin and kidney function markers look healthy.",
+    "Your LDL cholesterol is slightly above the recommended limit. Consider reducing "
+    "saturated fats, adding more fiber and walking at least 30 minutes a day.",
+    "Remember, this is an interpretation to help you understand your results. "
+    "It does not replace a consultation with your doctor.",
+] * 3)
+
+
+def render_original(texto, directorio):
+    from reportlab.platypus import SimpleDocTemplate, Paragraph
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.enums import TA_JUSTIFY
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.units import inch
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf', dir=directorio) as temp_pdf:
+        doc = SimpleDocTemplate(temp_pdf.name, pagesize=letter, topMargin=inch, bottomMargin=inch, leftMargin=inch, rightMargin=inch)
+        styles = getSampleStyleSheet()
+        styles.add(ParagraphStyle(name="Normal_Justified", parent=styles["Normal"], alignment=TA_JUSTIFY, spaceAfter=12, leading=14))
+        Story = [Paragraph(block.strip(), styles["Normal_Justified"]) for block in texto.strip().split('\n\n') if block.strip()]
+        doc.build(Story)
+    with open(temp_pdf.name, 'rb') as f:
+        return f.read()
+
+
+def ejecutar(modo, renders, cola):
+    from report_generator import render_medical_report_pdf, render_medical_reports_pdf
+
+    with tempfile.TemporaryDirectory() as directorio:
+        inicio = time.perf_counter()
+        for _ in range(renders):
+            if modo == 'original':
+                render_original(TEXTO, directorio)
+            elif modo == 'memoria':
+                render_medical_report_pdf(TEXTO)
+            else:
+                render_medical_reports_pdf([('Patient report', TEXTO), ('Doctor report', TEXTO)])
+        segundos = time.perf_counter() - inicio
+        temporales = len(os.listdir(directorio))
+
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    cola.put((modo, renders / segundos, rss_mb, temporales))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--renders", type=int, default=10000)
+    args = parser.parse_args()
+
+    cola = multiprocessing.Queue()
+    for modo in ('original', 'memoria', 'combinado'):
+        proceso = multiprocessing.Process(target=ejecutar, args=(modo, args.renders, cola))
+        proceso.start()
+        proceso.join()
+        modo, rps, rss_mb, temporales = cola.get()
+        print(f"{modo:>10}: {rps:7.1f} reportes/s, RSS pico {rss_mb:6.1f} MB, archivos temporales sin borrar: {temporales}")
+    print("('combinado' renderiza dos reportes por PDF en una sola pasada)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
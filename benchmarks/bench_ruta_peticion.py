@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Latencia por petición y RSS del camino de análisis de un panel típico (~30
+filas): el camino original con pandas (DataFrame, rename, to_json + json.loads,
+value_counts e iterrows para el prompt) frente a LabResult. Cada modo corre en
+su propio proceso para que el tiempo de importación y el RSS sean comparables.
+"""
+
+import sys
+import time
+import json
+import random
+import argparse
+import multiprocessing
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+COLUMNAS_API = {
+    'Test': 'test', 'Value': 'value', 'Unit': 'unit', 'Ref Low': 'refLow',
+    'Ref High': 'refHigh', 'Status': 'status', 'Canonical ID': 'canonicalId',
+}
+
+
+def peticion_pandas(lineas):
+    import pandas as pd
+    from data_extractor import parsear_lineas_a_dataframe, clasificar_resultados
+
+    df = clasificar_resultados(parsear_lineas_a_dataframe(lineas)).rename(columns=COLUMNAS_API)
+    status_counts = df['status'].value_counts()
+    respuesta = {
+        'results': json.loads(df.to_json(orient='records')),
+        'summary': {
+            'normal': int(status_counts.get('Normal', 0)),
+            'near': int(status_counts.get('Near', 0)),
+            'abnormal': int(status_counts.get('Low', 0) + status_counts.get('High', 0)),
+            'total': int(len(df))
+        }
+    }
+    # generate-pdf: DataFrame a partir del JSON y iterrows para el texto del prompt
+    lineas_prompt = []
+    for _, row in pd.DataFrame(respuesta['results']).iterrows():
+        row_dict = row.to_dict()
+        lineas_prompt.append(
+            f"{row_dict['test']}: {row_dict['value']} {row_dict['unit']} "
+            f"(reference range {row_dict['refLow']}–{row_dict['refHigh']}). Status: {row_dict['status']}."
+        )
+    return respuesta, "\n".join(lineas_prompt)
+
+
+def peticion_labresult(lineas):
+    from data_extractor import parsear_lineas, clasificar
+    from lab_results import LabResult, resumir
+    from report_generator import _lab_results_to_text
+
+    resultados = clasificar(parsear_lineas(lineas))
+    respuesta = {
+        'results': [resultado.to_dict() for resultado in resultados],
+        'summary': resumir(resultados)
+    }
+    texto = _lab_results_to_text([LabResult.from_dict(r) for r in respuesta['results']])
+    return respuesta, texto
+
+
+MODOS = {'pandas': peticion_pandas, 'labresult': peticion_labresult}
+
+
+def rss_maximo_mb():
+    # ru_maxrss hereda el máximo del padre al hacer fork; VmHWM es del proceso actual
+    with open('/proc/self/status') as f:
+        for linea in f:
+            if linea.startswith('VmHWM:'):
+                return int(linea.split()[1]) / 1024
+    return float('nan')
+
+
+def ejecutar(modo, lineas, peticiones, cola):
+    inicio = time.perf_counter()
+    if modo == 'pandas':
+        import pandas  # noqa: F401
+        import data_extractor  # noqa: F401
+    else:
+        import data_extractor  # noqa: F401
+        import report_generator  # noqa: F401
+    t_import = time.perf_counter() - inicio
+
+    fn = MODOS[modo]
+    fn(lineas)
+    tiempos = []
+    for _ in range(peticiones):
+        inicio = time.perf_counter()
+        fn(lineas)
+        tiempos.append(time.perf_counter() - inicio)
+    tiempos.sort()
+    cola.put({
+        'import_s': t_import,
+        'p50_ms': tiempos[len(tiempos) // 2] * 1000,
+        'p95_ms': tiempos[int(len(tiempos) * 0.95)] * 1000,
+        'rss_mb': rss_maximo_mb(),
+        'pandas_cargado': 'pandas' in sys.modules,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--filas", type=int, default=30)
+    parser.add_argument("--peticiones", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    from corpus import generar_lineas
+    lineas = generar_lineas(random.Random(args.seed), args.filas)
+
+    esperado, _ = peticion_pandas(lineas)
+    obtenido, _ = peticion_labresult(lineas)
+    # El JSON de pandas no distingue rangos abiertos (null sin rangeType): se comparan el resto de campos
+    iguales = esperado['summary'] == obtenido['summary'] and all(
+        all(fila_e[k] == fila_o[k] for k in fila_e)
+        for fila_e, fila_o in zip(esperado['results'], obtenido['results'])
+    ) and len(esperado['results']) == len(obtenido['results'])
+
+    contexto = multiprocessing.get_context('spawn')
+    print(f"Panel de {args.filas} filas, {args.peticiones} peticiones por modo")
+    for modo in MODOS:
+        cola = contexto.Queue()
+        proceso = contexto.Process(target=ejecutar, args=(modo, lineas, args.peticiones, cola))
+        proceso.start()
+        medida = cola.get()
+        proceso.join()
+        print(
+            f"  {modo:>9}: p50 {medida['p50_ms']:.3f} ms  p95 {medida['p95_ms']:.3f} ms  "
+            f"import {medida['import_s'] * 1000:.0f} ms  RSS {medida['rss_mb']:.0f} MB  "
+            f"pandas cargado: {'sí' if medida['pandas_cargado'] else 'no'}"
+        )
+
+    if not iguales:
+        print("ERROR: las respuestas de ambos caminos difieren")
+        return 1
+    print("Respuestas idénticas en ambos caminos")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
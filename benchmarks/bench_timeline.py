@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Persistencia de análisis en el timeline (SQLite en un archivo temporal):
+una transacción por análisis en la petición (síncrono) frente al escritor
+diferido (timeline_writer) con distintos tamaños de lote.
+
+Para cada modo se mide lo que espera la petición (latencia p50/p99 de guardar
+o de encolar) y el throughput hasta que todo está en la base de datos.
+"""
+
+import sys
+import time
+import sqlite3
+import random
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+from datetime import datetime, timedelta
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import sqlalchemy as sa
+
+from corpus import generar_lineas
+from data_extractor import parsear_lineas, clasificar
+from timeline_store import crear_engine as engine_timeline, metadata, user, timeline, lab_result, guardar_analisis
+from timeline_writer import TimelineWriter
+
+
+def analisis(rng, n, filas, usuarios):
+    inicio = datetime(2020, 1, 1)
+    return [
+        (
+            rng.randint(1, usuarios),
+            inicio + timedelta(days=rng.randint(0, 1500)),
+            [r.to_dict() for r in clasificar(parsear_lineas(generar_lineas(rng, filas)))]
+        )
+        for _ in range(n)
+    ]
+
+
+def crear_engine(ruta, usuarios):
+    engine = engine_timeline(f"sqlite:///{ruta}")
+    metadata.create_all(engine)
+    # timeline.user_id apunta a user.id: los usuarios deben existir antes de guardar
+    with engine.begin() as conn:
+        conn.execute(user.insert(), [
+            {
+                'id': i, 'username': f"bench-{i}", 'email': f"bench-{i}@example.invalid",
+                'password_hash': '!', 'created_at': datetime(2020, 1, 1),
+            }
+            for i in range(1, usuarios + 1)
+        ])
+    return engine
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(int(len(valores) * p), len(valores) - 1)]
+
+
+def sincrono(engine, datos):
+    latencias = []
+    inicio = time.perf_counter()
+    for item in datos:
+        t = time.perf_counter()
+        with engine.begin() as conn:
+            guardar_analisis(conn, *item)
+        latencias.append(time.perf_counter() - t)
+    return latencias, time.perf_counter() - inicio, None
+
+
+def diferido(engine, datos, tamano_lote, intervalo):
+    escritor = TimelineWriter(engine, tamano_lote=tamano_lote, intervalo=intervalo, capacidad=len(datos) + 1)
+    latencias = []
+    inicio = time.perf_counter()
+    for item in datos:
+        t = time.perf_counter()
+        escritor.encolar(*item)
+        latencias.append(time.perf_counter() - t)
+    escritor.cerrar(timeout=600)
+    return latencias, time.perf_counter() - inicio, escritor.stats()
+
+
+def contar(engine):
+    with engine.connect() as conn:
+        return (
+            conn.execute(sa.select(sa.func.count()).select_from(timeline)).scalar(),
+            conn.execute(sa.select(sa.func.count()).select_from(lab_result)).scalar(),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--analisis", type=int, default=2000)
+    parser.add_argument("--filas", type=int, default=30, help="Resultados por análisis")
+    parser.add_argument("--usuarios", type=int, default=50)
+    parser.add_argument("--lotes", type=int, nargs="+", default=[1, 10, 100, 500])
+    parser.add_argument("--intervalo", type=float, default=0.05, help="Segundos máximos de espera de un lote")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    datos = analisis(random.Random(args.seed), args.analisis, args.filas, args.usuarios)
+    print(f"{args.analisis} análisis de {args.filas} resultados, SQLite {sqlite3.sqlite_version}, SQLAlchemy {sa.__version__}")
+    print(f"{'modo':>17} {'p50 petición':>13} {'p99 petición':>13} {'análisis/s':>11} {'filas/s':>10} {'volcados':>9}")
+
+    errores = 0
+    modos = [('síncrono', None)] + [(f"diferido lote {n}", n) for n in args.lotes]
+    with tempfile.TemporaryDirectory() as directorio:
+        for i, (nombre, tamano_lote) in enumerate(modos):
+            engine = crear_engine(Path(directorio) / f"timeline_{i}.db", args.usuarios)
+            if tamano_lote is None:
+                latencias, segundos, stats = sincrono(engine, datos)
+            else:
+                latencias, segundos, stats = diferido(engine, datos, tamano_lote, args.intervalo)
+            analisis_guardados, filas = contar(engine)
+            engine.dispose()
+            if analisis_guardados != len(datos):
+                errores += 1
+            print(
+                f"{nombre:>17} {statistics.median(latencias) * 1e6:>10,.0f} µs {percentil(latencias, 0.99) * 1e6:>10,.0f} µs "
+                f"{analisis_guardados / segundos:>11,.0f} {filas / segundos:>10,.0f} "
+                f"{stats['flushes'] if stats else analisis_guardados:>9}"
+            )
+
+    if errores:
+        print("ERROR: no se guardaron todos los análisis")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
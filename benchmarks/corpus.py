@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Generador reproducible de PDFs de laboratorio sintéticos para los benchmarks.
+
+Cada PDF tiene entre 1 y --max-paginas páginas y mezcla líneas con rango y con
+umbral ('<'/'>'); algunos informes usan coma decimal y los valores grandes
+pueden aparecer en notación científica (2.5E5), como en los laboratorios reales.
+Algunos llevan además páginas sin resultados (portada, metodología, texto legal).
+Además de la plantilla por defecto hay otras de laboratorios distintos (otro
+membrete, tamaño de página y formato de fila) para los perfiles de layout.
+"""
+
+import sys
+import math
+import random
+import argparse
+from pathlib import Path
+
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import A4, letter
+
+BIOMARCADORES = [
+    # (nombre, unidad, ref_low, ref_high) -- ref_low None => umbral "<", ref_high None => umbral ">"
+    ("Glucose", "mg/dL", 70, 100),
+    ("Hemoglobin", "g/dL", 12.0, 16.0),
+    ("Hematocrit", "%", 36, 46),
+    ("Creatinine", "mg/dL", 0.6, 1.2),
+    ("Urea", "mg/dL", 15, 45),
+    ("Sodium", "mmol/L", 135, 145),
+    ("Potassium", "mmol/L", 3.5, 5.1),
+    ("Platelets", "/uL", 150000, 450000),
+    ("TSH", "uUI/mL", 0.4, 4.0),
+    ("LDL Cholesterol", "mg/dL", None, 130),
+    ("Triglycerides", "mg/dL", None, 150),
+    ("HDL Cholesterol", "mg/dL", 40, None),
+    ("Vitamin D", "ng/mL", 30, None),
+]
+
+TEXTO_RELLENO = [
+    "Method: enzymatic colorimetric assay. Sample: serum.",
+    "Results validated by the laboratory director.",
+    "Reference values according to age and sex of the patient.",
+]
+
+
+# Páginas sin resultados: portada, metodología y texto legal con firma
+PAGINAS_SIN_RESULTADOS = [
+    [
+        "LABORATORIO CLINICO CENTRAL",
+        "Informe de resultados de laboratorio",
+        "Paciente: Juan Perez Garcia",
+        "Fecha de emision: 12/03/2024",
+        "Medico solicitante: Dra. Ana Lopez",
+    ],
+    [
+        "Metodologia",
+        "Las determinaciones bioquimicas se realizan mediante espectrofotometria",
+        "en analizadores automaticos calibrados diariamente con controles internos.",
+        "El hemograma se obtiene por citometria de flujo y impedancia electrica.",
+        "Los valores de referencia dependen de la edad y el sexo del paciente.",
+    ],
+    [
+        "Aviso legal",
+        "Este informe es confidencial y esta dirigido exclusivamente a su destinatario.",
+        "Los datos personales se tratan conforme a la normativa de proteccion de datos.",
+        "La interpretacion de los resultados corresponde al medico solicitante.",
+        "Firmado electronicamente por el director del laboratorio.",
+    ],
+]
+
+
+def _formatear(valor, decimales, coma_decimal=False, cientifica=False):
+    if cientifica:
+        exponente = int(math.floor(math.log10(valor)))
+        texto = f"{valor / 10 ** exponente:.1f}E{exponente}"
+    else:
+        texto = f"{valor:.{decimales}f}"
+    return texto.replace(".", ",") if coma_decimal else texto
+
+
+def generar_lineas(rng, n_resultados, coma_decimal=False, cientifica=0.0, banderas=False):
+    """Líneas de resultados; `cientifica` es la probabilidad de escribir en notación
+    científica los valores >= 10000. Con `banderas`, los valores fuera de rango
+    llevan detrás una H o una L, como en algunos laboratorios."""
+    lineas = []
+    for _ in range(n_resultados):
+        nombre, unidad, low, high = rng.choice(BIOMARCADORES)
+        base_low = low if low is not None else high * 0.5
+        base_high = high if high is not None else low * 1.5
+        valor = rng.uniform(base_low * 0.6, base_high * 1.4)
+        decimales = 0 if base_high >= 100 else 1
+        en_cientifica = cientifica > 0 and valor >= 10000 and rng.random() < cientifica
+        texto = _formatear(valor, decimales, coma_decimal, en_cientifica)
+        if banderas and high is not None and valor > high:
+            texto += " H"
+        elif banderas and low is not None and valor < low:
+            texto += " L"
+        ref_low, ref_high = (
+            str(ref).replace(".", ",") if coma_decimal and ref is not None else ref
+            for ref in (low, high)
+        )
+        if low is None:
+            lineas.append(f"{nombre} {texto} {unidad} < {ref_high}")
+        elif high is None:
+            lineas.append(f"{nombre} {texto} {unidad} > {ref_low}")
+        else:
+            lineas.append(f"{nombre} {texto} {unidad} {ref_low} - {ref_high}")
+    return lineas
+
+
+def _pagina_de_texto(c, lineas):
+    y = 740
+    for linea in lineas:
+        c.drawString(72, y, linea)
+        y -= 16
+    c.showPage()
+
+
+def _cabecera_norte(rng):
+    # Fechas y códigos en celdas separadas: el parser genérico los confunde con resultados
+    return [
+        "BIOANALISIS DEL NORTE",
+        f"Fecha de toma {rng.randint(1, 28):02d} {rng.randint(1, 12):02d} 2024 Hora {rng.randint(7, 11):02d} {rng.randint(0, 59):02d}",
+        f"Codigo de barras {rng.randint(1000, 9999)} {rng.randint(1000, 9999)} {rng.randint(1000, 9999)}",
+        "Prueba Resultado Unidad Referencia",
+    ]
+
+
+# Plantillas de laboratorio: membrete, tamaño de página, formato de fila y pie.
+# 'central' y 'norte' tienen perfil en resources/layout_profiles; 'san_rafael' no
+PLANTILLAS = {
+    'central': {
+        'cabecera': lambda rng: ["LABORATORIO CLINICO CENTRAL", "Informe de resultados"],
+        'tamano': letter, 'banderas': False, 'pie': "Page {numero} of {paginas}",
+    },
+    'norte': {
+        'cabecera': _cabecera_norte,
+        'tamano': A4, 'banderas': True, 'pie': "Hoja {numero} de {paginas}",
+    },
+    'san_rafael': {
+        'cabecera': lambda rng: ["CLINICA SAN RAFAEL", "Resultados de analisis clinicos"],
+        'tamano': letter, 'banderas': False, 'pie': "Page {numero} of {paginas}",
+    },
+}
+
+
+def generar_pdf(ruta, rng, paginas, resultados_por_pagina=25, coma_decimal=False, cientifica=0.0, con_texto=False,
+                plantilla='central'):
+    """`con_texto` añade una portada al principio y las páginas de metodología y legales al final."""
+    formato = PLANTILLAS[plantilla]
+    c = canvas.Canvas(str(ruta), pagesize=formato['tamano'])
+    alto = formato['tamano'][1]
+    if con_texto:
+        _pagina_de_texto(c, PAGINAS_SIN_RESULTADOS[0])
+    for numero in range(1, paginas + 1):
+        y = alto - 52
+        for linea in formato['cabecera'](rng):
+            c.drawString(72, y, linea)
+            y -= 24
+        for linea in generar_lineas(rng, resultados_por_pagina, coma_decimal, cientifica, formato['banderas']):
+            c.drawString(72, y, linea)
+            y -= 16
+        for linea in TEXTO_RELLENO:
+            c.drawString(72, y, linea)
+            y -= 14
+        c.drawString(72, 40, formato['pie'].format(numero=numero, paginas=paginas))
+        c.showPage()
+    if con_texto:
+        for lineas in PAGINAS_SIN_RESULTADOS[1:]:
+            _pagina_de_texto(c, lineas)
+    c.save()
+
+
+def generar_corpus(directorio, n_archivos=20, max_paginas=10, seed=1234):
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    rutas = []
+    for i in range(n_archivos):
+        ruta = directorio / f"lab_{i:04d}.pdf"
+        generar_pdf(
+            ruta, rng, rng.randint(1, max_paginas),
+            coma_decimal=rng.random() < 0.3,
+            cientifica=0.5,
+            con_texto=rng.random() < 0.5
+        )
+        rutas.append(ruta)
+    return rutas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("directorio")
+    parser.add_argument("--archivos", type=int, default=20)
+    parser.add_argument("--max-paginas", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    rutas = generar_corpus(args.directorio, args.archivos, args.max_paginas, args.seed)
+    print(f"{len(rutas)} PDFs generados en {args.directorio}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import os
+import re
+import json
+import hashlib
+import unicodedata
+from functools import lru_cache
+
+SYNONYMS_PATH = os.environ.get(
+    'BIOMARKER_SYNONYMS_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources', 'biomarker_synonyms.json')
+)
+CACHE_SIZE = int(os.environ.get('BIOMARKER_NAME_CACHE_SIZE', 4096))
+# Similitud mínima (coeficiente de Dice sobre trigramas) para aceptar una coincidencia difusa
+UMBRAL_TRIGRAMAS = 0.7
+# Fracción mínima de los tokens del nombre que debe cubrir un sinónimo contenido en él
+COBERTURA_MINIMA = 0.5
+# Los sinónimos muy cortos ("K", "Na", "Hb") solo se aceptan por coincidencia exacta
+LONGITUD_MINIMA_PARCIAL = 3
+
+_RE_NO_ALFANUMERICO = re.compile(r"[^a-z0-9]+")
+# "1,25" (vitamina D 1,25-dihidroxi, calcitriol) es otro analito que "25-OH": no puede
+# perderse al descartar los tokens numéricos
+_RE_DIHIDROXI = re.compile(r"(?<![0-9])1\s*[,.]\s*25(?![0-9])")
+PALABRAS_VACIAS = frozenset({"de", "del", "el", "la", "en", "y", "of", "the", "in", "and"})
+# Calificadores que convierten un biomarcador en otro ("Non-HDL cholesterol", "Free PSA",
+# "Creatinine clearance"): un nombre que los lleva solo casa con sinónimos que también los llevan
+CALIFICADORES = frozenset({
+    "non", "no", "direct", "directa", "directo", "indirect", "indirecta", "indirecto",
+    "free", "libre", "ratio", "cociente", "clearance", "aclaramiento",
+    "urine", "urinary", "orina", "urinaria", "saturation", "saturacion", "dihydroxy",
+})
+
+
+def normalizar(nombre):
+    """Minúsculas, sin acentos ni signos, sin palabras vacías ni tokens puramente numéricos."""
+    nombre = unicodedata.normalize('NFKD', nombre).encode('ascii', 'ignore').decode('ascii').lower()
+    nombre = _RE_DIHIDROXI.sub(" dihydroxy ", nombre)
+    return " ".join(t for t in _RE_NO_ALFANUMERICO.split(nombre) if t and not t.isdigit() and t not in PALABRAS_VACIAS)
+
+
+def _distintivos(tokens):
+    # Tokens cortos o con dígitos ("d", "k", "b12", "t4") y calificadores distinguen
+    # biomarcadores de nombre casi idéntico; la coincidencia difusa no puede ignorarlos
+    return frozenset(t for t in tokens if len(t) <= 2 or any(c.isdigit() for c in t) or t in CALIFICADORES)
+
+
+def _trigramas(texto):
+    texto = f"  {texto} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceBiomarcadores:
+    """Diccionario de sinónimos compilado en un hash exacto más índices de tokens y trigramas."""
+
+    def __init__(self, sinonimos):
+        # Huella del contenido del diccionario: forma parte de la versión de la caché de resultados
+        self.version = hashlib.sha256(
+            json.dumps(sinonimos, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        ).hexdigest()[:12]
+        self.exacto = {}
+        self.sinonimos = []
+        self.por_token = {}
+        self.por_trigrama = {}
+
+        for canonico, nombres in sinonimos.items():
+            for nombre in [canonico.replace('_', ' '), *nombres]:
+                normalizado = normalizar(nombre)
+                if not normalizado:
+                    continue
+                compacto = normalizado.replace(" ", "")
+                self.exacto.setdefault(normalizado, canonico)
+                self.exacto.setdefault(compacto, canonico)
+                if len(compacto) < LONGITUD_MINIMA_PARCIAL:
+                    continue
+
+                indice = len(self.sinonimos)
+                tokens = frozenset(normalizado.split())
+                self.sinonimos.append((canonico, tokens, _distintivos(tokens), _trigramas(compacto)))
+                for token in normalizado.split():
+                    self.por_token.setdefault(token, []).append(indice)
+                for trigrama in _trigramas(compacto):
+                    self.por_trigrama.setdefault(trigrama, []).append(indice)
+
+    def buscar(self, nombre):
+        normalizado = normalizar(nombre)
+        if not normalizado:
+            return None
+
+        compacto = normalizado.replace(" ", "")
+        canonico = self.exacto.get(normalizado) or self.exacto.get(compacto)
+        if canonico:
+            return canonico
+
+        # Sinónimo contenido en el nombre ("Hb A1c (glycated)" contiene "hb a1c"): gana el más
+        # largo. Los calificadores del nombre tienen que estar en el sinónimo: "non hdl
+        # cholesterol" contiene "hdl cholesterol", pero es otro biomarcador
+        tokens = set(normalizado.split())
+        calificadores = tokens & CALIFICADORES
+        mejor, mejor_tokens = None, 0
+        for indice in {i for token in tokens for i in self.por_token.get(token, ())}:
+            canonico, tokens_sinonimo, _, _ = self.sinonimos[indice]
+            if tokens_sinonimo <= tokens and calificadores <= tokens_sinonimo and len(tokens_sinonimo) > mejor_tokens:
+                mejor, mejor_tokens = canonico, len(tokens_sinonimo)
+        if mejor and mejor_tokens / len(tokens) >= COBERTURA_MINIMA:
+            return mejor
+
+        # Coincidencia difusa por trigramas (erratas, abreviaturas)
+        trigramas = _trigramas(compacto)
+        distintivos = _distintivos(tokens)
+        candidatos = {}
+        for trigrama in trigramas:
+            for indice in self.por_trigrama.get(trigrama, ()):
+                candidatos[indice] = candidatos.get(indice, 0) + 1
+        mejor, mejor_similitud = None, UMBRAL_TRIGRAMAS
+        for indice, comunes in candidatos.items():
+            canonico, _, distintivos_sinonimo, trigramas_sinonimo = self.sinonimos[indice]
+            if distintivos_sinonimo != distintivos:
+                continue
+            similitud = 2 * comunes / (len(trigramas) + len(trigramas_sinonimo))
+            if similitud >= mejor_similitud:
+                mejor, mejor_similitud = canonico, similitud
+        return mejor
+
+
+def cargar_indice(ruta=SYNONYMS_PATH):
+    with open(ruta, encoding='utf-8') as f:
+        return IndiceBiomarcadores(json.load(f))
+
+
+_indice = cargar_indice()
+VERSION_SINONIMOS = _indice.version
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def canonicalizar(nombre):
+    """Id canónico del biomarcador (p. ej. 'hba1c') o None si no se reconoce."""
+    return _indice.buscar(nombre)
@@ -1,63 +1,191 @@
 import re
-import pandas as pd
+import time
 from math import inf
 
-def parsear_lineas_a_dataframe(lines):
-    pattern_range = (
-        r"([A-Za-z0-9\s()/.\*]+?)" 
-        r"\s+H?([\d.,]+(?:E\d+)?)"
-        r"\s*([a-zA-Z0-9/%µ.*]*)?"
-        r"\s+([\d.,]+)\s*(?:-|\s)\s*([\d.,]+)"
-    )
-
-    pattern_threshold = (
-        r"([A-Za-z0-9\s()/.\*]+?)" 
-        r"\s*([<>])?\s*([\d.,]+(?:E\d+)?)"
-        r"\s*([a-zA-Z0-9/%µ,^]*\s*m2|[a-zA-Z0-9/%µ,^]*)?"
-        r"\s*([<>])\s*([\d.,]+)"
-    )
-
-    data = []
+import metrics
+from biomarker_names import canonicalizar
+from lab_results import LabResult
+
+# Incrementar cuando cambie la salida de la extracción o del parser: invalida la caché de resultados
+PARSER_VERSION = "10"
+
+TOLERANCIA_NEAR = 0.25
+# Si un perfil reconoce menos de esta fracción de las líneas candidatas, se prueba
+# también el parser genérico y se usa el que encuentre más filas
+FRACCION_MINIMA_PERFIL = 0.5
+
+COLUMNAS = ["Test", "Value", "Unit", "Ref Low", "Ref High", "Canonical ID"]
+
+_PATRON_RANGO = re.compile(
+    r"([A-Za-z0-9\s()/.\*]+?)" 
+    r"\s+H?([\d.,]+(?:E\d+)?)"
+    r"\s*([a-zA-Z0-9/%µ.*]*)?"
+    r"\s+([\d.,]+)\s*(?:-|\s)\s*([\d.,]+)"
+)
+
+_PATRON_UMBRAL = re.compile(
+    r"([A-Za-z0-9\s()/.\*]+?)" 
+    r"\s*([<>])?\s*([\d.,]+(?:E\d+)?)"
+    r"\s*([a-zA-Z0-9/%µ,^]*\s*m2|[a-zA-Z0-9/%µ,^]*)?"
+    r"\s*([<>])\s*([\d.,]+)"
+)
+
+# Equivale a .replace(",", ".").replace("[", "").replace("]", "").replace("*", "") en una sola pasada
+_TABLA_LIMPIEZA = str.maketrans({",": ".", "[": None, "]": None, "*": None})
+
+
+def _parsear_generico(lines):
+    """Parser genérico, para layouts sin perfil.
+
+    Cada línea se clasifica una sola vez con comprobaciones baratas antes de
+    ejecutar ninguna regex: un resultado con rango necesita al menos tres
+    números (valor, mínimo y máximo) y uno con umbral necesita un '<' o '>'.
+    Si el patrón de umbral vuelve a leer un tramo ya reconocido como rango
+    (p. ej. "Ferritin 45 ng/mL 30 - 400 > 30") se conserva solo el resultado
+    con rango, de modo que cada resultado aparece una única vez.
+    """
+    tests, values, units, ref_lows, ref_highs = [], [], [], [], []
+    escaneadas = coincidentes = 0
+
     for line in lines:
+        escaneadas += 1
         line = line.strip()
-        if not line or line.startswith(("Page", "Página")) or not any(c.isdigit() for c in line):
+        if not line or line.startswith(("Page", "Página")):
+            continue
+
+        digitos = sum(map(str.isdigit, line))
+        if not digitos:
+            continue
+
+        puede_ser_umbral = digitos >= 2 and ("<" in line or ">" in line)
+        puede_ser_rango = digitos >= 3
+        if not (puede_ser_rango or puede_ser_umbral):
             continue
-        
-        line = line.replace(",", ".").replace("[", "").replace("]", "").replace("*", "")
 
-        for match in re.finditer(pattern_range, line):
-            test, value, unit, ref_low, ref_high = match.groups()
-            if not value: continue
-            data.append([test.strip(), float(value), unit if unit else "", float(ref_low), float(ref_high)])
+        line = line.translate(_TABLA_LIMPIEZA)
+        filas_antes = len(tests)
+
+        tramos_rango = []
+        if puede_ser_rango:
+            for match in _PATRON_RANGO.finditer(line):
+                test, value, unit, ref_low, ref_high = match.groups()
+                if not value: continue
+                tests.append(test.strip())
+                values.append(float(value))
+                units.append(unit if unit else "")
+                ref_lows.append(float(ref_low))
+                ref_highs.append(float(ref_high))
+                tramos_rango.append(match.span())
+
+        if puede_ser_umbral:
+            for match in _PATRON_UMBRAL.finditer(line):
+                test, sign_val, value, unit, sign_ref, limit = match.groups()
+                if not value or not limit: continue
+                inicio_valor = match.start(3)
+                if any(inicio <= inicio_valor < fin for inicio, fin in tramos_rango):
+                    continue
+
+                limit = float(limit)
+                # Umbral explícito: "< x" no tiene límite inferior (no es el rango 0-x)
+                ref_low, ref_high = (-inf, limit) if sign_ref == "<" else (limit, inf)
+
+                tests.append(test.strip())
+                values.append(float(value))
+                units.append(unit if unit else "")
+                ref_lows.append(ref_low)
+                ref_highs.append(ref_high)
 
-        for match in re.finditer(pattern_threshold, line):
-            test, sign_val, value, unit, sign_ref, limit = match.groups()
-            if not value or not limit: continue 
+        if len(tests) > filas_antes:
+            coincidentes += 1
 
-            value = float(value) if value else None
-            limit = float(limit) if limit else None
+    return tests, values, units, ref_lows, ref_highs, escaneadas, coincidentes
 
-            ref_low, ref_high = (0.0, limit) if sign_ref == "<" else (limit, inf)
-            
-            data.append([test.strip(), value, unit if unit else "", ref_low, ref_high])
 
-    return pd.DataFrame(data, columns=["Test", "Value", "Unit", "Ref Low", "Ref High"])
+def parsear_lineas_a_columnas(lines, perfil=None):
+    """Parsea las líneas del informe y devuelve los resultados en columnas (listas).
+
+    Con `perfil` (un layout_profiles.PerfilLayout reconocido) se usan sus
+    patrones. Si el perfil no reconoce ninguna fila, o muchas menos de las
+    líneas con aspecto de resultado (la plantilla del laboratorio cambió, o la
+    huella casó con otro layout), se ejecuta también el parser genérico y gana
+    el que encuentre más filas. Sin perfil se usa el genérico. Cada fila lleva
+    además el id canónico del biomarcador (o None si no se reconoce).
+    """
+    lines = lines if isinstance(lines, list) else list(lines)
+    inicio = time.perf_counter()
+    if perfil is not None:
+        *parseado, candidatas = perfil.parsear(lines)
+        if not parseado[0] or parseado[6] < FRACCION_MINIMA_PERFIL * candidatas:
+            generico = _parsear_generico(lines)
+            if not parseado[0] or len(generico[0]) > len(parseado[0]):
+                metrics.contar('profile_fallbacks')
+                perfil, parseado = None, generico
+    else:
+        parseado = _parsear_generico(lines)
+    tests, values, units, ref_lows, ref_highs, escaneadas, coincidentes = parseado
+    metrics.parseo_layout(perfil.id if perfil is not None else 'generic', escaneadas, time.perf_counter() - inicio)
+
+    metrics.contar('lines_scanned', escaneadas)
+    metrics.contar('lines_matched', coincidentes)
+    metrics.contar('rows_emitted', len(tests))
+    canonical_ids = [canonicalizar(test) for test in tests]
+    return dict(zip(COLUMNAS, (tests, values, units, ref_lows, ref_highs, canonical_ids)))
+
+
+def parsear_lineas(lines, perfil=None):
+    """Resultados como lista de LabResult: el camino de cada petición, sin pandas."""
+    return [LabResult(*fila) for fila in zip(*parsear_lineas_a_columnas(lines, perfil).values())]
+
+
+def estado_resultado(value, low, high, tolerancia=TOLERANCIA_NEAR):
+    """Normal / Near / Low / High de un valor.
+
+    Un valor fuera de rango es "Near" si está a menos de `tolerancia` veces el
+    límite (rangos abiertos, con ±inf) o la amplitud del rango (rangos cerrados).
+    """
+    if low <= value <= high:
+        return "Normal"
+    if ((high == inf and low > 0 and abs(value - low) <= tolerancia * low)
+            or (low == -inf and high > 0 and abs(value - high) <= tolerancia * high)
+            or (high != inf and low != -inf and high - low > 0
+                and abs(value - max(min(value, high), low)) <= tolerancia * (high - low))):
+        return "Near"
+    return "Low" if value < low else "High"
+
+
+def clasificar(resultados, tolerancia=TOLERANCIA_NEAR):
+    for resultado in resultados:
+        resultado.status = estado_resultado(resultado.value, resultado.ref_low, resultado.ref_high, tolerancia)
+    return resultados
+
+
+# Versiones con pandas/NumPy para los caminos masivos (ingesta, benchmarks): se importan
+# solo ahí, así los workers de la API no cargan pandas
+
+def parsear_lineas_a_dataframe(lines, perfil=None):
+    import pandas as pd
+
+    return pd.DataFrame(parsear_lineas_a_columnas(lines, perfil), columns=COLUMNAS)
+
+def clasificar_resultados(df, tolerancia=TOLERANCIA_NEAR):
+    """Añade la columna Status con máscaras vectorizadas; mismas reglas que estado_resultado."""
+    import numpy as np
 
-def clasificar_resultados(df):
     if df.empty:
         return df
-        
-    df["Status"] = df.apply(
-        lambda row: ("Normal" if row["Ref Low"] <= row["Value"] <= row["Ref High"] else ("Near"
-            if ((row["Ref High"] == inf and row["Ref Low"] > 0 and abs(row["Value"] - row["Ref Low"]) <= 0.25 * row["Ref Low"])
-                or (row["Ref Low"] == -inf and row["Ref High"] > 0 and abs(row["Value"] - row["Ref High"]) <= 0.25 * row["Ref High"])
-                or (row["Ref High"] != inf and row["Ref Low"] != -inf and (row["Ref High"] - row["Ref Low"]) > 0
-                    and abs(row["Value"] - max(min(row["Value"], row["Ref High"]), row["Ref Low"])) <= 0.25 * (row["Ref High"] - row["Ref Low"])
-                )
-            )
-            else ("Low" if row["Value"] < row["Ref Low"] else "High")
+
+    value = df["Value"].to_numpy(dtype=float)
+    low = df["Ref Low"].to_numpy(dtype=float)
+    high = df["Ref High"].to_numpy(dtype=float)
+
+    with np.errstate(invalid="ignore"):
+        normal = (low <= value) & (value <= high)
+        near = (
+            ((high == inf) & (low > 0) & (np.abs(value - low) <= tolerancia * low))
+            | ((low == -inf) & (high > 0) & (np.abs(value - high) <= tolerancia * high))
+            | ((high != inf) & (low != -inf) & (high - low > 0)
+               & (np.abs(value - np.maximum(np.minimum(value, high), low)) <= tolerancia * (high - low)))
         )
-    ),
-    axis=1,
-    )
-    return df
\ No newline at end of file
+
+    df["Status"] = np.select([normal, near, value < low], ["Normal", "Near", "Low"], default="High")
+    return df
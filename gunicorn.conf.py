@@ -0,0 +1,51 @@
+"""
+Configuración de gunicorn para producción:
+
+    gunicorn -c gunicorn.conf.py
+
+Con preload (por defecto) la aplicación y sus módulos pesados (reportlab,
+SQLAlchemy, PyMuPDF, google-genai) se cargan una sola vez en el proceso
+maestro; los workers nacen por fork ya calientes y comparten esas páginas.
+
+Un solo worker por defecto: la cola de trabajos (job_queue), los reportes
+renderizados para descarga y la caché de reportes viven en la memoria del
+proceso, así que con varios workers el sondeo de /api/jobs/<id> o la descarga
+de un reporte pueden llegar a un worker que no los tiene y devolver 404. La
+concurrencia la dan los hilos y el pool de análisis (procesos aparte). Subir
+GUNICORN_WORKERS solo es seguro si esas rutas no se usan o hay afinidad de
+sesión en el balanceador.
+"""
+
+import gc
+import os
+
+wsgi_app = 'app:create_app()'
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+workers = int(os.environ.get('GUNICORN_WORKERS', 1))
+# Hilos por worker: las peticiones esperan sobre todo al pool de análisis y al LLM
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+# Los reportes con LLM y los PDFs grandes pueden tardar más que los 30 s por defecto
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 0))
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def pre_fork(server, worker):
+    # Los objetos ya cargados no vuelven a recorrerse en el gc de los workers:
+    # así no se tocan sus páginas y siguen compartidas tras el fork
+    gc.freeze()
+
+
+def worker_exit(server, worker):
+    # Apagado ordenado del worker: vuelca a la base de datos los análisis aún en el buffer del timeline
+    import sys
+
+    if 'timeline_writer' in sys.modules:
+        sys.modules['timeline_writer'].cerrar_escritor(graceful_timeout)
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Ingesta masiva de PDFs de laboratorio a un dataset Parquet (o Arrow IPC).
+
+Recorre un árbol de directorios, analiza los PDFs en un pool de procesos con
+reparto por lotes y escribe los resultados clasificados, con el archivo de
+origen y su SHA-256, en particiones ingest_date=AAAA-MM-DD/. El manifiesto
+(_manifest.jsonl) registra cada hash ya procesado, así que una ejecución
+interrumpida se reanuda sin repetir trabajo ni duplicar filas.
+
+    python ingest.py /ruta/archivo_historico /ruta/dataset --workers 8
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import hashlib
+import argparse
+from datetime import date
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from pdf_processor import extraer_lineas, PAGINAS_ESTRICTO
+from data_extractor import parsear_lineas_a_dataframe, clasificar_resultados
+from layout_profiles import detectar_perfil
+
+# Los lectores de datasets de Arrow ignoran los ficheros que empiezan por '_' o '.'
+MANIFIESTO = '_manifest.jsonl'
+COLUMNAS_DATASET = {
+    'Test': 'test',
+    'Value': 'value',
+    'Unit': 'unit',
+    'Ref Low': 'ref_low',
+    'Ref High': 'ref_high',
+    'Status': 'status',
+    'Canonical ID': 'canonical_id',
+}
+
+
+def hash_archivo(ruta):
+    with open(ruta, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+def _parsear(ruta, motor=None, filtrar=True):
+    estadisticas = {}
+    try:
+        lineas = list(extraer_lineas(ruta, motor, filtrar=filtrar, estadisticas=estadisticas))
+    except Exception as e:
+        # Como en el análisis en línea, un motor que no puede abrir el PDF deja paso al siguiente
+        print(f"ERROR: Fallo al abrir o extraer el PDF {ruta}: {e}")
+        lineas = []
+    return parsear_lineas_a_dataframe(lineas, detectar_perfil(lineas, estadisticas.get('page_size')))
+
+
+def procesar_archivo(tarea):
+    """Analiza un PDF en un worker. Nunca lanza: los fallos vuelven como resultado."""
+    ruta, digest, estricto = tarea
+    inicio = time.perf_counter()
+    try:
+        df = _parsear(ruta, filtrar=not estricto)
+        if df.empty and not estricto:
+            df = _parsear(ruta, filtrar=False)
+        if df.empty:
+            # Mismos fallbacks que el análisis en línea
+            df = _parsear(ruta, 'pdfplumber', filtrar=False)
+        if df.empty:
+            raise ValueError('No data could be extracted from this PDF.')
+        df = clasificar_resultados(df)
+        columnas = {nombre: df[col].tolist() for col, nombre in COLUMNAS_DATASET.items()}
+        return {'path': ruta, 'sha256': digest, 'columns': columnas, 'seconds': time.perf_counter() - inicio}
+    except Exception as e:
+        return {'path': ruta, 'sha256': digest, 'error': f'{type(e).__name__}: {e}', 'seconds': time.perf_counter() - inicio}
+
+
+def leer_manifiesto(directorio):
+    """Devuelve {sha256: entrada} a partir del manifiesto.
+
+    Cada línea es un fichero de datos confirmado ({"part", "files": [...]}) o
+    un PDF fallido ({"sha256", "status": "failed", ...}). Una línea cortada por
+    una interrupción no es JSON válido y se ignora.
+    """
+    entradas = {}
+    ruta = directorio / MANIFIESTO
+    if ruta.exists():
+        with open(ruta, encoding='utf-8') as f:
+            for linea in f:
+                try:
+                    registro = json.loads(linea)
+                except json.JSONDecodeError:
+                    continue
+                if 'part' in registro:
+                    for archivo in registro['files']:
+                        entradas[archivo['sha256']] = {**archivo, 'status': 'ok', 'part': registro['part']}
+                else:
+                    entradas[registro['sha256']] = registro
+    return entradas
+
+
+def abrir_manifiesto(directorio):
+    ruta = directorio / MANIFIESTO
+    cortada = False
+    if ruta.exists() and ruta.stat().st_size:
+        with open(ruta, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            cortada = f.read(1) != b'\n'
+    manifiesto_f = open(ruta, 'a', encoding='utf-8')
+    if cortada:
+        # La línea cortada se ignora al leer; la siguiente debe empezar en una línea nueva
+        manifiesto_f.write('\n')
+    return manifiesto_f
+
+
+def limpiar_huerfanos(directorio, manifiesto):
+    # Un fichero escrito antes de un corte, sin su línea en el manifiesto, se
+    # reprocesará al reanudar: se borra para no duplicar filas
+    referenciados = {e['part'] for e in manifiesto.values() if e.get('part')}
+    borrados = 0
+    for parte in directorio.glob('ingest_date=*/*'):
+        if str(parte.relative_to(directorio)) not in referenciados:
+            parte.unlink()
+            borrados += 1
+    return borrados
+
+
+class EscritorDataset:
+    """Acumula filas de varios PDFs y las vuelca en ficheros de partición de ~filas_por_fichero filas."""
+
+    def __init__(self, directorio, formato, filas_por_fichero):
+        import pyarrow as pa
+
+        self.pa = pa
+        self.directorio = directorio
+        self.formato = formato
+        self.filas_por_fichero = filas_por_fichero
+        self.particion = directorio / f'ingest_date={date.today().isoformat()}'
+        self.schema = pa.schema([
+            ('test', pa.string()),
+            ('value', pa.float64()),
+            ('unit', pa.string()),
+            ('ref_low', pa.float64()),
+            ('ref_high', pa.float64()),
+            ('status', pa.string()),
+            ('canonical_id', pa.string()),
+            ('source_path', pa.string()),
+            ('source_sha256', pa.string()),
+        ])
+        self._columnas = {campo: [] for campo in self.schema.names}
+        self._pendientes = []
+        self.filas = 0
+
+    def agregar(self, resultado):
+        columnas = resultado['columns']
+        n = len(columnas['test'])
+        for nombre, valores in columnas.items():
+            self._columnas[nombre].extend(valores)
+        self._columnas['source_path'].extend([resultado['path']] * n)
+        self._columnas['source_sha256'].extend([resultado['sha256']] * n)
+        self._pendientes.append({'sha256': resultado['sha256'], 'path': resultado['path'], 'rows': n})
+        self.filas += n
+        if len(self._columnas['test']) >= self.filas_por_fichero:
+            return self.volcar()
+        return None
+
+    def volcar(self):
+        """Escribe el fichero pendiente y devuelve su línea de manifiesto (o None)."""
+        if not self._pendientes:
+            return None
+        pa = self.pa
+        tabla = pa.table(self._columnas, schema=self.schema)
+        self.particion.mkdir(parents=True, exist_ok=True)
+        extension = 'parquet' if self.formato == 'parquet' else 'arrow'
+        destino = self.particion / f'part-{uuid.uuid4().hex}.{extension}'
+        temporal = destino.with_name(f'.{destino.name}.tmp')
+
+        if self.formato == 'parquet':
+            import pyarrow.parquet as pq
+            pq.write_table(tabla, temporal, compression='zstd')
+        else:
+            import pyarrow.ipc as ipc
+            with ipc.new_file(temporal, self.schema) as writer:
+                writer.write_table(tabla)
+        # El fichero solo aparece con su nombre definitivo una vez completo
+        os.replace(temporal, destino)
+
+        registro = {'part': str(destino.relative_to(self.directorio)), 'files': self._pendientes}
+        self._columnas = {campo: [] for campo in self.schema.names}
+        self._pendientes = []
+        return registro
+
+
+def buscar_pdfs(raiz):
+    return sorted(p for p in Path(raiz).rglob('*') if p.is_file() and p.suffix.lower() == '.pdf')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('origen', help='Directorio raíz con los PDFs (se recorre recursivamente)')
+    parser.add_argument('destino', help='Directorio del dataset de salida')
+    parser.add_argument('--formato', choices=('parquet', 'arrow'), default='parquet')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunksize', type=int, default=8, help='PDFs enviados a cada worker por tarea')
+    parser.add_argument('--filas-por-fichero', type=int, default=200_000)
+    parser.add_argument('--estricto', action='store_true', default=PAGINAS_ESTRICTO, help='Extrae todas las páginas, sin saltar las que no parecen tener resultados')
+    parser.add_argument('--reintentar-fallidos', action='store_true', help='Vuelve a procesar los PDFs que fallaron en ejecuciones anteriores')
+    args = parser.parse_args()
+
+    destino = Path(args.destino)
+    destino.mkdir(parents=True, exist_ok=True)
+    manifiesto = leer_manifiesto(destino)
+    huerfanos = limpiar_huerfanos(destino, manifiesto)
+    if huerfanos:
+        print(f"Borrados {huerfanos} ficheros incompletos de una ejecución anterior")
+
+    rutas = buscar_pdfs(args.origen)
+    tareas, vistos, omitidos = [], set(), 0
+    for ruta in rutas:
+        digest = hash_archivo(ruta)
+        previo = manifiesto.get(digest)
+        ya_hecho = previo is not None and (previo['status'] == 'ok' or not args.reintentar_fallidos)
+        # Los duplicados exactos (mismo contenido en otra ruta) se procesan una sola vez
+        if ya_hecho or digest in vistos:
+            omitidos += 1
+            continue
+        vistos.add(digest)
+        tareas.append((str(ruta), digest, args.estricto))
+
+    print(f"{len(rutas)} PDFs encontrados, {omitidos} ya procesados o duplicados, {len(tareas)} pendientes")
+    if not tareas:
+        return 0
+
+    escritor = EscritorDataset(destino, args.formato, args.filas_por_fichero)
+    fallidos = []
+    inicio = time.perf_counter()
+
+    with abrir_manifiesto(destino) as manifiesto_f:
+        def registrar(registro):
+            # Una sola línea por fichero de datos: o queda confirmado entero o no queda
+            if registro is not None:
+                manifiesto_f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+                manifiesto_f.flush()
+
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            for hechos, resultado in enumerate(pool.map(procesar_archivo, tareas, chunksize=args.chunksize), 1):
+                if 'error' in resultado:
+                    fallidos.append(resultado)
+                    registrar({'sha256': resultado['sha256'], 'path': resultado['path'], 'status': 'failed', 'error': resultado['error']})
+                else:
+                    registrar(escritor.agregar(resultado))
+
+                if hechos % 100 == 0 or hechos == len(tareas):
+                    segundos = time.perf_counter() - inicio
+                    print(f"  {hechos}/{len(tareas)} PDFs, {escritor.filas} filas, {hechos / segundos:.1f} PDFs/s", flush=True)
+        registrar(escritor.volcar())
+
+    segundos = time.perf_counter() - inicio
+    print(f"Procesados {len(tareas)} PDFs en {segundos:.1f}s ({len(tareas) / segundos:.1f} PDFs/s, {escritor.filas / segundos:,.0f} filas/s)")
+    print(f"{escritor.filas} filas escritas en {destino}")
+    if fallidos:
+        print(f"{len(fallidos)} PDFs fallaron:")
+        for resultado in fallidos:
+            print(f"  {resultado['path']}: {resultado['error']}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,187 @@
+import os
+import time
+import uuid
+import queue
+import traceback
+from collections import OrderedDict, deque
+from threading import Lock, Thread
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__('Job queue is full')
+        self.retry_after = retry_after
+
+
+class Job:
+    __slots__ = ('id', 'status', 'total', 'done', 'result', 'error',
+                 'created_at', 'started_at', 'finished_at', '_fn', '_args')
+
+    def __init__(self, fn, args, total):
+        self.id = uuid.uuid4().hex
+        self.status = 'queued'
+        self.total = total
+        self.done = 0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._fn = fn
+        self._args = args
+
+    def advance(self, n=1):
+        self.done += n
+
+    def to_dict(self):
+        now = time.time()
+        data = {
+            'id': self.id,
+            'status': self.status,
+            'progress': {'done': self.done, 'total': self.total},
+            'created_at': self.created_at,
+            'wait_time': (self.started_at or now) - self.created_at,
+            'run_time': (self.finished_at or now) - self.started_at if self.started_at else None,
+        }
+        if self.status == 'done':
+            data['result'] = self.result
+        elif self.status == 'failed':
+            data['error'] = self.error
+        return data
+
+
+class JobQueue:
+    """Cola de trabajos acotada con un pool local de hilos.
+
+    El trabajo pesado (extracción y parseo) lo hace el pool de procesos de
+    pipeline; estos hilos solo lo coordinan fuera del hilo de la petición.
+    """
+
+    def __init__(self, workers=2, max_pending=32, history=1000, window=200):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.history = history
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._jobs = OrderedDict()
+        self._lock = Lock()
+        self._threads = []
+        self._running = 0
+        self._wait_times = deque(maxlen=window)
+        self._run_times = deque(maxlen=window)
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = Thread(target=self._worker, name=f'job-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, fn, *args, total=1):
+        """Encola fn(job, *args). Lanza QueueFull si no hay hueco."""
+        self._start()
+        job = Job(fn, args, total)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim()
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+                self.rejected += 1
+            raise QueueFull(self.retry_after())
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def retry_after(self):
+        with self._lock:
+            run_time = sum(self._run_times) / len(self._run_times) if self._run_times else 1.0
+        return max(1, round(run_time * self._queue.qsize() / self.workers))
+
+    def _trim(self):
+        # Se olvidan los trabajos terminados más antiguos; nunca los pendientes
+        sobrantes = len(self._jobs) - self.history
+        for job_id in list(self._jobs):
+            if sobrantes <= 0:
+                break
+            if self._jobs[job_id].status in ('done', 'failed'):
+                del self._jobs[job_id]
+                sobrantes -= 1
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            job.started_at = time.time()
+            job.status = 'running'
+            with self._lock:
+                self._running += 1
+                self._wait_times.append(job.started_at - job.created_at)
+            try:
+                job.result = job._fn(job, *job._args)
+                job.status = 'done'
+            except Exception as e:
+                traceback.print_exc()
+                job.error = str(e)
+                job.status = 'failed'
+            finally:
+                job.finished_at = time.time()
+                job._args = None
+                with self._lock:
+                    self._running -= 1
+                    self._run_times.append(job.finished_at - job.started_at)
+                    if job.status == 'done':
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+                self._queue.task_done()
+
+    def stats(self):
+        with self._lock:
+            wait_times = sorted(self._wait_times)
+            run_times = sorted(self._run_times)
+            return {
+                'workers': self.workers,
+                'capacity': self.max_pending,
+                'depth': self._queue.qsize(),
+                'running': self._running,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'wait_time': _resumen_tiempos(wait_times),
+                'run_time': _resumen_tiempos(run_times),
+            }
+
+
+def _resumen_tiempos(valores):
+    if not valores:
+        return {'count': 0, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+    return {
+        'count': len(valores),
+        'mean': sum(valores) / len(valores),
+        'p50': valores[len(valores) // 2],
+        'p95': valores[min(len(valores) - 1, int(len(valores) * 0.95))],
+        'max': valores[-1],
+    }
+
+
+_job_queue = None
+_job_queue_lock = Lock()
+
+
+def obtener_cola():
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(
+                workers=int(os.environ.get('JOB_WORKERS', 2)),
+                max_pending=int(os.environ.get('JOB_QUEUE_SIZE', 32))
+            )
+        return _job_queue
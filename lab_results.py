@@ -0,0 +1,92 @@
+from math import inf, isfinite
+
+# Tipo de rango de referencia. JSON no admite infinito, así que el límite abierto
+# se envía como null y rangeType indica cuál falta
+RANGO_CERRADO = 'bounded'
+SOLO_MINIMO = 'min_only'   # "> x": sin límite superior
+SOLO_MAXIMO = 'max_only'   # "< x": sin límite inferior (-inf)
+
+
+def _finito(valor):
+    return valor if valor is not None and isfinite(valor) else None
+
+
+def _numero(valor, por_defecto):
+    return por_defecto if valor is None else float(valor)
+
+
+class LabResult:
+    """Un resultado de laboratorio.
+
+    Un panel típico tiene unas decenas de filas: con __slots__ cada resultado
+    ocupa poco y no hace falta construir un DataFrame en cada petición. pandas
+    queda para los caminos masivos (ingesta, benchmarks).
+    """
+
+    __slots__ = ('test', 'value', 'unit', 'ref_low', 'ref_high', 'canonical_id', 'status')
+
+    def __init__(self, test, value, unit, ref_low, ref_high, canonical_id=None, status=None):
+        self.test = test
+        self.value = value
+        self.unit = unit
+        self.ref_low = ref_low
+        self.ref_high = ref_high
+        self.canonical_id = canonical_id
+        self.status = status
+
+    @property
+    def range_type(self):
+        if self.ref_high == inf:
+            return SOLO_MINIMO
+        if self.ref_low == -inf:
+            return SOLO_MAXIMO
+        return RANGO_CERRADO
+
+    def to_dict(self):
+        """Registro de la API: límites infinitos y NaN como None, con rangeType explícito."""
+        return {
+            'test': self.test,
+            'value': _finito(self.value),
+            'unit': self.unit,
+            'refLow': _finito(self.ref_low),
+            'refHigh': _finito(self.ref_high),
+            'canonicalId': self.canonical_id,
+            'status': self.status,
+            'rangeType': self.range_type,
+        }
+
+    @classmethod
+    def from_dict(cls, registro):
+        """Reconstruye un resultado a partir de un registro de la API (p. ej. reenviado por el navegador)."""
+        return cls(
+            str(registro.get('test', '')),
+            _numero(registro.get('value'), float('nan')),
+            registro.get('unit') or '',
+            # Un límite null es un rango abierto por ese lado
+            _numero(registro.get('refLow'), -inf),
+            _numero(registro.get('refHigh'), inf),
+            registro.get('canonicalId'),
+            registro.get('status'),
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, LabResult):
+            return NotImplemented
+        return all(getattr(self, campo) == getattr(other, campo) for campo in self.__slots__)
+
+    def __repr__(self):
+        return f"LabResult({self.test!r}, {self.value!r}, {self.unit!r}, {self.ref_low!r}, {self.ref_high!r}, status={self.status!r})"
+
+
+def resumir(resultados):
+    """Resumen por estado, como el que devolvía value_counts sobre la columna status."""
+    resumen = {'normal': 0, 'near': 0, 'abnormal': 0, 'total': 0}
+    for resultado in resultados:
+        if resultado.status == 'Normal':
+            resumen['normal'] += 1
+        elif resultado.status == 'Near':
+            resumen['near'] += 1
+        elif resultado.status in ('Low', 'High'):
+            resumen['abnormal'] += 1
+        resumen['total'] += 1
+    return resumen
@@ -0,0 +1,155 @@
+import os
+import re
+import json
+import hashlib
+import unicodedata
+from math import inf
+from functools import lru_cache
+
+PROFILES_DIR = os.environ.get(
+    'LAYOUT_PROFILES_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources', 'layout_profiles')
+)
+# LAYOUT_PROFILES=0 desactiva los perfiles: todo pasa por el parser genérico
+PERFILES_ACTIVOS = os.environ.get('LAYOUT_PROFILES', '1') == '1'
+CACHE_SIZE = int(os.environ.get('LAYOUT_FINGERPRINT_CACHE_SIZE', 1024))
+# Tolerancia (en puntos) al comparar el tamaño de página con el del perfil
+TOLERANCIA_PAGINA = 2
+
+_RE_NO_LETRA = re.compile(r"[^a-z]+")
+
+
+def normalizar_cabecera(linea):
+    """Minúsculas, sin acentos, dígitos ni signos: fechas y números de página no cambian la huella."""
+    linea = unicodedata.normalize('NFKD', linea).encode('ascii', 'ignore').decode('ascii').lower()
+    return " ".join(t for t in _RE_NO_LETRA.split(linea) if t)
+
+
+def huella(lineas, tamano_pagina=None):
+    """Huella barata del layout: tamaño de página redondeado y dos primeras líneas con texto.
+
+    La primera línea suele ser el membrete del laboratorio y la segunda el título
+    o la primera fila de la cabecera, iguales en todos sus informes; el resto
+    (paciente, fechas) cambia de un PDF a otro.
+    """
+    normalizadas = (normalizada for normalizada in map(normalizar_cabecera, lineas) if normalizada)
+    primera, segunda = next(normalizadas, ""), next(normalizadas, "")
+    tamano = tuple(round(medida) for medida in tamano_pagina) if tamano_pagina else None
+    return tamano, primera, segunda
+
+
+def _empieza_por(linea, prefijos):
+    # Por palabras completas: "laboratorio clinico central" no reconoce "laboratorio clinico centralizado"
+    return any(linea == prefijo or linea.startswith(prefijo + " ") for prefijo in prefijos)
+
+
+class PerfilLayout:
+    """Perfil compilado de la plantilla de un laboratorio.
+
+    Cada fila de resultados de la plantilla tiene una forma fija: en lugar de
+    las regex genéricas (que buscan resultados en cualquier parte de la línea)
+    se usan patrones anclados con grupos con nombre (test, value, unit y low/high
+    o op/limit). Las líneas que no encajan se descartan, así que membretes,
+    fechas o códigos de barras no producen filas falsas.
+    """
+
+    def __init__(self, datos):
+        self.id = datos['id']
+        self.version = hashlib.sha256(json.dumps(datos, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+        self.proveedor = datos.get('provider', self.id)
+        identificacion = datos.get('fingerprint', {})
+        self.cabeceras = tuple(normalizar_cabecera(cabecera) for cabecera in identificacion.get('header', []))
+        self.subcabeceras = tuple(normalizar_cabecera(linea) for linea in identificacion.get('subheader', []))
+        tamano = identificacion.get('page_size')
+        self.tamano_pagina = tuple(tamano) if tamano else None
+        omitir = datos.get('skip', [])
+        self.omitir = re.compile("|".join(f"(?:{patron})" for patron in omitir)) if omitir else None
+        self.filas = [re.compile(patron) for patron in datos['rows']]
+        limpieza = {"[": None, "]": None, "*": None}
+        if datos.get('decimal_comma', False):
+            limpieza[","] = "."
+        self._tabla_limpieza = str.maketrans(limpieza)
+
+    def reconoce(self, huella_documento):
+        tamano, primera, segunda = huella_documento
+        if self.tamano_pagina is not None and tamano is not None and any(
+            abs(medida - esperada) > TOLERANCIA_PAGINA for medida, esperada in zip(tamano, self.tamano_pagina)
+        ):
+            return False
+        if self.subcabeceras and not _empieza_por(segunda, self.subcabeceras):
+            return False
+        return _empieza_por(primera, self.cabeceras)
+
+    def parsear(self, lines):
+        """Devuelve (tests, values, units, ref_lows, ref_highs, escaneadas, coincidentes, candidatas).
+
+        `candidatas` cuenta las líneas no omitidas que el parser genérico
+        consideraría (tres dígitos, o dos y un '<' o '>'): si el perfil reconoce
+        muchas menos, el documento probablemente no sigue su plantilla.
+        """
+        tests, values, units, ref_lows, ref_highs = [], [], [], [], []
+        escaneadas = candidatas = 0
+        omitir = self.omitir
+
+        for line in lines:
+            escaneadas += 1
+            line = line.strip()
+            # Una fila de resultados tiene al menos valor y un límite
+            digitos = sum(map(str.isdigit, line))
+            if digitos < 2 or (omitir is not None and omitir.match(line)):
+                continue
+            if digitos >= 3 or "<" in line or ">" in line:
+                candidatas += 1
+            line = line.translate(self._tabla_limpieza)
+            for patron in self.filas:
+                match = patron.match(line)
+                if match is None:
+                    continue
+                campos = match.groupdict()
+                if campos.get('limit') is not None:
+                    limit = float(campos['limit'])
+                    ref_low, ref_high = (-inf, limit) if campos['op'] == "<" else (limit, inf)
+                else:
+                    ref_low, ref_high = float(campos['low']), float(campos['high'])
+                tests.append(campos['test'].strip())
+                values.append(float(campos['value']))
+                units.append(campos.get('unit') or "")
+                ref_lows.append(ref_low)
+                ref_highs.append(ref_high)
+                break
+
+        return tests, values, units, ref_lows, ref_highs, escaneadas, len(tests), candidatas
+
+    def __repr__(self):
+        return f"PerfilLayout({self.id!r})"
+
+
+def cargar_perfiles(directorio=PROFILES_DIR):
+    """Un perfil por fichero JSON del directorio, en orden alfabético."""
+    if not os.path.isdir(directorio):
+        return []
+    perfiles = []
+    for nombre in sorted(os.listdir(directorio)):
+        if nombre.endswith('.json'):
+            with open(os.path.join(directorio, nombre), encoding='utf-8') as f:
+                perfiles.append(PerfilLayout(json.load(f)))
+    return perfiles
+
+
+_perfiles = cargar_perfiles() if PERFILES_ACTIVOS else []
+# Huella de los perfiles cargados: cambiar, añadir o quitar uno invalida la caché de resultados
+VERSION_PERFILES = hashlib.sha256(
+    "".join(f"{perfil.id}:{perfil.version}\n" for perfil in _perfiles).encode('utf-8')
+).hexdigest()[:12]
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def perfil_para_huella(huella_documento):
+    """Perfil que reconoce la huella (o None): se resuelve una vez por huella y proceso."""
+    return next((perfil for perfil in _perfiles if perfil.reconoce(huella_documento)), None)
+
+
+def detectar_perfil(lineas, tamano_pagina=None):
+    if not _perfiles:
+        return None
+    return perfil_para_huella(huella(lineas, tamano_pagina))
@@ -0,0 +1,201 @@
+import os
+import time
+import random
+import hashlib
+from threading import BoundedSemaphore, Lock
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", 60))
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", 0.5))
+RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", 8))
+
+# Códigos HTTP que indican un fallo transitorio del servicio
+CODIGOS_TRANSITORIOS = {408, 429, 500, 502, 503, 504}
+
+
+class LLMBackend:
+    """Interfaz de los backends de generación de texto."""
+
+    name = "base"
+
+    def generate(self, prompt, model):
+        raise NotImplementedError
+
+    def stream(self, prompt, model):
+        """Genera el texto por fragmentos; por defecto, un único fragmento."""
+        yield self.generate(prompt, model)
+
+    def precargar(self):
+        """Importa las dependencias del backend sin abrir conexiones (p. ej. antes del fork de los workers)."""
+
+
+def _cliente_httpx(**kwargs):
+    import httpx
+
+    class _HttpxClientConTimeouts(httpx.Client):
+        # google-genai pasa un timeout numérico en cada petición, que anularía los
+        # timeouts de conexión/lectura separados configurados en el cliente
+        def build_request(self, *args, timeout=httpx.USE_CLIENT_DEFAULT, **kwargs):
+            return super().build_request(*args, **kwargs)
+
+        def request(self, *args, timeout=httpx.USE_CLIENT_DEFAULT, **kwargs):
+            return super().request(*args, **kwargs)
+
+    return _HttpxClientConTimeouts(**kwargs)
+
+
+def _es_transitorio(error):
+    import httpx
+    from google.genai import errors
+
+    if isinstance(error, (httpx.TimeoutException, httpx.TransportError)):
+        return True
+    return isinstance(error, errors.APIError) and error.code in CODIGOS_TRANSITORIOS
+
+
+def con_reintentos(fn, es_transitorio, intentos=MAX_RETRIES, base=RETRY_BASE_DELAY, maximo=RETRY_MAX_DELAY):
+    """Ejecuta fn() reintentando los errores transitorios con backoff exponencial y jitter completo."""
+    for intento in range(intentos + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if intento == intentos or not es_transitorio(e):
+                raise
+            time.sleep(random.uniform(0, min(maximo, base * 2 ** intento)))
+
+
+class GeminiBackend(LLMBackend):
+    """Cliente de Gemini compartido por todo el proceso.
+
+    Se crea de forma perezosa y reutiliza sus conexiones HTTP entre reportes;
+    el semáforo limita las llamadas simultáneas al modelo.
+    """
+
+    name = "gemini"
+
+    def __init__(self, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, max_concurrency=MAX_CONCURRENCY):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_concurrency = max_concurrency
+        self._client = None
+        self._lock = Lock()
+        self._semaforo = BoundedSemaphore(max_concurrency)
+
+    def precargar(self):
+        # google-genai tarda más de un segundo en importarse
+        import httpx  # noqa: F401
+        import google.genai  # noqa: F401
+        from google.genai import errors, types  # noqa: F401
+
+    def _obtener_cliente(self):
+        with self._lock:
+            if self._client is None:
+                import httpx
+                import google.genai as genai
+                from google.genai import types
+
+                api_key = os.getenv("GEMINI_API_KEY")
+                if not api_key:
+                    raise ValueError("No se encontró la GEMINI_API_KEY.")
+
+                http_client = _cliente_httpx(
+                    timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                    limits=httpx.Limits(
+                        max_connections=self.max_concurrency,
+                        max_keepalive_connections=self.max_concurrency
+                    )
+                )
+                self._client = genai.Client(
+                    api_key=api_key,
+                    http_options=types.HttpOptions(
+                        timeout=int(self.read_timeout * 1000),
+                        httpx_client=http_client
+                    )
+                )
+            return self._client
+
+    def generate(self, prompt, model):
+        client = self._obtener_cliente()
+
+        def llamar():
+            with self._semaforo:
+                return client.models.generate_content(model=model, contents=prompt).text
+
+        return con_reintentos(llamar, _es_transitorio)
+
+    def stream(self, prompt, model):
+        client = self._obtener_cliente()
+
+        def primer_fragmento():
+            # Solo se reintenta hasta recibir el primer fragmento; después el texto ya se ha enviado
+            fragmentos = client.models.generate_content_stream(model=model, contents=prompt)
+            return fragmentos, next(fragmentos, None)
+
+        with self._semaforo:
+            fragmentos, primero = con_reintentos(primer_fragmento, _es_transitorio)
+            if primero is None:
+                return
+            if primero.text:
+                yield primero.text
+            for fragmento in fragmentos:
+                if fragmento.text:
+                    yield fragmento.text
+
+
+class StubBackend(LLMBackend):
+    """Backend local y determinista para pruebas de carga sin llamar al modelo."""
+
+    name = "stub"
+
+    def __init__(self, latency=float(os.getenv("LLM_STUB_LATENCY", 0))):
+        self.latency = latency
+
+    def generate(self, prompt, model):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._texto(prompt, model)
+
+    def stream(self, prompt, model):
+        palabras = self._texto(prompt, model).split(" ")
+        pausa = self.latency / len(palabras) if self.latency else 0
+        for i in range(0, len(palabras), 4):
+            if pausa:
+                time.sleep(pausa * 4)
+            yield " ".join(palabras[i:i + 4]) + (" " if i + 4 < len(palabras) else "")
+
+    def _texto(self, prompt, model):
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+        return (
+            f"Stub report {digest} generated by {model}.\n\n"
+            f"The prompt contained {len(prompt.splitlines())} lines and {len(prompt)} characters.\n\n"
+            "This report is for informational purposes only and does not replace professional medical evaluation."
+        )
+
+
+BACKENDS = {
+    "gemini": GeminiBackend,
+    "stub": StubBackend,
+}
+
+_backend = None
+_backend_lock = Lock()
+
+
+def obtener_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if LLM_BACKEND not in BACKENDS:
+                raise ValueError(f"Backend de LLM desconocido: {LLM_BACKEND}")
+            _backend = BACKENDS[LLM_BACKEND]()
+        return _backend
+
+
+def configurar_backend(backend):
+    """Sustituye el backend del proceso (p. ej. por StubBackend en pruebas de carga)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
@@ -0,0 +1,213 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from threading import Lock
+
+# Límites (en segundos) de los buckets de los histogramas de latencia
+BUCKETS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _etiquetas(nombres, valores):
+    if not nombres:
+        return ""
+    pares = ",".join(f'{n}="{str(v)}"' for n, v in zip(nombres, valores))
+    return "{" + pares + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._valores = {}
+        self._lock = Lock()
+
+    def inc(self, n=1, *etiquetas):
+        with self._lock:
+            self._valores[etiquetas] = self._valores.get(etiquetas, 0) + n
+
+    def render(self):
+        lineas = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for etiquetas, valor in sorted(self._valores.items()):
+                lineas.append(f"{self.name}{_etiquetas(self.labels, etiquetas)} {valor}")
+        return lineas
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=BUCKETS_SEGUNDOS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # etiquetas -> [conteos por bucket (no acumulados) + el de +Inf, suma]
+        self._series = {}
+        self._lock = Lock()
+
+    def observe(self, valor, *etiquetas):
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(etiquetas)
+            if serie is None:
+                serie = self._series[etiquetas] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += valor
+
+    def render(self):
+        lineas = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(etiquetas, list(conteos), suma) for etiquetas, (conteos, suma) in sorted(self._series.items())]
+        for etiquetas, conteos, suma in series:
+            acumulado = 0
+            for limite, conteo in zip((*self.buckets, "+Inf"), conteos):
+                acumulado += conteo
+                le = _etiquetas((*self.labels, "le"), (*etiquetas, limite))
+                lineas.append(f"{self.name}_bucket{le} {acumulado}")
+            base = _etiquetas(self.labels, etiquetas)
+            lineas.append(f"{self.name}_sum{base} {suma}")
+            lineas.append(f"{self.name}_count{base} {acumulado}")
+        return lineas
+
+
+class Registry:
+    def __init__(self):
+        self._metricas = []
+
+    def counter(self, name, help, labels=()):
+        metrica = Counter(name, help, labels)
+        self._metricas.append(metrica)
+        return metrica
+
+    def histogram(self, name, help, labels=(), buckets=BUCKETS_SEGUNDOS):
+        metrica = Histogram(name, help, labels, buckets)
+        self._metricas.append(metrica)
+        return metrica
+
+    def obtener(self, name):
+        return next(metrica for metrica in self._metricas if metrica.name == name)
+
+    def render(self):
+        """Todas las métricas en el formato de texto de Prometheus."""
+        return "\n".join(linea for metrica in self._metricas for linea in metrica.render()) + "\n"
+
+
+# Métricas del proceso. Con varios workers de servidor cada uno expone las suyas
+REGISTRY = Registry()
+DURACION_ETAPA = REGISTRY.histogram(
+    'blood_stage_duration_seconds', 'Duration of each pipeline stage.', labels=('stage',)
+)
+DURACION_PETICION = REGISTRY.histogram(
+    'blood_http_request_duration_seconds', 'HTTP request latency.', labels=('endpoint', 'method', 'status')
+)
+ELEMENTOS = REGISTRY.counter(
+    'blood_pipeline_items_total', 'Pages, lines scanned, lines matched and rows emitted by the pipeline.', labels=('kind',)
+)
+ERRORES = REGISTRY.counter(
+    'blood_errors_total', 'Errors by stage.', labels=('stage',)
+)
+# Documentos, líneas y segundos de parseo por perfil de layout ("generic" si no se reconoce):
+# el cociente de los rates de lines y seconds es el throughput de cada perfil
+DOCUMENTOS_LAYOUT = REGISTRY.counter(
+    'blood_layout_documents_total', 'Documents parsed by layout profile (generic for unknown layouts).', labels=('profile',)
+)
+LINEAS_LAYOUT = REGISTRY.counter(
+    'blood_layout_lines_total', 'Lines parsed by layout profile.', labels=('profile',)
+)
+SEGUNDOS_LAYOUT = REGISTRY.counter(
+    'blood_layout_parse_seconds_total', 'Time spent parsing by layout profile.', labels=('profile',)
+)
+# Escritura diferida del timeline: cada volcado es una transacción con un lote de análisis
+DURACION_VOLCADO_TIMELINE = REGISTRY.histogram(
+    'blood_timeline_flush_duration_seconds', 'Duration of each timeline write-behind flush (one transaction).'
+)
+TAMANO_LOTE_TIMELINE = REGISTRY.histogram(
+    'blood_timeline_batch_size', 'Analyses written per timeline flush.',
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+ANALISIS_TIMELINE = REGISTRY.counter(
+    'blood_timeline_analyses_total', 'Analyses handed to the timeline writer, by outcome (written, dropped, failed).',
+    labels=('outcome',)
+)
+# Pool supervisado de análisis: workers sustituidos por reciclado, timeout, memoria o caída
+REINICIOS_WORKER = REGISTRY.counter(
+    'blood_analysis_worker_restarts_total',
+    'Analysis workers replaced, by reason (recycled, timeout, memory, crash).', labels=('reason',)
+)
+
+# Tiempos y contadores de la petición (o del análisis en un worker) en curso
+_local = threading.local()
+
+
+def iniciar_recoleccion():
+    _local.tiempos = []
+    _local.contadores = {}
+
+
+def recoger():
+    """Devuelve y limpia lo recolectado en este hilo.
+
+    {'tiempos': [(etapa, s)], 'contadores': {(nombre_métrica, etiquetas): n}}
+    """
+    tiempos = getattr(_local, 'tiempos', None)
+    contadores = getattr(_local, 'contadores', None)
+    _local.tiempos = _local.contadores = None
+    return {'tiempos': tiempos or [], 'contadores': contadores or {}}
+
+
+def observar(etapa, segundos):
+    DURACION_ETAPA.observe(segundos, etapa)
+    tiempos = getattr(_local, 'tiempos', None)
+    if tiempos is not None:
+        tiempos.append((etapa, segundos))
+
+
+def _incrementar(contador, n, *etiquetas):
+    contador.inc(n, *etiquetas)
+    contadores = getattr(_local, 'contadores', None)
+    if contadores is not None:
+        clave = (contador.name, etiquetas)
+        contadores[clave] = contadores.get(clave, 0) + n
+
+
+def contar(tipo, n=1):
+    _incrementar(ELEMENTOS, n, tipo)
+
+
+def parseo_layout(perfil, lineas, segundos):
+    """Registra el parseo de un documento con un perfil de layout (o 'generic')."""
+    _incrementar(DOCUMENTOS_LAYOUT, 1, perfil)
+    _incrementar(LINEAS_LAYOUT, lineas, perfil)
+    _incrementar(SEGUNDOS_LAYOUT, segundos, perfil)
+
+
+def error(etapa):
+    ERRORES.inc(1, etapa)
+
+
+@contextmanager
+def span(etapa):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar(etapa, time.perf_counter() - inicio)
+
+
+def registrar(recolectado):
+    """Incorpora en este proceso lo recolectado en otro (p. ej. un worker del pool de análisis)."""
+    for etapa, segundos in recolectado['tiempos']:
+        observar(etapa, segundos)
+    for (nombre, etiquetas), n in recolectado['contadores'].items():
+        _incrementar(REGISTRY.obtener(nombre), n, *etiquetas)
+
+
+def server_timing(tiempos, total=None):
+    """Cabecera Server-Timing; las etapas repetidas (un PDF por archivo) se suman."""
+    por_etapa = {}
+    for etapa, segundos in tiempos:
+        por_etapa[etapa] = por_etapa.get(etapa, 0.0) + segundos
+    partes = [f"{etapa};dur={segundos * 1000:.1f}" for etapa, segundos in por_etapa.items()]
+    if total is not None:
+        partes.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(partes)
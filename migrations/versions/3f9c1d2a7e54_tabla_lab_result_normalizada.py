@@ -0,0 +1,101 @@
+"""Tabla lab_result normalizada e índices del timeline
+
+Revision ID: 3f9c1d2a7e54
+Revises: b941a5dc970f
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+import math
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c1d2a7e54'
+down_revision = 'b941a5dc970f'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 500
+
+
+def _numero(valor):
+    # Los límites abiertos (inf) y los valores ausentes se guardan como NULL
+    if valor is None:
+        return None
+    valor = float(valor)
+    return None if math.isinf(valor) or math.isnan(valor) else valor
+
+
+def _backfill(lab_result):
+    timeline = sa.table(
+        'timeline',
+        sa.column('id', sa.Integer),
+        sa.column('date', sa.DateTime),
+        sa.column('results', sa.JSON),
+        sa.column('user_id', sa.Integer),
+    )
+    conn = op.get_bind()
+
+    ultimo_id = 0
+    while True:
+        # Paginación por id para no cargar todos los blobs JSON a la vez
+        lote = conn.execute(
+            sa.select(timeline.c.id, timeline.c.user_id, timeline.c.date, timeline.c.results)
+            .where(timeline.c.id > ultimo_id)
+            .order_by(timeline.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).fetchall()
+        if not lote:
+            break
+
+        filas = [
+            {
+                'timeline_id': timeline_id,
+                'user_id': user_id,
+                'test': str(resultado.get('test', '')).strip(),
+                'value': _numero(resultado.get('value')),
+                'unit': resultado.get('unit') or '',
+                'ref_low': _numero(resultado.get('refLow')),
+                'ref_high': _numero(resultado.get('refHigh')),
+                'status': resultado.get('status'),
+                'date': date,
+            }
+            for timeline_id, user_id, date, results in lote
+            for resultado in (results or [])
+            if isinstance(resultado, dict) and resultado.get('test')
+        ]
+        if filas:
+            conn.execute(lab_result.insert(), filas)
+        ultimo_id = lote[-1][0]
+
+
+def upgrade():
+    lab_result = op.create_table('lab_result',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('timeline_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('test', sa.String(length=200), nullable=False),
+    sa.Column('value', sa.Float(), nullable=True),
+    sa.Column('unit', sa.String(length=50), nullable=True),
+    sa.Column('ref_low', sa.Float(), nullable=True),
+    sa.Column('ref_high', sa.Float(), nullable=True),
+    sa.Column('status', sa.String(length=10), nullable=True),
+    sa.Column('date', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['timeline_id'], ['timeline.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_lab_result_user_test_date', 'lab_result', ['user_id', 'test', 'date'], unique=False)
+    op.create_index('ix_lab_result_timeline_id', 'lab_result', ['timeline_id'], unique=False)
+    op.create_index('ix_timeline_user_date', 'timeline', ['user_id', 'date'], unique=False)
+
+    _backfill(lab_result)
+
+
+def downgrade():
+    op.drop_index('ix_timeline_user_date', table_name='timeline')
+    op.drop_index('ix_lab_result_timeline_id', table_name='lab_result')
+    op.drop_index('ix_lab_result_user_test_date', table_name='lab_result')
+    op.drop_table('lab_result')
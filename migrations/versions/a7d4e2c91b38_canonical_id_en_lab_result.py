@@ -0,0 +1,39 @@
+"""Id canónico del biomarcador en lab_result
+
+Revision ID: a7d4e2c91b38
+Revises: 3f9c1d2a7e54
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d4e2c91b38'
+down_revision = '3f9c1d2a7e54'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('lab_result', sa.Column('canonical_id', sa.String(length=64), nullable=True))
+    op.create_index('ix_lab_result_user_canonical_date', 'lab_result', ['user_id', 'canonical_id', 'date'], unique=False)
+
+    # Hay pocos nombres distintos: se canonicaliza cada uno una vez y se actualiza por nombre
+    from biomarker_names import canonicalizar
+
+    lab_result = sa.table('lab_result', sa.column('test', sa.String), sa.column('canonical_id', sa.String))
+    conn = op.get_bind()
+    nombres = conn.execute(sa.select(lab_result.c.test).distinct()).scalars().all()
+    for nombre in nombres:
+        canonical_id = canonicalizar(nombre)
+        if canonical_id:
+            conn.execute(
+                lab_result.update().where(lab_result.c.test == nombre).values(canonical_id=canonical_id)
+            )
+
+
+def downgrade():
+    op.drop_index('ix_lab_result_user_canonical_date', table_name='lab_result')
+    op.drop_column('lab_result', 'canonical_id')
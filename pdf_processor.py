@@ -1,14 +1,185 @@
-import pdfplumber
+import io
+import os
+import re
+import metrics
 
-def extraer_texto_de_pdf(ruta_pdf):
-    all_text = ""
+MOTOR_POR_DEFECTO = os.environ.get('PDF_ENGINE', 'pymupdf')
+# Tolerancia vertical (en puntos) para agrupar palabras en una misma línea, como pdfplumber
+TOLERANCIA_Y = 3
+# Modo estricto: extrae todas las páginas, sin descartar las que la sonda considera sin resultados
+PAGINAS_ESTRICTO = os.environ.get('PDF_STRICT_PAGES', '0') == '1'
+# Límites por documento (0 = sin límite): un PDF patológico (miles de objetos de texto
+# diminutos, miles de páginas) se rechaza antes de agrupar líneas y parsear.
+# Una página de resultados real tiene unos pocos miles de caracteres
+MAX_PAGINAS = int(os.environ.get('PDF_MAX_PAGES', 500))
+MAX_CARACTERES_PAGINA = int(os.environ.get('PDF_MAX_PAGE_CHARS', 20000))
+
+# Sonda por página: un rango ("70 - 100") o umbral ("< 130") delata una tabla de resultados;
+# si no, basta una densidad de dígitos alta, o media junto a una cabecera típica de tabla
+_PATRON_SONDA = re.compile(r"\d\s*[-–]\s*\d|[<>]\s*\d")
+# (no "resultados": aparece también en el título de las portadas)
+_PATRON_CABECERA = re.compile(r"referen|rango|range|unidad|\bunits?\b", re.IGNORECASE)
+DIGITOS_MIN_PAGINA = 3
+# Las páginas de resultados rondan el 20% de dígitos; portadas y texto legal, menos del 5%
+DENSIDAD_DIGITOS_MIN = 0.1
+
+class LimiteExcedido(ValueError):
+    """El PDF supera PDF_MAX_PAGES o PDF_MAX_PAGE_CHARS; no se reintenta con otro motor."""
+
+
+def _comprobar_caracteres(numero, caracteres):
+    if MAX_CARACTERES_PAGINA and caracteres > MAX_CARACTERES_PAGINA:
+        raise LimiteExcedido(
+            f"Page {numero + 1} has {caracteres} characters of text (limit {MAX_CARACTERES_PAGINA})."
+        )
+
+
+def _es_ruta(fuente):
+    return isinstance(fuente, (str, os.PathLike))
+
+
+def _como_bytes(fuente):
+    # Admite bytes, bytearray, memoryview, mmap y objetos tipo archivo (BytesIO)
+    if hasattr(fuente, 'getvalue'):
+        return fuente.getvalue()
+    if hasattr(fuente, 'read') and not hasattr(fuente, 'size'):
+        fuente.seek(0)
+        return fuente.read()
+    return bytes(fuente) if not isinstance(fuente, bytes) else fuente
+
+
+def _abrir_pymupdf(fuente):
+    import pymupdf
+
+    if _es_ruta(fuente):
+        return pymupdf.open(fuente)
+    return pymupdf.open(stream=_como_bytes(fuente), filetype="pdf")
+
+
+def _abrir_pdfplumber(fuente):
+    import pdfplumber
+
+    if _es_ruta(fuente):
+        return pdfplumber.open(fuente)
+    return pdfplumber.open(io.BytesIO(_como_bytes(fuente)))
+
+
+def pagina_con_resultados(texto):
+    """Sonda barata: ¿puede la página contener resultados? Ante la duda, sí."""
+    digitos = sum(map(str.isdigit, texto))
+    if digitos < DIGITOS_MIN_PAGINA:
+        return False
+    if _PATRON_SONDA.search(texto):
+        return True
+    densidad = digitos / len(texto)
+    return densidad >= DENSIDAD_DIGITOS_MIN or (
+        densidad >= DENSIDAD_DIGITOS_MIN / 2 and _PATRON_CABECERA.search(texto) is not None
+    )
+
+
+def _lineas_pymupdf(fuente, inicio, fin, filtrar=False):
+    """Genera las líneas de las páginas [inicio, fin); devuelve cuántas páginas descartó la sonda."""
+    omitidas = 0
+    with _abrir_pymupdf(fuente) as doc:
+        for numero in range(inicio, fin):
+            palabras = doc[numero].get_text("words")
+            _comprobar_caracteres(numero, sum(len(w[4]) for w in palabras))
+            # La sonda usa las mismas palabras que la extracción: solo se ahorra el
+            # reensamblado de líneas y el parseo de las páginas descartadas
+            if filtrar and not pagina_con_resultados(" ".join(w[4] for w in palabras)):
+                omitidas += 1
+                continue
+            # Se reconstruyen las líneas a partir de las palabras para que las columnas
+            # de una misma fila queden juntas, igual que con pdfplumber
+            palabras = sorted(palabras, key=lambda w: (w[1], w[0]))
+            linea, top_linea = [], None
+            for x0, top, _, _, texto, *_ in palabras:
+                if top_linea is not None and top - top_linea > TOLERANCIA_Y:
+                    yield " ".join(t for _, t in sorted(linea))
+                    linea = []
+                if not linea:
+                    top_linea = top
+                linea.append((x0, texto))
+            if linea:
+                yield " ".join(t for _, t in sorted(linea))
+    return omitidas
+
+
+def _lineas_pdfplumber(fuente, inicio, fin, filtrar=False):
+    omitidas = 0
+    with _abrir_pdfplumber(fuente) as pdf:
+        for numero, page in enumerate(pdf.pages[inicio:fin], inicio):
+            # Antes de extract_text, que es lo caro con muchos objetos de texto
+            _comprobar_caracteres(numero, len(page.chars))
+            # Con pdfplumber la sonda lee los caracteres sueltos, sin agruparlos en líneas
+            if filtrar and not pagina_con_resultados("".join(c["text"] for c in page.chars)):
+                omitidas += 1
+                continue
+            text = page.extract_text()
+            if text:
+                yield from text.split("\n")
+    return omitidas
+
+
+MOTORES = {
+    'pymupdf': _lineas_pymupdf,
+    'pdfplumber': _lineas_pdfplumber,
+}
+
+
+def _info_documento(fuente, motor):
+    """Número de páginas y tamaño (ancho, alto) en puntos de la primera."""
+    if motor == 'pymupdf':
+        with _abrir_pymupdf(fuente) as doc:
+            rect = doc[0].rect if doc.page_count else None
+            return doc.page_count, (rect.width, rect.height) if rect else None
+
+    with _abrir_pdfplumber(fuente) as pdf:
+        primera = pdf.pages[0] if pdf.pages else None
+        return len(pdf.pages), (float(primera.width), float(primera.height)) if primera else None
+
+
+def contar_paginas(fuente, motor=MOTOR_POR_DEFECTO):
+    return _info_documento(fuente, motor)[0]
+
+
+def extraer_lineas(fuente, motor=None, filtrar=None, estadisticas=None):
+    """Genera las líneas de texto del PDF, página a página y en orden.
+
+    `fuente` puede ser una ruta o el contenido del PDF en memoria (bytes,
+    BytesIO o un buffer mmap), sin pasar por un archivo temporal. Las páginas
+    se extraen en el proceso que llama: el paralelismo está entre PDFs (un
+    PDF por worker del pool de análisis o de ingest.py).
+
+    Salvo en modo estricto (`filtrar=False` o PDF_STRICT_PAGES=1), las páginas
+    que la sonda descarta (portadas, metodología, texto legal) no se extraen.
+    Si se pasa `estadisticas` (un dict), al terminar contiene el total de
+    páginas ('total'), las descartadas ('skipped') y el tamaño de la primera
+    página ('page_size'), que usa la huella de layout.
+    """
+    motor = motor or MOTOR_POR_DEFECTO
+    if motor not in MOTORES:
+        raise ValueError(f"Motor de extracción desconocido: {motor}")
+    if filtrar is None:
+        filtrar = not PAGINAS_ESTRICTO
+
+    if not _es_ruta(fuente):
+        fuente = _como_bytes(fuente)
+
+    total, tamano_pagina = _info_documento(fuente, motor)
+    metrics.contar('pages', total)
+    if MAX_PAGINAS and total > MAX_PAGINAS:
+        raise LimiteExcedido(f"The PDF has {total} pages (limit {MAX_PAGINAS}).")
+    omitidas = yield from MOTORES[motor](fuente, 0, total, filtrar)
+
+    metrics.contar('pages_skipped', omitidas)
+    if estadisticas is not None:
+        estadisticas.update(total=total, skipped=omitidas, page_size=tamano_pagina)
+
+
+def extraer_texto_de_pdf(fuente, motor=None, filtrar=None):
     try:
-        with pdfplumber.open(ruta_pdf) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text()
-                if text:
-                    all_text += text + "\n"
-        return all_text.split("\n")
+        return list(extraer_lineas(fuente, motor, filtrar))
     except Exception as e:
         print(f"ERROR: Fallo al abrir o extraer el PDF: {e}")
-        return []
\ No newline at end of file
+        return []
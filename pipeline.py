@@ -0,0 +1,183 @@
+import os
+import multiprocessing
+from threading import Lock
+
+import metrics
+from pdf_processor import extraer_lineas, LimiteExcedido, MOTOR_POR_DEFECTO, PAGINAS_ESTRICTO
+from data_extractor import parsear_lineas, clasificar
+from layout_profiles import detectar_perfil
+from lab_results import resumir
+from result_cache import obtener_cache
+from worker_pool import SupervisedPool, TaskTimeout, WorkerCrashed, WorkerMemoryExceeded, WorkerStartFailed
+
+# Límites del pool de análisis (0 = sin límite): segundos por PDF, MB de RSS por
+# worker y PDFs analizados por un worker antes de sustituirlo por uno nuevo
+TIMEOUT_ANALISIS = float(os.environ.get('ANALYSIS_TASK_TIMEOUT', 60))
+MAX_RSS_WORKER_MB = float(os.environ.get('ANALYSIS_WORKER_MAX_RSS_MB', 1024))
+MAX_TAREAS_WORKER = int(os.environ.get('ANALYSIS_WORKER_MAX_TASKS', 500))
+# Segundos máximos que la petición espera el resultado de un PDF, cola incluida (0 = sin límite).
+# Cubre lo que ANALYSIS_TASK_TIMEOUT no ve: un pool que no llega a ejecutar la tarea
+ESPERA_RESULTADO = float(os.environ.get('ANALYSIS_RESULT_TIMEOUT', 300))
+# Método de arranque de los workers de análisis (ver _contexto_pool)
+METODO_ARRANQUE = os.environ.get('ANALYSIS_START_METHOD', 'forkserver')
+
+_pool = None
+_pool_lock = Lock()
+
+
+def combinar_resumenes(resumenes):
+    combinado = {'normal': 0, 'near': 0, 'abnormal': 0, 'total': 0}
+    for resumen in resumenes:
+        for clave in combinado:
+            combinado[clave] += resumen[clave]
+    return combinado
+
+
+def _parsear_pdf(fuente, motor, filtrar, paginas):
+    try:
+        # Las líneas se materializan para medir por separado extracción y parseo
+        estadisticas = {}
+        with metrics.span('extract'):
+            lineas = list(extraer_lineas(fuente, motor, filtrar=filtrar, estadisticas=estadisticas))
+        paginas.update(total=estadisticas['total'], skipped=estadisticas['skipped'])
+        with metrics.span('parse'):
+            # Los layouts conocidos se parsean con el perfil de su laboratorio
+            return parsear_lineas(lineas, detectar_perfil(lineas, estadisticas['page_size']))
+    except LimiteExcedido:
+        # Otro motor no lo haría mejor: el PDF se rechaza sin reintentos
+        raise
+    except Exception as e:
+        print(f"ERROR: Fallo al abrir o extraer el PDF con {motor}: {e}")
+        return []
+
+
+def analizar_pdf(fuente, estricto=PAGINAS_ESTRICTO):
+    """Analiza un PDF. Salvo en modo `estricto`, se saltan las páginas sin resultados."""
+    paginas = {}
+    resultados = _parsear_pdf(fuente, MOTOR_POR_DEFECTO, not estricto, paginas)
+    if not resultados and not estricto:
+        # La sonda pudo descartar páginas con un layout que no reconoce: se repite sin filtrar
+        resultados = _parsear_pdf(fuente, MOTOR_POR_DEFECTO, False, paginas)
+    if not resultados and MOTOR_POR_DEFECTO != 'pdfplumber':
+        # Algunos layouts solo se parsean bien con el orden de líneas de pdfplumber
+        resultados = _parsear_pdf(fuente, 'pdfplumber', False, paginas)
+
+    if not resultados:
+        raise ValueError('No data could be extracted from this PDF.')
+
+    with metrics.span('classify'):
+        clasificar(resultados)
+    with metrics.span('serialize'):
+        return {
+            'results': [resultado.to_dict() for resultado in resultados],
+            'summary': resumir(resultados),
+            'pages': paginas
+        }
+
+
+def _analizar_en_worker(fuente, estricto):
+    # Los tiempos y contadores del worker viajan con el resultado y se registran
+    # en el proceso principal, que es el que expone /metrics
+    metrics.iniciar_recoleccion()
+    return analizar_pdf(fuente, estricto), metrics.recoger()
+
+
+def _max_workers():
+    configurado = int(os.environ.get('ANALYSIS_WORKERS', 0))
+    return configurado if configurado > 0 else min(os.cpu_count() or 1, 8)
+
+
+def _contexto_pool():
+    # Los workers se crean desde el hilo supervisor: un fork desde un proceso con hilos
+    # puede heredar locks tomados por otros hilos. Con forkserver cada worker nace de un
+    # proceso sin hilos que ya tiene cargados este módulo y PyMuPDF
+    if METODO_ARRANQUE not in multiprocessing.get_all_start_methods():
+        return None
+    contexto = multiprocessing.get_context(METODO_ARRANQUE)
+    if METODO_ARRANQUE == 'forkserver':
+        contexto.set_forkserver_preload(['pymupdf', __name__])
+    return contexto
+
+
+def obtener_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SupervisedPool(
+                max_workers=_max_workers(),
+                timeout=TIMEOUT_ANALISIS,
+                max_rss_mb=MAX_RSS_WORKER_MB,
+                max_tasks=MAX_TAREAS_WORKER,
+                mp_context=_contexto_pool()
+            )
+        return _pool
+
+
+def analizar_lote(archivos, al_terminar=None, estricto=PAGINAS_ESTRICTO):
+    """Analiza una lista de (nombre, fuente, sha256) en el pool de procesos.
+
+    `fuente` es el contenido del PDF en bytes o, para subidas grandes, la ruta
+    del archivo en el que Werkzeug lo volcó.
+
+    Devuelve un resultado por archivo, en el mismo orden; un PDF que falla
+    produce una entrada con 'error' en lugar de abortar el lote. Los PDFs ya
+    analizados se sirven desde la caché de resultados sin pasar por el pool.
+    `al_terminar`, si se indica, se llama tras cada archivo (para informar del progreso).
+    Con `estricto` se extraen todas las páginas, sin la sonda de páginas sin resultados.
+    """
+    cache = obtener_cache()
+    pool = obtener_pool()
+
+    pendientes = []
+    for nombre, fuente, digest in archivos:
+        # El resultado estricto puede diferir del filtrado: se cachean por separado
+        digest = f"{digest}:strict" if estricto else digest
+        cacheado = cache.get(digest)
+        if cacheado is not None:
+            pendientes.append((nombre, digest, cacheado, None))
+        else:
+            pendientes.append((nombre, digest, None, pool.submit(_analizar_en_worker, fuente, estricto)))
+
+    resultados = []
+    for nombre, digest, cacheado, futuro in pendientes:
+        if futuro is None:
+            resultados.append({'filename': nombre, 'success': True, 'cached': True, **cacheado})
+        else:
+            resultados.append(_resultado_futuro(nombre, digest, futuro, cache))
+        if al_terminar is not None:
+            al_terminar()
+    return resultados
+
+
+def _resultado_futuro(nombre, digest, futuro, cache):
+    # El pool sustituye por sí solo los workers que mata o que mueren: aquí solo
+    # se traduce cada caso a un error del archivo, sin afectar al resto del lote
+    try:
+        resultado, recolectado = futuro.result(timeout=ESPERA_RESULTADO or None)
+    except TimeoutError:
+        # La tarea sigue en el pool (si aún no empezó, se cancela); el lote no espera más
+        futuro.cancel()
+        metrics.error('analysis_wait')
+        return {'filename': nombre, 'success': False, 'error': f'PDF analysis did not finish within {ESPERA_RESULTADO:g} seconds.'}
+    except TaskTimeout:
+        metrics.error('analysis_timeout')
+        return {'filename': nombre, 'success': False, 'error': f'PDF analysis timed out after {TIMEOUT_ANALISIS:g} seconds.'}
+    except WorkerMemoryExceeded:
+        metrics.error('worker_memory')
+        return {'filename': nombre, 'success': False, 'error': 'PDF analysis exceeded the memory limit.'}
+    except WorkerCrashed:
+        metrics.error('worker_crash')
+        return {'filename': nombre, 'success': False, 'error': 'Worker process crashed while analyzing this PDF.'}
+    except WorkerStartFailed:
+        metrics.error('worker_start')
+        return {'filename': nombre, 'success': False, 'error': 'No analysis worker could be started; retry later.'}
+    except LimiteExcedido as e:
+        metrics.error('pdf_limit')
+        return {'filename': nombre, 'success': False, 'error': str(e)}
+    except Exception as e:
+        metrics.error('analysis')
+        return {'filename': nombre, 'success': False, 'error': str(e)}
+    metrics.registrar(recolectado)
+    # Fuera del try: un fallo al guardar en caché no convierte un análisis correcto en error
+    cache.put(digest, resultado)
+    return {'filename': nombre, 'success': True, 'cached': False, **resultado}
@@ -10,8 +10,70 @@ document.addEventListener('DOMContentLoaded', function() {
     initializeTypedText();
     initializeFileUpload();
     initializeScrollAnimations();
+    loadTimeline();
 });
 
+// Anonymous browser identity: the server issues a signed token, and only that token can read or add to this timeline
+// Set to false when the server has the timeline disabled or rejects the stored token; analyses still work without it
+let timelineEnabled = true;
+
+async function getAuthToken() {
+    if (!timelineEnabled) return null;
+    let token = localStorage.getItem('authToken');
+    if (token) return token;
+    try {
+        const response = await fetch(`${API_BASE_URL}/session`, { method: 'POST' });
+        if (!response.ok) {
+            timelineEnabled = false;
+            return null;
+        }
+        token = (await response.json()).token;
+        localStorage.setItem('authToken', token);
+        return token;
+    } catch (error) {
+        console.error('Session Error:', error);
+        return null;
+    }
+}
+
+async function authHeaders() {
+    const token = await getAuthToken();
+    return token ? { 'Authorization': `Bearer ${token}` } : {};
+}
+
+// Load the analyses saved on the server
+async function loadTimeline() {
+    try {
+        const headers = await authHeaders();
+        if (!headers.Authorization) return;
+        const response = await fetch(`${API_BASE_URL}/timeline`, { headers });
+        if (response.status === 503) {
+            // Timeline disabled on the server
+            timelineEnabled = false;
+            return;
+        }
+        if (response.status === 401) {
+            // The stored token is kept (it may become valid again, e.g. once the server secret is restored),
+            // but it is not sent for the rest of this page so analyses are not rejected
+            timelineEnabled = false;
+            showNotification('Your saved timeline could not be loaded: the server did not accept your session. New analyses will not be saved to it.', 'warning');
+            return;
+        }
+        if (!response.ok) return;
+        const data = await response.json();
+        timelineData = data.entries.map(entry => ({
+            date: entry.date,
+            results: entry.results,
+            summary: calculateSummary(entry.results)
+        }));
+        timelineData.sort((a, b) => new Date(a.date) - new Date(b.date));
+        displayTimeline();
+        updateChart();
+    } catch (error) {
+        console.error('Timeline Error:', error);
+    }
+}
+
 // Initialize animations
 function initializeAnimations() {
     const featureCards = document.querySelectorAll('.feature-card');
@@ -152,11 +214,13 @@ async function processReports() {
     
     try {
         const formData = new FormData();
-        formData.append('files', uploadedFiles[0]);
+        uploadedFiles.forEach(file => formData.append('files', file));
         formData.append('date', reportDate);
 
+        // With the session token the analysis is also saved to this browser's timeline
         const response = await fetch(`${API_BASE_URL}/analyze`, {
             method: 'POST',
+            headers: await authHeaders(),
             body: formData
         });
 
@@ -166,7 +230,12 @@ async function processReports() {
             analysisResults = data.results;
             displayResults(data.results);
             updateTimeline(data.results, data.report_date);
-            showNotification('Reports analyzed successfully!', 'success');
+            const failed = (data.files || []).filter(f => !f.success);
+            if (failed.length > 0) {
+                showNotification(`${failed.length} of ${data.files.length} reports could not be analyzed: ${failed.map(f => f.filename).join(', ')}`, 'warning');
+            } else {
+                showNotification('Reports analyzed successfully!', 'success');
+            }
         } else {
             showNotification(data.error || 'Error processing reports. Check your PDF format.', 'error');
         }
@@ -220,7 +289,7 @@ function displayResults(results) {
                         <tr class="hover:bg-gray-50">
                             <td class="px-6 py-4 whitespace-nowrap text-sm font-medium text-gray-900">${result.test}</td>
                             <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500">${result.value} ${result.unit}</td>
-                            <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500">${result.refLow} - ${result.refHigh}</td>
+                            <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500">${formatRange(result)}</td>
                             <td class="px-6 py-4 whitespace-nowrap">
                                 <span class="px-2 inline-flex text-xs leading-5 font-semibold rounded-full ${getStatusColor(result.status)}">
                                     ${result.status}
@@ -233,18 +302,30 @@ function displayResults(results) {
         </div>
         
         <div class="mt-6 flex space-x-4">
-            <button onclick="generatePDF('patient')" class="flex-1 bg-blue-600 text-white py-3 px-4 rounded-lg font-semibold hover:bg-blue-700 transition-colors">
+            <button onclick="streamReport('patient')" class="flex-1 bg-blue-600 text-white py-3 px-4 rounded-lg font-semibold hover:bg-blue-700 transition-colors">
                 <i class="fas fa-download mr-2"></i>
                 Download Patient Report
             </button>
-            <button onclick="generatePDF('doctor')" class="flex-1 bg-green-600 text-white py-3 px-4 rounded-lg font-semibold hover:bg-green-700 transition-colors">
+            <button onclick="streamReport('doctor')" class="flex-1 bg-green-600 text-white py-3 px-4 rounded-lg font-semibold hover:bg-green-700 transition-colors">
                 <i class="fas fa-download mr-2"></i>
                 Download Doctor Report
             </button>
         </div>
+        
+        <div id="report-stream" class="hidden mt-6 bg-white rounded-lg shadow p-6">
+            <h4 id="report-stream-title" class="text-lg font-semibold text-gray-800 mb-3"></h4>
+            <div id="report-stream-text" class="text-sm text-gray-700 whitespace-pre-wrap"></div>
+        </div>
     `;
 }
 
+// Reference range; open-ended ranges arrive with a null bound and a rangeType marker
+function formatRange(result) {
+    if (result.rangeType === 'min_only') return `> ${result.refLow}`;
+    if (result.rangeType === 'max_only') return `< ${result.refHigh}`;
+    return `${result.refLow} - ${result.refHigh}`;
+}
+
 // Calculate summary statistics
 function calculateSummary(results) {
     const summary = {
@@ -423,6 +504,101 @@ async function generatePDF(type) {
     }
 }
 
+// Stream the AI report as it is generated (Server-Sent Events over a POST request),
+// then download the PDF rendered from the finished text
+async function streamReport(type) {
+    if (analysisResults.length === 0) {
+        showNotification('Analyze a report first.', 'warning');
+        return;
+    }
+    
+    const panel = document.getElementById('report-stream');
+    const textContainer = document.getElementById('report-stream-text');
+    document.getElementById('report-stream-title').textContent = `${type.charAt(0).toUpperCase() + type.slice(1)} report`;
+    textContainer.textContent = '';
+    panel.classList.remove('hidden');
+
+    try {
+        const response = await fetch(`${API_BASE_URL}/generate-report/stream`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream'
+            },
+            body: JSON.stringify({ type: type, results: analysisResults, render_pdf: true })
+        });
+
+        if (!response.ok || !response.body) {
+            // Fall back to the non-streaming endpoint
+            await generatePDF(type);
+            return;
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let done = null;
+
+        while (true) {
+            const { value, done: streamDone } = await reader.read();
+            if (streamDone) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const event = parseSSEEvent(buffer.slice(0, boundary));
+                buffer = buffer.slice(boundary + 2);
+
+                if (event.event === 'chunk') {
+                    textContainer.textContent += event.data.text;
+                } else if (event.event === 'done') {
+                    done = event.data;
+                } else if (event.event === 'error') {
+                    throw new Error(event.data.error);
+                }
+            }
+        }
+
+        if (done) {
+            await downloadReport(`${API_BASE_URL}${done.pdf_url.replace(/^\/api/, '')}`, type);
+        }
+    } catch (error) {
+        console.error('Streaming error:', error);
+        showNotification(`Error generating ${type} report.`, 'error');
+    }
+}
+
+function parseSSEEvent(raw) {
+    const event = { event: 'message', data: '' };
+    raw.split('\n').forEach(line => {
+        if (line.startsWith('event:')) {
+            event.event = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+            event.data += line.slice(5).trim();
+        }
+    });
+    event.data = event.data ? JSON.parse(event.data) : {};
+    return event;
+}
+
+async function downloadReport(url, type) {
+    const response = await fetch(url);
+    if (!response.ok) {
+        showNotification(`Error downloading ${type} report.`, 'error');
+        return;
+    }
+    const blob = await response.blob();
+    const blobUrl = window.URL.createObjectURL(blob);
+    const a = document.createElement('a');
+    a.style.display = 'none';
+    a.href = blobUrl;
+    a.download = `${type}_report.pdf`;
+    document.body.appendChild(a);
+    a.click();
+    window.URL.revokeObjectURL(blobUrl);
+    showNotification(`${type.charAt(0).toUpperCase() + type.slice(1)} report downloaded successfully!`, 'success');
+}
+
 // Utility functions
 function scrollToSection(sectionId) {
     const section = document.getElementById(sectionId);
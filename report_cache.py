@@ -0,0 +1,115 @@
+import os
+import json
+import hashlib
+from math import isinf, isnan
+from concurrent.futures import Future
+from threading import Lock
+
+from result_cache import LRUCache
+
+
+def _normalizar_numero(valor):
+    if valor is None:
+        return ""
+    valor = float(valor)
+    if isnan(valor):
+        return ""
+    if isinf(valor):
+        return "inf" if valor > 0 else "-inf"
+    return f"{valor:.10g}"
+
+
+def clave_reporte(registros, tipo_prompt, prompt_version, modelo):
+    """Hash canónico de los resultados: no depende del orden de las filas ni del formato de los números."""
+    filas = sorted(
+        (
+            str(r.get('test', '')).strip(),
+            _normalizar_numero(r.get('value')),
+            str(r.get('unit') or '').strip(),
+            _normalizar_numero(r.get('refLow')),
+            # Los umbrales '>' llegan del navegador con refHigh = null (inf en el servidor)
+            _normalizar_numero(r.get('refHigh')) or "inf",
+            str(r.get('status', '')).strip(),
+        )
+        for r in registros
+    )
+    contenido = json.dumps([tipo_prompt, prompt_version, modelo, filas], ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+class ReportCache:
+    """Caché de textos de reportes IA con TTL y coalescencia de peticiones en vuelo.
+
+    Si varias peticiones idénticas llegan mientras el modelo aún está generando,
+    solo la primera llama al LLM; el resto espera y reutiliza su respuesta.
+    """
+
+    def __init__(self, max_entries=256, ttl=24 * 3600):
+        self._cache = LRUCache(max_entries, ttl=ttl)
+        self._inflight = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def put(self, key, value):
+        self._cache.put(key, value)
+
+    def get_or_create(self, key, crear):
+        with self._lock:
+            value = self._cache.get(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            futuro = self._inflight.get(key)
+            propietario = futuro is None
+            if propietario:
+                futuro = self._inflight[key] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not propietario:
+            return futuro.result()
+
+        try:
+            value = crear()
+            self._cache.put(key, value)
+            futuro.set_result(value)
+            return value
+        except BaseException as e:
+            futuro.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'hit_rate': (self.hits + self.coalesced) / lookups if lookups else 0.0,
+                'in_flight': len(self._inflight),
+                'entries': len(self._cache)
+            }
+
+
+_cache = None
+_cache_lock = Lock()
+
+
+def obtener_cache_reportes():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ReportCache(
+                max_entries=int(os.environ.get('REPORT_CACHE_SIZE', 256)),
+                ttl=int(os.environ.get('REPORT_CACHE_TTL', 24 * 3600))
+            )
+        return _cache
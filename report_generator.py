@@ -1,32 +1,70 @@
+import io
 import os
 import re
-import google.genai as genai 
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_JUSTIFY
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.units import inch
-
-def _configurar_cliente_gemini():
-    API_KEY = os.getenv("GEMINI_API_KEY")
-    if not API_KEY:
-        raise ValueError("No se encontró la GEMINI_API_KEY.")
-    
-    os.environ["GEMINI_API_KEY"] = API_KEY 
-    return genai.Client()
-
-def _lab_results_to_text(df):
-    lines = []
-    for _, row in df.iterrows():
-        row_dict = row.to_dict()
-        line = (
-            f"{row_dict['test']}: {row_dict['value']} {row_dict['unit']} "
-            f"(reference range {row_dict['refLow']}–{row_dict['refHigh']}). "
-            f"Status: {row_dict['status']}."
-        )
-        lines.append(line)
+from threading import Lock
+
+import metrics
+from report_cache import clave_reporte, obtener_cache_reportes
+from llm_client import obtener_backend
+from lab_results import SOLO_MAXIMO, SOLO_MINIMO
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+# Incrementar al cambiar el texto de los prompts: invalida los reportes cacheados
+PROMPT_VERSION = "4"
+# 'verbose': una frase por resultado; 'compact': tabla densa con los resultados normales
+# agrupados (opcional hasta validar la calidad de los reportes con ese formato)
+PROMPT_FORMAT = os.getenv("PROMPT_FORMAT", "verbose")
+FORMATOS_PROMPT = ("compact", "verbose")
+
+def _reference_range_text(result):
+    if result.range_type == SOLO_MINIMO:
+        return f"above {result.ref_low}"
+    if result.range_type == SOLO_MAXIMO:
+        return f"below {result.ref_high}"
+    return f"{result.ref_low}–{result.ref_high}"
+
+def _lab_results_to_text(results):
+    lines = [
+        f"{result.test}: {result.value} {result.unit} "
+        f"(reference range {_reference_range_text(result)}). "
+        f"Status: {result.status}."
+        for result in results
+    ]
     return "Here are the patient's laboratory results:\n\n" + "\n".join(lines)
 
+def _number_text(value):
+    # 12.0 -> "12", 0.60 -> "0.6": los ceros sobrantes solo gastan tokens
+    return f"{value:g}"
+
+def _compact_range_text(result):
+    if result.range_type == SOLO_MINIMO:
+        return f">{_number_text(result.ref_low)}"
+    if result.range_type == SOLO_MAXIMO:
+        return f"<{_number_text(result.ref_high)}"
+    return f"{_number_text(result.ref_low)}-{_number_text(result.ref_high)}"
+
+def _lab_results_to_compact_text(results):
+    """Tabla test|value|unit|ref|status solo para los resultados fuera de rango o
+    en el límite; los normales se resumen en una lista de nombres."""
+    flagged = [result for result in results if result.status != "Normal"]
+    normal_counts = {}
+    for result in results:
+        if result.status == "Normal":
+            normal_counts[result.test] = normal_counts.get(result.test, 0) + 1
+
+    lines = ["Lab results. Format test|value|unit|ref|status; ref <x = below x, >x = above x."]
+    if flagged:
+        lines.append("Outside or near range:")
+        lines.extend(
+            f"{result.test}|{_number_text(result.value)}|{result.unit}|{_compact_range_text(result)}|{result.status}"
+            for result in flagged
+        )
+    if normal_counts:
+        lines.append(f"Normal ({sum(normal_counts.values())}): " + ", ".join(
+            test if count == 1 else f"{test} x{count}" for test, count in normal_counts.items()
+        ))
+    return "\n".join(lines)
+
 
 def _generate_prompt(content, tipo_prompt):
     if tipo_prompt == "doctor":
@@ -70,27 +108,157 @@ Please write a simple summary for the patient following these rules:
     and will give you the best recommendations. Always talk to your doctor!"
 """
 
-def generar_reporte_ia(df, tipo_prompt):
-    client = _configurar_cliente_gemini()
-    content = _lab_results_to_text(df)
-    prompt = _generate_prompt(content, tipo_prompt)
+def _generate_compact_prompt(content, tipo_prompt):
+    if tipo_prompt == "doctor":
+        return f"""You are a physician specialized in clinical laboratory interpretation.
+{content}
+
+Write a concise medical report in English, 2-4 paragraphs of professional language:
+- Summarize normal findings briefly; detail Near, Low and High values.
+- Possible physiological changes or conditions behind abnormal or borderline values are hypotheses, not diagnoses: say so.
+- If everything is normal, state it explicitly.
+- End with: “This report is for informational purposes only and does not replace professional medical evaluation.”
+"""
+
+    if tipo_prompt == "patient":
+        return f"""You are a friendly, empathetic health advisor explaining lab results in simple, positive language.
+{content}
+
+Write a simple summary for the patient:
+1. Start by celebrating the Normal results.
+2. For each High, Low or Near result: explain what it measures without jargon and give 2-3 practical lifestyle tips (diet, exercise).
+3. Keep the tone positive and empowering, not alarming.
+4. End with this exact disclaimer:
+"Remember, this is an interpretation to help you understand your results.
+It does not replace a consultation with your doctor, who knows your history
+and will give you the best recommendations. Always talk to your doctor!"
+"""
+
+def construir_prompt(results, tipo_prompt, formato=None):
+    """Prompt completo del reporte en el formato indicado (por defecto PROMPT_FORMAT)."""
+    formato = formato or PROMPT_FORMAT
+    if formato == "compact":
+        return _generate_compact_prompt(_lab_results_to_compact_text(results), tipo_prompt)
+    if formato == "verbose":
+        return _generate_prompt(_lab_results_to_text(results), tipo_prompt)
+    raise ValueError(f"Formato de prompt desconocido: {formato}")
+
+def _llamar_llm(backend, results, tipo_prompt):
+    prompt = construir_prompt(results, tipo_prompt)
+    with metrics.span('llm'):
+        return backend.generate(prompt, GEMINI_MODEL)
+
+def clave_reporte_ia(results, tipo_prompt, backend):
+    modelo = f"{backend.name}:{GEMINI_MODEL}"
+    # El formato cambia el prompt: cada uno tiene sus propios reportes cacheados
+    return clave_reporte([result.to_dict() for result in results], tipo_prompt, f"{PROMPT_VERSION}:{PROMPT_FORMAT}", modelo)
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash", 
-        contents=prompt
+def generar_reporte_ia(results, tipo_prompt):
+    backend = obtener_backend()
+    return obtener_cache_reportes().get_or_create(
+        clave_reporte_ia(results, tipo_prompt, backend),
+        lambda: _llamar_llm(backend, results, tipo_prompt)
     )
-    return response.text
 
-def create_medical_report_pdf(output_filename, report_text):
-    doc = SimpleDocTemplate(output_filename, pagesize=letter, topMargin=inch, bottomMargin=inch, leftMargin=inch, rightMargin=inch)
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(name="Normal_Justified", parent=styles["Normal"], alignment=TA_JUSTIFY, spaceAfter=12, leading=14))
-    
+def generar_reporte_ia_stream(results, tipo_prompt):
+    """Devuelve (clave, cacheado, fragmentos) para enviar el reporte según se genera.
+
+    Cuando el generador de fragmentos termina, el texto completo queda en la
+    caché de reportes, así que la descarga posterior del PDF no vuelve a
+    llamar al modelo.
+    """
+    backend = obtener_backend()
+    clave = clave_reporte_ia(results, tipo_prompt, backend)
+    cache = obtener_cache_reportes()
+
+    texto = cache.get(clave)
+    if texto is not None:
+        return clave, True, iter([texto])
+
+    prompt = construir_prompt(results, tipo_prompt)
+
+    def fragmentos():
+        partes = []
+        with metrics.span('llm_stream'):
+            for fragmento in backend.stream(prompt, GEMINI_MODEL):
+                partes.append(fragmento)
+                yield fragmento
+        cache.put(clave, "".join(partes))
+
+    return clave, False, fragmentos()
+
+def obtener_reporte_cacheado(clave):
+    return obtener_cache_reportes().get(clave)
+
+_styles = None
+_styles_lock = Lock()
+
+def _doc_template(output):
+    # reportlab se importa al renderizar el primer PDF (o en precargar_render), no al arrancar
+    from reportlab.platypus import SimpleDocTemplate
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.units import inch
+
+    # Plantilla de página común a todos los reportes
+    return SimpleDocTemplate(output, pagesize=letter, topMargin=inch, bottomMargin=inch, leftMargin=inch, rightMargin=inch)
+
+def _report_styles():
+    # La hoja de estilos se construye una vez por proceso y se reutiliza en cada render
+    global _styles
+    with _styles_lock:
+        if _styles is None:
+            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+            from reportlab.lib.enums import TA_JUSTIFY
+
+            styles = getSampleStyleSheet()
+            styles.add(ParagraphStyle(name="Normal_Justified", parent=styles["Normal"], alignment=TA_JUSTIFY, spaceAfter=12, leading=14))
+            _styles = styles
+        return _styles
+
+def precargar_render():
+    """Importa reportlab y construye la hoja de estilos antes de servir peticiones."""
+    _report_styles()
+    import reportlab.platypus  # noqa: F401
+
+def _report_story(report_text, styles):
+    from reportlab.platypus import Paragraph
+
     Story = []
     blocks = report_text.strip().split('\n\n')
 
     for block in blocks:
         if block.strip():
             Story.append(Paragraph(block.strip(), styles["Normal_Justified"]))
-            
-    doc.build(Story)
\ No newline at end of file
+    return Story
+
+def create_medical_report_pdf(output, report_text):
+    """Renderiza el reporte en `output`, que puede ser una ruta o un buffer (BytesIO)."""
+    doc = _doc_template(output)
+    doc.build(_report_story(report_text, _report_styles()))
+
+def create_medical_reports_pdf(output, reports):
+    """Renderiza varios reportes [(título, texto), ...] en un único PDF, uno por sección."""
+    from reportlab.platypus import Paragraph, PageBreak
+
+    styles = _report_styles()
+    Story = []
+    for index, (title, report_text) in enumerate(reports):
+        if index:
+            Story.append(PageBreak())
+        Story.append(Paragraph(title, styles["Heading1"]))
+        Story.extend(_report_story(report_text, styles))
+
+    doc = _doc_template(output)
+    doc.build(Story)
+
+def render_medical_report_pdf(report_text):
+    buffer = io.BytesIO()
+    with metrics.span('render'):
+        create_medical_report_pdf(buffer, report_text)
+    return buffer.getvalue()
+
+def render_medical_reports_pdf(reports):
+    buffer = io.BytesIO()
+    with metrics.span('render'):
+        create_medical_reports_pdf(buffer, reports)
+    return buffer.getvalue()
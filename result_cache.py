@@ -0,0 +1,220 @@
+import os
+import time
+import sqlite3
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+
+import metrics
+from biomarker_names import VERSION_SINONIMOS
+from data_extractor import PARSER_VERSION
+from layout_profiles import VERSION_PERFILES
+from serializer import dumps, loads
+
+# El resultado de un PDF depende del parser y de los recursos que carga: editar el
+# diccionario de sinónimos o un perfil de layout invalida la caché igual que PARSER_VERSION
+VERSION_CACHE = f"{PARSER_VERSION}.{VERSION_SINONIMOS}.{VERSION_PERFILES}"
+
+
+def hash_contenido(contenido):
+    return hashlib.sha256(contenido).hexdigest()
+
+
+def _error_disco(operacion, e):
+    print(f"ERROR: Caché de resultados en disco ({operacion}): {e}")
+    metrics.error('result_cache')
+
+
+class LRUCache:
+    def __init__(self, max_entries, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            expires, value = self._data[key]
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskCache:
+    # La fecha de último acceso de los aciertos se escribe en lotes: así una lectura
+    # no es una escritura (y un commit) en un archivo que comparten varios procesos
+    ACCESOS_POR_VOLCADO = 64
+    SEGUNDOS_ENTRE_VOLCADOS = 30
+
+    def __init__(self, path, max_entries, version):
+        self.path = path
+        self.max_entries = max_entries
+        self.version = version
+        self._lock = Lock()
+        self._accesos = {}
+        self._ultimo_volcado = time.monotonic()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS result_cache ("
+            "key TEXT PRIMARY KEY, version TEXT NOT NULL, value TEXT NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_result_cache_accessed ON result_cache (accessed)")
+        # Las entradas de otra versión del parser ya no son válidas
+        self._conn.execute("DELETE FROM result_cache WHERE version != ?", (version,))
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM result_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._accesos[key] = time.time()
+            if (len(self._accesos) >= self.ACCESOS_POR_VOLCADO
+                    or time.monotonic() - self._ultimo_volcado >= self.SEGUNDOS_ENTRE_VOLCADOS):
+                try:
+                    self._volcar_accesos()
+                except sqlite3.Error as e:
+                    # El acierto sigue siendo válido aunque no se pudiera anotar el acceso
+                    _error_disco('accessed', e)
+        return loads(row[0])
+
+    def _volcar_accesos(self):
+        # Con el lock tomado
+        accesos, self._accesos = self._accesos, {}
+        self._ultimo_volcado = time.monotonic()
+        if accesos:
+            self._conn.executemany(
+                "UPDATE result_cache SET accessed = ? WHERE key = ?", [(t, key) for key, t in accesos.items()]
+            )
+            self._conn.commit()
+
+    def put(self, key, value):
+        with self._lock:
+            # Los accesos pendientes cuentan para decidir qué entradas se desalojan
+            self._volcar_accesos()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO result_cache (key, version, value, accessed) VALUES (?, ?, ?, ?)",
+                (key, self.version, dumps(value), time.time())
+            )
+            self._conn.execute(
+                "DELETE FROM result_cache WHERE key IN ("
+                "SELECT key FROM result_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM result_cache").fetchone()[0]
+
+
+class ResultCache:
+    """Caché de resultados clasificados por SHA-256 del PDF y versión (VERSION_CACHE).
+
+    Nivel en memoria (LRU) delante de un nivel opcional en disco (SQLite).
+    Un error del nivel en disco (p. ej. "database is locked" con varios procesos
+    escribiendo) se registra y cuenta como fallo de caché: nunca hace fallar un análisis.
+    """
+
+    def __init__(self, memory_entries=256, disk_path=None, disk_entries=10000, version=VERSION_CACHE):
+        self.version = version
+        self.memory = LRUCache(memory_entries)
+        self.disk = None
+        if disk_path:
+            try:
+                self.disk = DiskCache(disk_path, disk_entries, version)
+            except sqlite3.Error as e:
+                _error_disco('open', e)
+        self._lock = Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _key(self, digest):
+        return f"{self.version}:{digest}"
+
+    def get(self, digest):
+        key = self._key(digest)
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            try:
+                value = self.disk.get(key)
+            except sqlite3.Error as e:
+                _error_disco('get', e)
+            if value is not None:
+                self.memory.put(key, value)
+                with self._lock:
+                    self.disk_hits += 1
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, digest, value):
+        key = self._key(digest)
+        self.memory.put(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.put(key, value)
+            except sqlite3.Error as e:
+                _error_disco('put', e)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'version': self.version,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'memory_entries': len(self.memory),
+                'disk_entries': self._disk_entries()
+            }
+
+    def _disk_entries(self):
+        if self.disk is None:
+            return 0
+        try:
+            return len(self.disk)
+        except sqlite3.Error as e:
+            _error_disco('count', e)
+            return None
+
+
+_cache = None
+_cache_lock = Lock()
+
+
+def obtener_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            cache_dir = os.environ.get('RESULT_CACHE_DIR', 'data')
+            disk_path = None
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+                disk_path = os.path.join(cache_dir, 'result_cache.sqlite3')
+            _cache = ResultCache(
+                memory_entries=int(os.environ.get('RESULT_CACHE_SIZE', 256)),
+                disk_path=disk_path,
+                disk_entries=int(os.environ.get('RESULT_CACHE_DISK_ENTRIES', 10000))
+            )
+        return _cache
@@ -0,0 +1,26 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se usa json de la librería estándar
+    orjson = None
+
+
+def dumps(obj):
+    """Serializa a bytes UTF-8; con orjson si está instalado."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def a_columnas(registros):
+    if not registros:
+        return {}
+    nombres = list(registros[0])
+    return {nombre: [registro.get(nombre) for registro in registros] for nombre in nombres}
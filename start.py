@@ -27,6 +27,7 @@ def check_dependencies():
         'flask_cors',
         'pandas',
         'pdfplumber',
+        'pymupdf',
         'reportlab'
     ]
     
@@ -86,8 +87,9 @@ def start_flask_app():
     print("🚀 Starting Flask backend...")
     
     try:
-        # Import and run the Flask app
-        from api import app
+        # Import and run the Flask app (development server; use gunicorn -c gunicorn.conf.py in production)
+        from app import create_app
+        app = create_app(warm=False)
         
         # Run in a separate thread to avoid blocking
         def run_app():
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+import app as aplicacion
+import llm_client
+import report_cache
+from llm_client import StubBackend
+from result_cache import LRUCache
+
+RESULTADOS = [
+    {'test': 'Glucose', 'value': 130, 'unit': 'mg/dL', 'refLow': 70, 'refHigh': 100, 'status': 'abnormal'},
+    {'test': 'Hemoglobin', 'value': 14.1, 'unit': 'g/dL', 'refLow': 12, 'refHigh': 16, 'status': 'normal'},
+]
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    # Modelo determinista y cachés vacías en cada prueba
+    monkeypatch.setattr(llm_client, '_backend', StubBackend())
+    monkeypatch.setattr(report_cache, '_cache', None)
+    monkeypatch.setattr(aplicacion, 'rendered_reports', LRUCache(8, ttl=3600))
+    return aplicacion.app.test_client()
+
+
+def eventos(respuesta):
+    """Lista de (evento, datos) de una respuesta text/event-stream."""
+    resultado = []
+    for bloque in respuesta.get_data(as_text=True).split('\n\n'):
+        if not bloque.strip():
+            continue
+        campos = dict(linea.split(': ', 1) for linea in bloque.splitlines())
+        resultado.append((campos['event'], json.loads(campos['data'])))
+    return resultado
+
+
+def generar(cliente, **opciones):
+    respuesta = cliente.post('/api/generate-report/stream', json={'results': RESULTADOS, 'type': 'patient'} | opciones)
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == 'text/event-stream'
+    return eventos(respuesta)
+
+
+def test_stream_envia_fragmentos_y_done(cliente):
+    recibidos = generar(cliente)
+
+    *fragmentos, (ultimo, done) = recibidos
+    assert ultimo == 'done'
+    assert len(fragmentos) > 1
+    assert all(evento == 'chunk' for evento, _ in fragmentos)
+    texto = ''.join(datos['text'] for _, datos in fragmentos)
+    assert texto.startswith('Stub report')
+    assert done['cached'] is False
+    assert done['pdf_url'] == f"/api/reports/{done['report_key']}/pdf?type=patient"
+
+
+def test_segunda_peticion_sale_de_la_cache(cliente):
+    primera = generar(cliente)
+    segunda = generar(cliente)
+
+    texto = ''.join(datos['text'] for evento, datos in primera if evento == 'chunk')
+    assert segunda == [('chunk', {'text': texto}), ('done', primera[-1][1] | {'cached': True})]
+
+
+def test_descarga_del_pdf_por_report_key(cliente, monkeypatch):
+    done = generar(cliente)[-1][1]
+
+    # El texto quedó en la caché de reportes: la descarga no vuelve a llamar al modelo
+    def sin_modelo(*args):
+        raise AssertionError('the model must not be called again')
+
+    monkeypatch.setattr(StubBackend, 'stream', sin_modelo)
+    monkeypatch.setattr(StubBackend, 'generate', sin_modelo)
+    respuesta = cliente.get(done['pdf_url'])
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == 'application/pdf'
+    assert respuesta.data.startswith(b'%PDF')
+    assert 'patient_report.pdf' in respuesta.headers['Content-Disposition']
+
+
+def test_render_pdf_deja_el_pdf_listo(cliente, monkeypatch):
+    done = generar(cliente, render_pdf=True)[-1][1]
+    renderizado = aplicacion.rendered_reports.get(done['report_key'])
+    assert renderizado.startswith(b'%PDF')
+
+    # Se sirve el PDF ya renderizado, sin volver a renderizar
+    monkeypatch.setattr(aplicacion, 'render_medical_report_pdf', lambda texto: pytest.fail('rendered twice'))
+    respuesta = cliente.get(done['pdf_url'])
+    assert respuesta.status_code == 200
+    assert respuesta.data == renderizado
+
+
+def test_report_key_desconocida(cliente):
+    respuesta = cliente.get('/api/reports/no-such-key/pdf')
+    assert respuesta.status_code == 404
+    assert respuesta.get_json() == {'error': 'Report not found or expired'}
+
+
+def test_sin_resultados(cliente):
+    respuesta = cliente.post('/api/generate-report/stream', json={'results': []})
+    assert respuesta.status_code == 400
@@ -0,0 +1,142 @@
+import time
+import threading
+from datetime import datetime
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.exc import OperationalError
+
+import timeline_writer
+from timeline_store import crear_engine, crear_usuario_anonimo, lab_result, metadata, timeline
+from timeline_writer import TimelineWriter
+
+FECHA = datetime(2024, 3, 1)
+RESULTADOS = [
+    {'test': 'Glucose', 'value': 92.0, 'unit': 'mg/dL', 'refLow': 70.0, 'refHigh': 100.0, 'status': 'normal'},
+    {'test': 'Hemoglobin', 'value': 11.2, 'unit': 'g/dL', 'refLow': 12.0, 'refHigh': 16.0, 'status': 'low'},
+]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = crear_engine(f"sqlite:///{tmp_path / 'timeline.db'}")
+    metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def user_id(engine):
+    with engine.begin() as conn:
+        return crear_usuario_anonimo(conn)
+
+
+@pytest.fixture
+def esperas(monkeypatch):
+    """Sustituye las esperas entre reintentos del hilo de volcado y anota su duración."""
+    llamadas = []
+    dormir = time.sleep
+
+    def sleep(segundos):
+        if threading.current_thread().name == 'timeline-writer':
+            llamadas.append(segundos)
+        else:
+            dormir(segundos)
+
+    monkeypatch.setattr(time, 'sleep', sleep)
+    return llamadas
+
+
+def esperar(condicion, timeout=5):
+    limite = time.monotonic() + timeout
+    while not condicion():
+        assert time.monotonic() < limite, 'timeout'
+        time.sleep(0.01)
+
+
+def contar(engine, tabla):
+    with engine.connect() as conn:
+        return conn.execute(sa.select(sa.func.count()).select_from(tabla)).scalar()
+
+
+def test_vuelca_en_lotes(engine, user_id):
+    escritor = TimelineWriter(engine, tamano_lote=10, intervalo=0.05)
+    for _ in range(25):
+        assert escritor.encolar(user_id, FECHA, RESULTADOS)
+    escritor.cerrar()
+
+    stats = escritor.stats()
+    assert stats['written'] == 25
+    assert stats['failed'] == 0
+    assert stats['flushes'] >= 3
+    assert contar(engine, timeline) == 25
+    assert contar(engine, lab_result) == 25 * len(RESULTADOS)
+
+
+def test_lote_rechazado_se_escribe_fila_a_fila(engine, user_id, esperas):
+    escritor = TimelineWriter(engine, tamano_lote=100, intervalo=0.05)
+    escritor.encolar(user_id, FECHA, RESULTADOS)
+    # Usuario inexistente: la clave foránea rechaza este análisis y con él todo el lote
+    escritor.encolar(user_id + 1000, FECHA, RESULTADOS)
+    escritor.encolar(user_id, FECHA, RESULTADOS)
+    escritor.cerrar()
+
+    stats = escritor.stats()
+    assert stats['written'] == 2
+    assert stats['failed'] == 1
+    assert contar(engine, timeline) == 2
+    # Un error de integridad no es transitorio: no se reintenta
+    assert esperas == []
+
+
+def test_reintenta_errores_transitorios(engine, user_id, esperas, monkeypatch):
+    guardar = timeline_writer.guardar_analisis_lote
+    fallos = [OperationalError('INSERT', {}, Exception('database is locked'))]
+
+    def guardar_con_fallo(conn, lote):
+        if fallos:
+            raise fallos.pop()
+        return guardar(conn, lote)
+
+    monkeypatch.setattr(timeline_writer, 'guardar_analisis_lote', guardar_con_fallo)
+    escritor = TimelineWriter(engine, tamano_lote=2, intervalo=0.05)
+    escritor.encolar(user_id, FECHA, RESULTADOS)
+    escritor.encolar(user_id, FECHA, RESULTADOS)
+    # Al cerrar se reintenta sin esperar: el lote se vuelca antes
+    esperar(lambda: escritor.stats()['written'] == 2)
+    escritor.cerrar()
+
+    assert escritor.stats()['flushes'] == 1
+    assert len(esperas) == 1
+
+
+def test_error_transitorio_persistente_falla_el_lote(engine, user_id, esperas, monkeypatch):
+    def guardar_caido(conn, lote):
+        raise OperationalError('INSERT', {}, Exception('unable to open database file'))
+
+    monkeypatch.setattr(timeline_writer, 'guardar_analisis_lote', guardar_caido)
+    escritor = TimelineWriter(engine, tamano_lote=2, intervalo=0.05, reintentos=2)
+    escritor.encolar(user_id, FECHA, RESULTADOS)
+    escritor.encolar(user_id, FECHA, RESULTADOS)
+    esperar(lambda: escritor.stats()['failed'] == 2)
+    escritor.cerrar()
+
+    # Con la base de datos caída no se intenta análisis a análisis
+    assert escritor.stats()['failed'] == 2
+    assert len(esperas) == 2
+
+
+def test_cerrar_vuelca_lo_pendiente(engine, user_id):
+    # Ni el tamaño del lote ni el intervalo se alcanzan: solo cerrar() provoca el volcado
+    escritor = TimelineWriter(engine, tamano_lote=1000, intervalo=30)
+    for _ in range(5):
+        escritor.encolar(user_id, FECHA, RESULTADOS)
+    inicio = time.monotonic()
+    escritor.cerrar(timeout=10)
+
+    assert time.monotonic() - inicio < 5
+    assert escritor.stats()['written'] == 5
+    assert contar(engine, timeline) == 5
+
+    assert not escritor.encolar(user_id, FECHA, RESULTADOS)
+    assert escritor.stats()['dropped'] == 1
@@ -0,0 +1,140 @@
+import os
+import time
+import multiprocessing
+
+import pytest
+
+from worker_pool import (
+    SupervisedPool, TaskTimeout, WorkerCrashed, WorkerLost, WorkerMemoryExceeded, WorkerStartFailed, rss_mb
+)
+
+# fork arranca los workers en milisegundos; el pool de la aplicación usa forkserver
+CONTEXTO = multiprocessing.get_context('fork')
+
+
+def pid():
+    return os.getpid()
+
+
+def dormir(segundos):
+    time.sleep(segundos)
+    return segundos
+
+
+def reservar(mb):
+    # b'x' * n escribe cada página: el RSS crece de verdad (bytearray(n) podría no tocarlas)
+    bloque = b'x' * (mb * 1024 * 1024)
+    time.sleep(5)
+    return len(bloque)
+
+
+def morir():
+    os._exit(3)
+
+
+@pytest.fixture
+def crear_pool():
+    pools = []
+
+    def crear(**opciones):
+        pool = SupervisedPool(mp_context=CONTEXTO, intervalo=0.05, **{'max_workers': 1} | opciones)
+        pools.append(pool)
+        return pool
+
+    yield crear
+    for pool in pools:
+        pool.shutdown()
+
+
+def test_timeout_mata_el_worker_y_sigue(crear_pool):
+    pool = crear_pool(timeout=0.3)
+    with pytest.raises(TaskTimeout):
+        pool.submit(dormir, 10).result(timeout=5)
+    assert pool.submit(dormir, 0).result(timeout=5) == 0
+    assert pool.stats()['restarts']['timeout'] == 1
+
+
+def test_techo_de_memoria(crear_pool):
+    base = rss_mb(os.getpid())
+    if base is None:
+        pytest.skip('/proc no disponible')
+    pool = crear_pool(max_rss_mb=base + 100)
+    with pytest.raises(WorkerMemoryExceeded):
+        pool.submit(reservar, 300).result(timeout=10)
+    assert pool.submit(dormir, 0).result(timeout=5) == 0
+    assert pool.stats()['restarts']['memory'] == 1
+
+
+def test_recicla_tras_max_tasks(crear_pool):
+    pool = crear_pool(max_tasks=2)
+    pids = [pool.submit(pid).result(timeout=5) for _ in range(5)]
+    assert pids[0] == pids[1] != pids[2] == pids[3] != pids[4]
+    assert pool.stats()['restarts']['recycled'] == 2
+    assert pool.stats()['completed'] == 5
+
+
+def test_worker_que_muere_falla_su_tarea(crear_pool):
+    pool = crear_pool()
+    with pytest.raises(WorkerCrashed):
+        pool.submit(morir).result(timeout=5)
+    assert pool.submit(dormir, 0).result(timeout=5) == 0
+
+
+def test_worker_libre_muerto_no_pierde_la_tarea(crear_pool):
+    pool = crear_pool()
+    primero = pool.submit(pid).result(timeout=5)
+    # El worker muere mientras espera tarea: el supervisor no lo ve hasta enviarle la siguiente
+    os.kill(primero, 9)
+    while pool._workers[0].proceso.is_alive():
+        time.sleep(0.01)
+
+    segundo = pool.submit(pid).result(timeout=5)
+    assert segundo != primero
+    assert pool.stats()['restarts']['crash'] == 1
+
+
+class _ProcesoQueNoArranca:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def start(self):
+        raise OSError('Resource temporarily unavailable')
+
+
+class _ContextoRoto:
+    """Contexto de multiprocessing en el que Process.start() siempre falla."""
+
+    def Pipe(self, *args, **kwargs):
+        return CONTEXTO.Pipe(*args, **kwargs)
+
+    def Process(self, *args, **kwargs):
+        return _ProcesoQueNoArranca()
+
+
+def test_fallo_al_arrancar_workers_no_cuelga_submit(crear_pool):
+    pool = crear_pool(max_workers=2)
+    pool._ctx = _ContextoRoto()
+    futuros = [pool.submit(pid) for _ in range(3)]
+    for futuro in futuros:
+        with pytest.raises(WorkerStartFailed):
+            futuro.result(timeout=10)
+
+    # Cuando vuelven a poder arrancarse, el pool se recupera solo
+    pool._ctx = CONTEXTO
+    assert pool.submit(dormir, 0).result(timeout=10) == 0
+
+
+def test_error_del_supervisor_falla_las_tareas_y_se_recupera(crear_pool):
+    pool = crear_pool()
+    vigilar = pool._vigilar
+    fallos = [RuntimeError('boom')]
+
+    def vigilar_con_fallo():
+        if fallos:
+            raise fallos.pop()
+        vigilar()
+
+    pool._vigilar = vigilar_con_fallo
+    with pytest.raises(WorkerLost, match='supervisor failed'):
+        pool.submit(dormir, 1).result(timeout=5)
+    assert pool.submit(dormir, 0).result(timeout=5) == 0
@@ -0,0 +1,173 @@
+import os
+import math
+import secrets
+from datetime import datetime, timezone
+from threading import Lock
+
+import sqlalchemy as sa
+
+DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///medilab.db')
+
+metadata = sa.MetaData()
+
+# Reflejo en SQLAlchemy Core de las tablas creadas por las migraciones de Alembic
+user = sa.Table(
+    'user', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('username', sa.String(80), nullable=False, unique=True),
+    sa.Column('email', sa.String(120), nullable=False, unique=True),
+    sa.Column('name', sa.String(100)),
+    sa.Column('password_hash', sa.String(128), nullable=False),
+    sa.Column('created_at', sa.DateTime, nullable=False),
+)
+
+timeline = sa.Table(
+    'timeline', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('date', sa.DateTime, nullable=False),
+    sa.Column('results', sa.JSON),
+    sa.Column('user_id', sa.Integer, sa.ForeignKey('user.id'), nullable=False),
+)
+
+lab_result = sa.Table(
+    'lab_result', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('timeline_id', sa.Integer, sa.ForeignKey('timeline.id', ondelete='CASCADE'), nullable=False),
+    sa.Column('user_id', sa.Integer, sa.ForeignKey('user.id'), nullable=False),
+    sa.Column('test', sa.String(200), nullable=False),
+    sa.Column('value', sa.Float),
+    sa.Column('unit', sa.String(50)),
+    sa.Column('ref_low', sa.Float),
+    sa.Column('ref_high', sa.Float),
+    sa.Column('status', sa.String(10)),
+    sa.Column('date', sa.DateTime, nullable=False),
+    sa.Column('canonical_id', sa.String(64)),
+    sa.Index('ix_lab_result_user_test_date', 'user_id', 'test', 'date'),
+    sa.Index('ix_lab_result_user_canonical_date', 'user_id', 'canonical_id', 'date'),
+    sa.Index('ix_lab_result_timeline_id', 'timeline_id'),
+)
+
+_engine = None
+_engine_lock = Lock()
+
+
+def _activar_claves_foraneas(dbapi_conn, _):
+    # SQLite no comprueba las FOREIGN KEY salvo que se active en cada conexión
+    cursor = dbapi_conn.cursor()
+    cursor.execute('PRAGMA foreign_keys=ON')
+    cursor.close()
+
+
+def crear_engine(url):
+    """Engine para `url`; en SQLite comprueba las claves foráneas como en producción."""
+    engine = sa.create_engine(url)
+    if engine.dialect.name == 'sqlite':
+        sa.event.listen(engine, 'connect', _activar_claves_foraneas)
+    return engine
+
+
+def obtener_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = crear_engine(DATABASE_URL)
+        return _engine
+
+
+def _numero(valor):
+    # Los límites abiertos (inf) y los valores ausentes se guardan como NULL
+    if valor is None:
+        return None
+    valor = float(valor)
+    return None if math.isinf(valor) or math.isnan(valor) else valor
+
+
+def filas_lab_result(timeline_id, user_id, fecha, resultados):
+    return [
+        {
+            'timeline_id': timeline_id,
+            'user_id': user_id,
+            'test': resultado['test'],
+            'value': _numero(resultado.get('value')),
+            'unit': resultado.get('unit') or '',
+            'ref_low': _numero(resultado.get('refLow')),
+            'ref_high': _numero(resultado.get('refHigh')),
+            'status': resultado.get('status'),
+            'date': fecha,
+            'canonical_id': resultado.get('canonicalId'),
+        }
+        for resultado in resultados
+    ]
+
+
+def guardar_analisis(conn, user_id, fecha, resultados):
+    """Inserta un análisis en timeline y sus resultados en lab_result (executemany).
+
+    Se ejecuta dentro de la transacción de `conn`; devuelve el id del timeline.
+    """
+    timeline_id = conn.execute(
+        timeline.insert().values(user_id=user_id, date=fecha, results=resultados)
+    ).inserted_primary_key[0]
+
+    filas = filas_lab_result(timeline_id, user_id, fecha, resultados)
+    if filas:
+        conn.execute(lab_result.insert(), filas)
+    return timeline_id
+
+
+def guardar_analisis_lote(conn, analisis):
+    """Inserta varios análisis [(user_id, fecha, resultados), ...] con dos executemany.
+
+    Los ids de timeline vuelven con RETURNING en el orden de los parámetros;
+    si el dialecto no lo admite se inserta análisis a análisis. Devuelve los ids.
+    """
+    if not analisis:
+        return []
+    if not conn.dialect.insert_executemany_returning_sort_by_parameter_order:
+        return [guardar_analisis(conn, *item) for item in analisis]
+
+    ids = conn.execute(
+        timeline.insert().returning(timeline.c.id, sort_by_parameter_order=True),
+        [{'user_id': user_id, 'date': fecha, 'results': resultados} for user_id, fecha, resultados in analisis]
+    ).scalars().all()
+
+    filas = [
+        fila
+        for timeline_id, (user_id, fecha, resultados) in zip(ids, analisis)
+        for fila in filas_lab_result(timeline_id, user_id, fecha, resultados)
+    ]
+    if filas:
+        conn.execute(lab_result.insert(), filas)
+    return ids
+
+
+def crear_usuario_anonimo(conn):
+    """Inserta un usuario sin credenciales y devuelve su id.
+
+    timeline.user_id y lab_result.user_id apuntan a user.id, así que cada
+    identidad anónima necesita su fila. El hash de contraseña no es válido
+    para ningún método: el usuario solo se identifica con su token.
+    """
+    nombre = f"anon-{secrets.token_hex(8)}"
+    return conn.execute(
+        user.insert().values(
+            username=nombre,
+            email=f"{nombre}@anonymous.invalid",
+            password_hash='!',
+            created_at=datetime.now(timezone.utc).replace(tzinfo=None),
+        )
+    ).inserted_primary_key[0]
+
+
+def listar_analisis(conn, user_id, limite=50):
+    """Análisis guardados de un usuario, del más reciente al más antiguo."""
+    filas = conn.execute(
+        sa.select(timeline.c.id, timeline.c.date, timeline.c.results)
+        .where(timeline.c.user_id == user_id)
+        .order_by(timeline.c.date.desc(), timeline.c.id.desc())
+        .limit(limite)
+    )
+    return [
+        {'id': fila.id, 'date': fila.date.strftime('%Y-%m-%d'), 'results': fila.results or []}
+        for fila in filas
+    ]
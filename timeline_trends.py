@@ -0,0 +1,130 @@
+import sqlalchemy as sa
+
+from biomarker_names import canonicalizar
+from timeline_store import lab_result
+
+BUCKETS = ('month', 'quarter', 'year')
+FUERA_DE_RANGO = ('Low', 'High')
+
+
+def lttb(puntos, objetivo):
+    """Largest-Triangle-Three-Buckets: reduce [(x, y, ...), ...] ordenados por x a `objetivo`
+    puntos conservando la forma visual de la serie (picos incluidos)."""
+    n = len(puntos)
+    if objetivo >= n or objetivo < 3:
+        return list(puntos)
+
+    muestreo = [puntos[0]]
+    tamano = (n - 2) / (objetivo - 2)
+    a = 0
+    for i in range(objetivo - 2):
+        inicio = int(i * tamano) + 1
+        fin = int((i + 1) * tamano) + 1
+
+        # Media del siguiente bucket (el último punto para el bucket final)
+        sig_inicio, sig_fin = fin, min(int((i + 2) * tamano) + 1, n)
+        if sig_inicio >= sig_fin:
+            sig_inicio, sig_fin = n - 1, n
+        media_x = sum(p[0] for p in puntos[sig_inicio:sig_fin]) / (sig_fin - sig_inicio)
+        media_y = sum(p[1] for p in puntos[sig_inicio:sig_fin]) / (sig_fin - sig_inicio)
+
+        ax, ay = puntos[a][0], puntos[a][1]
+        mejor, mejor_area = inicio, -1.0
+        for j in range(inicio, fin):
+            x, y = puntos[j][0], puntos[j][1]
+            area = abs((ax - media_x) * (y - ay) - (ax - x) * (media_y - ay))
+            if area > mejor_area:
+                mejor, mejor_area = j, area
+        muestreo.append(puntos[mejor])
+        a = mejor
+
+    muestreo.append(puntos[-1])
+    return muestreo
+
+
+def clave_bucket(fecha, bucket):
+    if bucket == 'month':
+        return f"{fecha.year}-{fecha.month:02d}"
+    if bucket == 'quarter':
+        return f"{fecha.year}-Q{(fecha.month - 1) // 3 + 1}"
+    return str(fecha.year)
+
+
+def agrupar(lecturas, bucket):
+    grupos = {}
+    for fecha, valor, _ in lecturas:
+        grupos.setdefault(clave_bucket(fecha, bucket), []).append(valor)
+    return [
+        {
+            'period': periodo,
+            'min': min(valores),
+            'max': max(valores),
+            'mean': sum(valores) / len(valores),
+            'count': len(valores),
+        }
+        for periodo, valores in grupos.items()
+    ]
+
+
+def _leer_lecturas(conn, user_id, test, desde, hasta):
+    # Los nombres reconocidos se buscan por id canónico, agrupando las variantes de cada
+    # laboratorio; ambos filtros usan un índice compuesto (user_id, ..., date)
+    canonical_id = canonicalizar(test)
+    filtro = lab_result.c.canonical_id == canonical_id if canonical_id else lab_result.c.test == test
+    consulta = (
+        sa.select(lab_result.c.date, lab_result.c.value, lab_result.c.status, lab_result.c.unit)
+        .where(lab_result.c.user_id == user_id, filtro, lab_result.c.value.is_not(None))
+        # El id desempata las lecturas del mismo día: latest/previous siguen el orden de inserción
+        .order_by(lab_result.c.date, lab_result.c.id)
+    )
+    if desde is not None:
+        consulta = consulta.where(lab_result.c.date >= desde)
+    if hasta is not None:
+        consulta = consulta.where(lab_result.c.date <= hasta)
+    return conn.execute(consulta).fetchall()
+
+
+def serie_tendencia(conn, user_id, test, desde=None, hasta=None, bucket=None, puntos=100):
+    """Serie agregada de un biomarcador, de tamaño acotado sea cual sea la longitud del historial."""
+    filas = _leer_lecturas(conn, user_id, test, desde, hasta)
+    lecturas = [(fecha, valor, status) for fecha, valor, status, _ in filas]
+
+    serie = {
+        'test': test,
+        'canonical_id': canonicalizar(test),
+        'unit': filas[-1][3] if filas else None,
+        'count': len(lecturas),
+        'out_of_range': sum(1 for _, _, status in lecturas if status in FUERA_DE_RANGO),
+        'first_date': lecturas[0][0].isoformat() if lecturas else None,
+        'last_date': lecturas[-1][0].isoformat() if lecturas else None,
+        'latest': None,
+        'previous': None,
+        'delta': None,
+        'delta_pct': None,
+    }
+
+    if lecturas:
+        serie['latest'] = {'date': lecturas[-1][0].isoformat(), 'value': lecturas[-1][1], 'status': lecturas[-1][2]}
+    if len(lecturas) > 1:
+        anterior, ultimo = lecturas[-2][1], lecturas[-1][1]
+        serie['previous'] = {'date': lecturas[-2][0].isoformat(), 'value': anterior, 'status': lecturas[-2][2]}
+        serie['delta'] = ultimo - anterior
+        serie['delta_pct'] = (ultimo - anterior) / anterior * 100 if anterior else None
+
+    if bucket:
+        # Un historial largo tiene muchos periodos: los buckets se reducen con LTTB
+        # (sobre la media de cada periodo) como los puntos, hasta `puntos`
+        inicio_periodo = {}
+        for fecha, _, _ in lecturas:
+            inicio_periodo.setdefault(clave_bucket(fecha, bucket), fecha.toordinal())
+        grupos = [(inicio_periodo[grupo['period']], grupo['mean'], grupo) for grupo in agrupar(lecturas, bucket)]
+        serie['bucket'] = bucket
+        serie['bucket_count'] = len(grupos)
+        serie['buckets'] = [grupo for _, _, grupo in lttb(grupos, puntos)]
+    else:
+        puntos_xy = [(fecha.toordinal() + fecha.hour / 24, valor, fecha) for fecha, valor, _ in lecturas]
+        serie['points'] = [
+            {'date': fecha.isoformat(), 'value': valor}
+            for _, valor, fecha in lttb(puntos_xy, puntos)
+        ]
+    return serie
@@ -0,0 +1,205 @@
+import os
+import time
+import queue
+import atexit
+import traceback
+from threading import Event, Lock, Thread
+
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+import metrics
+from timeline_store import guardar_analisis_lote, obtener_engine
+
+# Marca que despierta al hilo de volcado al cerrar
+_CERRAR = object()
+
+
+class TimelineWriter:
+    """Escritura diferida (write-behind) de análisis en las tablas timeline y lab_result.
+
+    encolar() solo añade el análisis a un buffer acotado y nunca espera a la
+    base de datos. Un hilo lo vuelca en lotes, cada lote en una sola
+    transacción, cuando reúne `tamano_lote` análisis o cuando han pasado
+    `intervalo` segundos desde el primero pendiente. Solo los errores
+    transitorios (conexión caída, base de datos bloqueada) se reintentan; un
+    lote que la base de datos rechaza se escribe análisis a análisis, así que
+    solo se pierden los análisis rechazados. cerrar() vuelca todo lo pendiente
+    antes de volver.
+    """
+
+    def __init__(self, engine=None, tamano_lote=100, intervalo=1.0, capacidad=10000, reintentos=3):
+        self.engine = engine
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo
+        self.reintentos = reintentos
+        self._cola = queue.Queue(maxsize=capacidad)
+        self._cerrando = Event()
+        self._hilo = None
+        self._lock = Lock()
+        self.escritos = 0
+        self.descartados = 0
+        self.fallidos = 0
+        self.volcados = 0
+
+    def _start(self):
+        with self._lock:
+            if self._hilo is None and not self._cerrando.is_set():
+                self._hilo = Thread(target=self._bucle, name='timeline-writer', daemon=True)
+                self._hilo.start()
+
+    def encolar(self, user_id, fecha, resultados):
+        """Añade un análisis al buffer. Devuelve False si está lleno o cerrado (el análisis se descarta)."""
+        self._start()
+        if self._cerrando.is_set():
+            aceptado = False
+        else:
+            try:
+                self._cola.put_nowait((user_id, fecha, resultados))
+                aceptado = True
+            except queue.Full:
+                aceptado = False
+        if not aceptado:
+            with self._lock:
+                self.descartados += 1
+            metrics.ANALISIS_TIMELINE.inc(1, 'dropped')
+        return aceptado
+
+    def _siguiente_lote(self):
+        try:
+            # La marca de cierre puede haberse consumido completando el lote anterior:
+            # al cerrar no se espera otro intervalo antes de ver la cola vacía
+            if self._cerrando.is_set():
+                primero = self._cola.get_nowait()
+            else:
+                primero = self._cola.get(timeout=self.intervalo)
+        except queue.Empty:
+            return []
+        lote = [] if primero is _CERRAR else [primero]
+        limite = time.monotonic() + self.intervalo
+        while len(lote) < self.tamano_lote:
+            restante = limite - time.monotonic()
+            try:
+                # Al cerrar no se espera a completar el lote: se vacía lo que haya
+                if restante > 0 and not self._cerrando.is_set():
+                    item = self._cola.get(timeout=restante)
+                else:
+                    item = self._cola.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _CERRAR:
+                lote.append(item)
+        return lote
+
+    def _bucle(self):
+        while True:
+            lote = self._siguiente_lote()
+            if lote:
+                self._volcar(lote)
+            elif self._cerrando.is_set() and self._cola.empty():
+                return
+
+    def _volcar(self, lote):
+        error = self._escribir_con_reintentos(lote)
+        if error is None:
+            return
+        if len(lote) > 1 and not _es_transitorio(error):
+            # Un análisis con datos que la base de datos rechaza (IntegrityError, DataError...)
+            # no hace perder el resto del lote: se escriben uno a uno, cada uno en su transacción
+            for analisis in lote:
+                if self._escribir_con_reintentos([analisis]) is not None:
+                    self._fallar(1)
+            return
+        self._fallar(len(lote))
+
+    def _escribir_con_reintentos(self, lote):
+        """Escribe el lote reintentando con espera exponencial solo los errores transitorios.
+
+        Devuelve None si se escribió o el último error si no.
+        """
+        for intento in range(self.reintentos + 1):
+            error = self._escribir(lote)
+            if error is None or not _es_transitorio(error):
+                return error
+            if intento < self.reintentos and not self._cerrando.is_set():
+                time.sleep(min(self.intervalo * 2 ** intento, 30))
+        return error
+
+    def _escribir(self, lote):
+        """Una transacción con todo el lote; devuelve None o la excepción si falla."""
+        inicio = time.perf_counter()
+        try:
+            with (self.engine or obtener_engine()).begin() as conn:
+                guardar_analisis_lote(conn, lote)
+        except Exception as e:
+            traceback.print_exc()
+            metrics.error('timeline_flush')
+            return e
+        metrics.DURACION_VOLCADO_TIMELINE.observe(time.perf_counter() - inicio)
+        metrics.TAMANO_LOTE_TIMELINE.observe(len(lote))
+        metrics.ANALISIS_TIMELINE.inc(len(lote), 'written')
+        with self._lock:
+            self.escritos += len(lote)
+            self.volcados += 1
+        return None
+
+    def _fallar(self, n):
+        with self._lock:
+            self.fallidos += n
+        metrics.ANALISIS_TIMELINE.inc(n, 'failed')
+
+    def cerrar(self, timeout=30):
+        """Deja de aceptar análisis y espera a que se vuelque todo lo pendiente."""
+        with self._lock:
+            self._cerrando.set()
+            hilo = self._hilo
+        if hilo is None:
+            return
+        try:
+            self._cola.put_nowait(_CERRAR)
+        except queue.Full:
+            pass
+        hilo.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': self._cola.qsize(),
+                'batch_size': self.tamano_lote,
+                'flush_interval': self.intervalo,
+                'written': self.escritos,
+                'dropped': self.descartados,
+                'failed': self.fallidos,
+                'flushes': self.volcados,
+            }
+
+
+def _es_transitorio(error):
+    """Errores que pueden desaparecer al reintentar: la conexión o la base de datos, no los datos."""
+    if isinstance(error, OperationalError):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+
+_writer = None
+_writer_lock = Lock()
+
+
+def obtener_escritor():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = TimelineWriter(
+                tamano_lote=int(os.environ.get('TIMELINE_BATCH_SIZE', 100)),
+                intervalo=float(os.environ.get('TIMELINE_FLUSH_INTERVAL', 1.0)),
+                capacidad=int(os.environ.get('TIMELINE_BUFFER_SIZE', 10000))
+            )
+            # Apagado ordenado (fin del proceso, SIGTERM de gunicorn): se vuelca lo pendiente
+            atexit.register(_writer.cerrar)
+        return _writer
+
+
+def cerrar_escritor(timeout=30):
+    with _writer_lock:
+        writer = _writer
+    if writer is not None:
+        writer.cerrar(timeout)
@@ -0,0 +1,425 @@
+import os
+import time
+import signal
+import traceback
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+from threading import Lock, Thread
+
+import metrics
+
+_BYTES_PAGINA = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+# Segundos que se deja a un worker reciclado para salir por su cuenta antes de matarlo
+ESPERA_SALIDA = 5
+# Arranques fallidos seguidos, sin ningún worker vivo, tras los que fallan las tareas pendientes;
+# entre intentos se espera cada vez el doble, hasta ESPERA_MAX_ARRANQUE segundos
+FALLOS_ARRANQUE_MAX = 3
+ESPERA_MAX_ARRANQUE = 5
+# Workers a los que se intenta enviar una tarea antes de darla por perdida (el worker libre
+# puede haber muerto mientras esperaba: la tarea no llegó a ejecutarse y se envía a otro)
+ENVIOS_MAX = 3
+
+
+class WorkerLost(Exception):
+    """La tarea no terminó porque su worker se mató o murió; el pool lo sustituye."""
+
+
+class TaskTimeout(WorkerLost):
+    pass
+
+
+class WorkerMemoryExceeded(WorkerLost):
+    pass
+
+
+class WorkerCrashed(WorkerLost):
+    pass
+
+
+class WorkerStartFailed(WorkerLost):
+    """No se pudo arrancar ningún worker para ejecutar la tarea."""
+
+
+def rss_mb(pid):
+    """RSS en MB del proceso y sus descendientes, leído de /proc.
+
+    Devuelve None si /proc no está disponible: en ese caso no se aplica el techo de memoria.
+    """
+    total = 0
+    pendientes = [pid]
+    while pendientes:
+        actual = pendientes.pop()
+        try:
+            with open(f'/proc/{actual}/statm') as f:
+                total += int(f.read().split()[1]) * _BYTES_PAGINA
+            with open(f'/proc/{actual}/task/{actual}/children') as f:
+                pendientes.extend(int(hijo) for hijo in f.read().split())
+        except (OSError, ValueError):
+            if actual == pid:
+                return None
+    return total / (1024 * 1024)
+
+
+def _bucle_worker(conn):
+    # Grupo de procesos propio: al matar el worker caen también los subprocesos que haya creado
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+    while True:
+        try:
+            tarea = conn.recv()
+        except EOFError:
+            return
+        if tarea is None:
+            return
+        fn, args = tarea
+        try:
+            respuesta = (True, fn(*args))
+        except BaseException as e:
+            respuesta = (False, e)
+        try:
+            conn.send(respuesta)
+        except Exception as e:
+            # Resultado o excepción no serializable: se pickla antes de escribir, así que no quedó nada a medias
+            conn.send((False, RuntimeError(f'{type(e).__name__}: {e}')))
+
+
+class _Worker:
+    __slots__ = ('proceso', 'conn', 'tarea', 'inicio', 'tareas')
+
+    def __init__(self, ctx, numero):
+        self.conn, conn_hijo = ctx.Pipe()
+        self.proceso = ctx.Process(target=_bucle_worker, args=(conn_hijo,), name=f'analysis-worker-{numero}', daemon=True)
+        try:
+            self.proceso.start()
+        except BaseException:
+            self.conn.close()
+            raise
+        finally:
+            conn_hijo.close()
+        self.tarea = None
+        self.inicio = None
+        self.tareas = 0
+
+
+class SupervisedPool:
+    """Pool de procesos con límites por tarea y por worker.
+
+    Se usa como ProcessPoolExecutor (submit devuelve un Future), pero cada
+    worker ejecuta una tarea cada vez y un hilo supervisor lo vigila:
+
+    - una tarea que pasa de `timeout` segundos falla con TaskTimeout;
+    - si el RSS del worker (con sus subprocesos) supera `max_rss_mb`, la tarea
+      en curso falla con WorkerMemoryExceeded;
+    - si el worker muere (OOM killer, segfault en la librería de PDF), su tarea
+      falla con WorkerCrashed;
+    - tras `max_tasks` tareas el worker se recicla, para acotar el crecimiento
+      de memoria a largo plazo (cachés y fragmentación de pdfplumber/PyMuPDF).
+
+    Un worker con timeout o fuera de memoria se mata con su grupo de procesos y
+    se sustituye por uno nuevo; las demás tareas no se ven afectadas. Los
+    límites a None o 0 se desactivan.
+
+    Si no se puede arrancar un worker se reintenta con espera exponencial; sin
+    ningún worker vivo, tras FALLOS_ARRANQUE_MAX intentos las tareas pendientes
+    fallan con WorkerStartFailed en lugar de esperar para siempre.
+    """
+
+    def __init__(self, max_workers, timeout=None, max_rss_mb=None, max_tasks=None, intervalo=0.1, mp_context=None):
+        self.max_workers = max_workers
+        self.timeout = timeout or None
+        self.max_rss_mb = max_rss_mb or None
+        self.max_tasks = max_tasks or None
+        self.intervalo = intervalo
+        self._ctx = mp_context or multiprocessing.get_context()
+        self._pendientes = deque()
+        # Tareas ya en marcha (su Future está en RUNNING) que hay que volver a enviar
+        self._reenvios = deque()
+        self._workers = []
+        self._saliendo = []
+        self._numero = 0
+        self._fallos_arranque = 0
+        self._proximo_arranque = 0
+        self._lock = Lock()
+        self._aviso_r, self._aviso_w = self._ctx.Pipe(duplex=False)
+        self._avisado = False
+        self._cerrado = False
+        self._hilo = None
+        self.completadas = 0
+        self.reinicios = {'recycled': 0, 'timeout': 0, 'memory': 0, 'crash': 0}
+
+    def submit(self, fn, *args):
+        futuro = Future()
+        with self._lock:
+            if self._cerrado:
+                raise RuntimeError('cannot schedule new futures after shutdown')
+            self._pendientes.append((futuro, fn, args))
+            if self._hilo is None:
+                self._hilo = Thread(target=self._supervisar, name='analysis-pool-supervisor', daemon=True)
+                self._hilo.start()
+            self._avisar()
+        return futuro
+
+    def _avisar(self):
+        # Con el lock tomado; como mucho un aviso en vuelo, así el pipe nunca se llena
+        if not self._avisado:
+            self._avisado = True
+            self._aviso_w.send_bytes(b'')
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        with self._lock:
+            self._cerrado = True
+            if cancel_futures:
+                while self._pendientes:
+                    self._pendientes.popleft()[0].cancel()
+            hilo = self._hilo
+            if hilo is not None:
+                self._avisar()
+        if hilo is not None and wait:
+            hilo.join()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': len(self._workers),
+                'busy': sum(w.tarea is not None for w in self._workers),
+                'pending': len(self._pendientes) + len(self._reenvios),
+                'completed': self.completadas,
+                'restarts': dict(self.reinicios),
+                'limits': {'timeout': self.timeout, 'max_rss_mb': self.max_rss_mb, 'max_tasks': self.max_tasks},
+            }
+
+    # Todo lo que sigue se ejecuta en el hilo supervisor, único dueño de los workers
+
+    def _nuevo_worker(self):
+        """Arranca un worker; si no se puede, devuelve None y aplaza el siguiente intento."""
+        if time.monotonic() < self._proximo_arranque:
+            return None
+        self._numero += 1
+        try:
+            worker = _Worker(self._ctx, self._numero)
+        except Exception as e:
+            self._fallos_arranque += 1
+            self._proximo_arranque = time.monotonic() + min(self.intervalo * 2 ** self._fallos_arranque, ESPERA_MAX_ARRANQUE)
+            metrics.error('worker_start')
+            print(f"ERROR: Could not start an analysis worker ({self._fallos_arranque} in a row): {e}")
+            if not self._workers and self._fallos_arranque >= FALLOS_ARRANQUE_MAX:
+                self._fallar_pendientes(WorkerStartFailed(f'Could not start an analysis worker: {e}'))
+            return None
+        self._fallos_arranque = 0
+        self._proximo_arranque = 0
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _siguiente_tarea(self):
+        """(futuro, fn, args, envíos previos) de la siguiente tarea, con su Future ya en RUNNING."""
+        with self._lock:
+            if self._reenvios:
+                return self._reenvios.popleft()
+            while self._pendientes:
+                futuro, fn, args = self._pendientes.popleft()
+                if futuro.set_running_or_notify_cancel():
+                    return futuro, fn, args, 0
+        return None
+
+    def _hay_tareas(self):
+        with self._lock:
+            return bool(self._reenvios or self._pendientes)
+
+    def _fallar_pendientes(self, error):
+        with self._lock:
+            tareas = list(self._reenvios)
+            self._reenvios.clear()
+            while self._pendientes:
+                futuro, fn, args = self._pendientes.popleft()
+                if futuro.set_running_or_notify_cancel():
+                    tareas.append((futuro, fn, args, 0))
+        for futuro, *_ in tareas:
+            futuro.set_exception(error)
+
+    def _despachar(self):
+        while True:
+            worker = next((w for w in self._workers if w.tarea is None), None)
+            if worker is None:
+                if len(self._workers) >= self.max_workers or not self._hay_tareas():
+                    return
+                # Si no arranca, las tareas esperan al siguiente intento o a que quede libre un worker
+                worker = self._nuevo_worker()
+                if worker is None:
+                    return
+            tarea = self._siguiente_tarea()
+            if tarea is None:
+                return
+            futuro, fn, args, envios = tarea
+            try:
+                worker.conn.send((fn, args))
+            except (OSError, EOFError):
+                # El worker murió mientras estaba libre: la tarea no llegó a ejecutarse y va a otro
+                self._retirar(worker, 'crash', matar=True)
+                if envios + 1 < ENVIOS_MAX:
+                    with self._lock:
+                        self._reenvios.appendleft((futuro, fn, args, envios + 1))
+                else:
+                    futuro.set_exception(WorkerCrashed('Worker processes died before receiving the task'))
+                continue
+            except Exception as e:
+                # Argumentos no serializables: falla la tarea, el worker sigue libre
+                futuro.set_exception(e)
+                continue
+            worker.tarea = futuro
+            worker.inicio = time.monotonic()
+
+    def _retirar(self, worker, motivo, matar=False):
+        with self._lock:
+            self._workers.remove(worker)
+            self.reinicios[motivo] += 1
+            cerrado = self._cerrado
+        metrics.REINICIOS_WORKER.inc(1, motivo)
+        if matar:
+            self._matar(worker.proceso)
+        else:
+            # Sin esperar a que salga: mientras tanto el supervisor sigue despachando
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            self._saliendo.append((worker.proceso, time.monotonic() + ESPERA_SALIDA))
+        worker.conn.close()
+        # Se sustituye enseguida para que la siguiente petición no pague el arranque del worker
+        if not cerrado:
+            self._nuevo_worker()
+
+    @staticmethod
+    def _matar(proceso):
+        try:
+            os.killpg(proceso.pid, signal.SIGKILL)
+        except (AttributeError, OSError):
+            proceso.kill()
+        proceso.join()
+
+    def _recoger_salientes(self):
+        ahora = time.monotonic()
+        quedan = []
+        for proceso, limite in self._saliendo:
+            if not proceso.is_alive():
+                proceso.join()
+            elif ahora > limite:
+                self._matar(proceso)
+            else:
+                quedan.append((proceso, limite))
+        self._saliendo = quedan
+
+    def _fallar(self, worker, motivo, error):
+        futuro, worker.tarea = worker.tarea, None
+        futuro.set_exception(error)
+        self._retirar(worker, motivo, matar=True)
+
+    def _recibir(self, worker):
+        try:
+            ok, valor = worker.conn.recv()
+        except (EOFError, OSError):
+            worker.proceso.join(1)
+            self._fallar(worker, 'crash', WorkerCrashed(f'Worker process exited with code {worker.proceso.exitcode}'))
+            return
+        futuro, worker.tarea = worker.tarea, None
+        worker.tareas += 1
+        with self._lock:
+            self.completadas += 1
+        if ok:
+            futuro.set_result(valor)
+        else:
+            futuro.set_exception(valor)
+
+        if self.max_tasks and worker.tareas >= self.max_tasks:
+            self._retirar(worker, 'recycled')
+        elif self.max_rss_mb and (rss_mb(worker.proceso.pid) or 0) > self.max_rss_mb:
+            # Terminó, pero se quedó con demasiada memoria: no se reutiliza
+            self._retirar(worker, 'memory')
+
+    def _vigilar(self):
+        ahora = time.monotonic()
+        for worker in [w for w in self._workers if w.tarea is not None]:
+            if self.timeout and ahora - worker.inicio > self.timeout:
+                self._fallar(worker, 'timeout', TaskTimeout(f'Task exceeded the {self.timeout:g} s time limit'))
+            elif self.max_rss_mb:
+                rss = rss_mb(worker.proceso.pid)
+                if rss is not None and rss > self.max_rss_mb:
+                    self._fallar(worker, 'memory', WorkerMemoryExceeded(
+                        f'Worker used {rss:.0f} MB (limit {self.max_rss_mb:g} MB)'
+                    ))
+
+    def _supervisar(self):
+        try:
+            self._bucle_supervisor()
+        except Exception as e:
+            # Un error inesperado no puede dejar colgados los submit: falla lo que hay en
+            # marcha y pendiente, y el siguiente submit arranca un supervisor nuevo
+            traceback.print_exc()
+            metrics.error('pool_supervisor')
+            self._abortar(WorkerLost(f'Analysis pool supervisor failed: {e}'))
+
+    def _abortar(self, error):
+        # Primero lo pendiente y luego lo que está en marcha: lo que se envíe después de
+        # ver fallar una tarea ya no se toca y lo ejecuta el nuevo supervisor
+        self._fallar_pendientes(error)
+        for worker in self._workers:
+            worker.conn.close()
+            self._matar(worker.proceso)
+            if worker.tarea is not None and not worker.tarea.done():
+                worker.tarea.set_exception(error)
+        for proceso, _ in self._saliendo:
+            self._matar(proceso)
+        self._saliendo = []
+        with self._lock:
+            self._workers.clear()
+            self._hilo = None
+            # Las tareas que llegaron mientras tanto las recoge el nuevo supervisor
+            if self._pendientes:
+                self._hilo = Thread(target=self._supervisar, name='analysis-pool-supervisor', daemon=True)
+                self._hilo.start()
+
+    def _bucle_supervisor(self):
+        while True:
+            self._despachar()
+            ocupados = [w for w in self._workers if w.tarea is not None]
+            with self._lock:
+                terminar = self._cerrado and not self._pendientes and not self._reenvios and not ocupados
+            if terminar:
+                break
+
+            esperables = [self._aviso_r]
+            for worker in ocupados:
+                esperables += [worker.conn, worker.proceso.sentinel]
+            vigilar = self.timeout or self.max_rss_mb
+            # Con arranques fallidos y tareas esperando, se reintenta cuando pasa la espera
+            esperar = (ocupados and vigilar) or self._saliendo or (self._fallos_arranque and self._hay_tareas())
+            listos = wait(esperables, timeout=self.intervalo if esperar else None)
+
+            if self._aviso_r in listos:
+                with self._lock:
+                    while self._aviso_r.poll():
+                        self._aviso_r.recv_bytes()
+                    self._avisado = False
+            for worker in ocupados:
+                # Si el worker respondió y luego murió, primero se recoge la respuesta
+                if worker.conn in listos or worker.proceso.sentinel in listos:
+                    self._recibir(worker)
+            self._vigilar()
+            self._recoger_salientes()
+
+        for worker in self._workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.conn.close()
+            self._saliendo.append((worker.proceso, time.monotonic() + ESPERA_SALIDA))
+        with self._lock:
+            self._workers.clear()
+        for proceso, limite in self._saliendo:
+            proceso.join(max(limite - time.monotonic(), 0))
+            if proceso.is_alive():
+                self._matar(proceso)
+        self._saliendo = []